@@ -34,6 +34,9 @@ For each of these commands, there are several flags that can be specified to nar
 #### Output Path
 You can use `--out` or `-o` followed by a file path to specify the output path of the download. If this is not specified, the script will generate diagnostic plots for you to get insight into the data that you would be downloading.
 
+#### Output Format
+By default, the data is written as a CSV file. If the output path ends in `.parquet` (or `.pq`) or `.feather`, the data is written as a Parquet or Feather file instead. You can also use `--format` or `-f` followed by `csv`, `parquet`, or `feather` to choose the format explicitly. Parquet and Feather files keep the dtypes of the cleaned data (e.g. dates and flags), are much smaller and faster to load than CSV files, and can be read with `go_utils.download.read_data`. They require `pyarrow`, which can be installed with `pip install go-utils[parquet]`.
+
 #### Start and End Dates
 You can use `--start` or `-s` followed by a date in YYYY-MM-DD form to specify the start date. Similarly, you can use `--end` or `-e` to specify the end date.
 
@@ -46,6 +49,15 @@ You can use `--regions` or `-r` followed by a list of regions separated by comma
 #### Bounding Box
 You can use `--box` or `-b` followed by the coordinates of your bounding box in this format: `min latitude, min longitude, max latitude, max longitude`
 
+#### Concurrent Downloads
+You can use `--workers` or `-w` followed by a number to download the data in monthly chunks with that many concurrent requests. This can considerably speed up downloads that span several years.
+
+#### Response Cache
+You can use `--cache` or `-ca` followed by a directory to cache the downloaded GLOBE API responses. Later runs with the same settings read the data from that directory instead of downloading it again. See `go_utils.cache` for how long cached responses are kept. Downloads filtered by countries or regions keep a snapshot of the country enriched layer in that directory instead (see `go_utils.geoenrich`).
+
+#### Sync
+You can use `--sync` or `-sy` together with `--out` to keep a local copy of the data up to date. Instead of downloading everything again, only the observations measured since the last run are downloaded and appended to the output file. See `go_utils.sync` for more information.
+
 ### Mosquito Habitat Mapper Flags
 
 #### Genus
@@ -90,13 +102,19 @@ lc-download -s "2021-05-01" -e "2021-05-31" -hap -o LC_Regular_Test.csv
 Would download all landcover data with fully filled out photo observations during May 1st, 2021 to May 31st, 2021 into a `LC_Regular_Test.csv` file.
 
 ## Downloading Photos
-There are two commands that can be used to get photos for cleaned Mosquito Habitat Mapper and Land Cover CSV files, respectively.
+There are two commands that can be used to get photos for cleaned Mosquito Habitat Mapper and Land Cover CSV (or Parquet/Feather) files, respectively.
 For Mosquito Habitat Mapper, there is `mhm-photo-download` and for Land Cover, there is `lc-photo-download`.
 
 ### General Command
 In order for the photo download scripts to work, you must specify an input path and output path.
 For example, `mhm_photo_download "input csv path" "output directory"` will take the Mosquito Habitat Mapper data stored in the input CSV and download the photos to the output directory. If the output directory doesn't exist, it will be created.
 
+#### Concurrent Photo Downloads
+You can use `--workers` or `-wk` followed by a number to download that many photos concurrently. The downloads share their connections to the GLOBE servers, and photos that fail to download are reported once all downloads have finished.
+
+#### Resuming Photo Downloads
+Each output directory contains a `photo_manifest.csv` file recording the URL, size, checksum, and status of every photo downloaded to it. Running the same command again (or a command over an overlapping data file) skips the photos that were completely downloaded and only downloads the remaining, failed, or incomplete ones.
+
 #### All Flag
 You can use the `--all` or `-a` to set all the following flags.
 
@@ -1,19 +1,33 @@
 import argparse
-import csv
+import os
+from functools import partial
 
 import matplotlib.pyplot as plt
-import pandas as pd
 
 from go_utils import lc, mhm
-from go_utils.download import convert_dates_to_datetime, get_api_data
+from go_utils.download import (
+    get_api_data,
+    get_file_format,
+    iter_api_data,
+    read_data,
+    write_data,
+    write_data_chunks,
+)
 from go_utils.geoenrich import get_country_api_data
 from go_utils.photo_download import download_lc_photos, download_mhm_photos
+from go_utils.sync import sync_api_data
 
 protocol_map = {"mosquito": "mosquito_habitat_mapper", "landcover": "land_covers"}
 
 
 def add_download_args(parser):
     parser.add_argument("--out", "-o", help="Output Directory of the command")
+    parser.add_argument(
+        "--format",
+        "-f",
+        help="Format of the output file (inferred from the extension of the output path by default)",
+        choices=["csv", "parquet", "feather"],
+    )
     parser.add_argument(
         "--start",
         "-s",
@@ -40,10 +54,52 @@ def add_download_args(parser):
         help="Bounding Box (if you want data from the api, so don't specify -i). Put coordinates in order of 'min lat, min lon, max lat, max lon'",
         type=list,
     )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        help="Number of monthly chunks to download concurrently from the GLOBE API",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--cache",
+        "-ca",
+        help="Directory used to cache GLOBE API responses and country enriched layers between runs",
+    )
+    parser.add_argument(
+        "--sync",
+        "-sy",
+        help="Only download new observations and append them to the output file",
+        action="store_true",
+    )
 
 
-def download_data(protocol, args):
-    func_args = {"protocol": protocol}
+def add_photo_download_args(parser):
+    parser.add_argument(
+        "--workers",
+        "-wk",
+        help="Number of photos to download concurrently",
+        type=int,
+        default=1,
+    )
+
+
+def report_photo_failures(parser, targets):
+    failed = targets[targets["status"] == "failed"]
+    if len(failed):
+        paths = "\n".join(
+            f"{url} -> {os.path.join(directory, filename)}"
+            for url, directory, filename in zip(
+                failed["url"], failed["directory"], failed["filename"]
+            )
+        )
+        parser.exit(
+            1, f"Failed to download {len(failed)} of {len(targets)} photos:\n{paths}\n"
+        )
+
+
+def get_download_args(args):
+    func_args = {}
     if args.start:
         func_args["start_date"] = args.start
     if args.end:
@@ -63,15 +119,56 @@ def download_data(protocol, args):
         ]
     if args.regions:
         func_args["regions"] = [region.strip() for region in args.regions.split(",")]
+    return func_args
+
+
+def download_data(protocol, args):
+    func_args = get_download_args(args)
 
     if "countries" in func_args or "regions" in func_args:
-        df = get_country_api_data(**func_args)
+        df = get_country_api_data(protocol, **func_args, snapshot_dir=args.cache)
     else:
-        df = get_api_data(**func_args)
+        df = get_api_data(
+            protocol, **func_args, workers=args.workers, cache_dir=args.cache
+        )
 
     return df
 
 
+def write_downloaded_data(protocol, args, process):
+    func_args = get_download_args(args)
+
+    if "countries" in func_args or "regions" in func_args:
+        df = get_country_api_data(protocol, **func_args, snapshot_dir=args.cache)
+        write_data(process(df), args.out, file_format=args.format)
+        return
+
+    # Each chunk is written as soon as it is downloaded, so the whole dataset is never held in memory
+    chunks = iter_api_data(
+        protocol, **func_args, workers=args.workers, cache_dir=args.cache
+    )
+    write_data_chunks((process(df) for df in chunks), args.out, file_format=args.format)
+
+
+def sync_data(protocol, args, process):
+    if not args.out:
+        raise ValueError("Syncing requires an output path (--out).")
+    func_args = get_download_args(args)
+    if "countries" in func_args or "regions" in func_args:
+        raise ValueError("Syncing doesn't support country or region filters.")
+    if args.format and args.format != get_file_format(args.out):
+        raise ValueError("Synced stores use the format of their file extension.")
+
+    sync_api_data(
+        protocol,
+        args.out,
+        **func_args,
+        process=process,
+        workers=args.workers,
+        cache_dir=args.cache,
+    )
+
+
 def mhm_data_download():
     parser = argparse.ArgumentParser(
         description="GLOBE Observer Mosquito Habitat Mapper API Download CLI"
@@ -99,7 +196,6 @@ def mhm_data_download():
         "--minlarvae", "-ml", help="Filter data by minimum larvae count", type=int
     )
     args = parser.parse_args()
-    df = download_data("mosquito_habitat_mapper", args)
 
     filter_args = {}
     filter_args["has_genus"] = args.hasgenus
@@ -109,19 +205,13 @@ def mhm_data_download():
     if args.minlarvae:
         filter_args["min_larvae_count"] = args.minlarvae
 
-    df = mhm.qa_filter(df, **filter_args)
-
-    if args.out:
-        df.to_csv(
-            args.out,
-            sep=",",
-            index=False,
-            encoding="utf-8",
-            quoting=csv.QUOTE_ALL,
-            quotechar='"',
-            escapechar="”",
-        )
+    process = partial(mhm.qa_filter, **filter_args)
+    if args.sync:
+        sync_data("mosquito_habitat_mapper", args, process)
+    elif args.out:
+        write_downloaded_data("mosquito_habitat_mapper", args, process)
     else:
+        df = process(download_data("mosquito_habitat_mapper", args))
         mhm.diagnostic_plots(df)
         plt.show()
 
@@ -158,26 +248,20 @@ def lc_data_download():
         action="store_true",
     )
     args = parser.parse_args()
-    df = download_data("land_covers", args)
 
     filter_args = {}
     filter_args["has_classification"] = args.hasclassification
     filter_args["has_photo"] = args.hasphoto
     filter_args["has_all_classifications"] = args.hasallclassifications
     filter_args["has_all_photos"] = args.hasallphotos
-    df = lc.qa_filter(df, **filter_args)
 
-    if args.out:
-        df.to_csv(
-            args.out,
-            sep=",",
-            index=False,
-            encoding="utf-8",
-            quoting=csv.QUOTE_ALL,
-            quotechar='"',
-            escapechar="”",
-        )
+    process = partial(lc.qa_filter, **filter_args)
+    if args.sync:
+        sync_data("land_covers", args, process)
+    elif args.out:
+        write_downloaded_data("land_covers", args, process)
     else:
+        df = process(download_data("land_covers", args))
         lc.diagnostic_plots(df)
         plt.show()
 
@@ -239,6 +323,7 @@ def mhm_photo_download():
         action="store",
     )
 
+    add_photo_download_args(parser)
     args = parser.parse_args()
 
     download_args = {}
@@ -249,25 +334,30 @@ def mhm_photo_download():
     if not args.abdomen:
         download_args["abdomen_photo"] = ""
 
-    df = pd.read_csv(args.input)
-    convert_dates_to_datetime(df)
+    df = read_data(args.input)
 
     if args.all:
-        download_mhm_photos(
+        targets = download_mhm_photos(
             df,
             args.out,
             include_in_name=args.nargs_include,
             additional_name_stem=args.name_additional,
+            workers=args.workers,
+            as_frame=True,
         )
     else:
-        download_mhm_photos(
+        targets = download_mhm_photos(
             df,
             args.out,
             **download_args,
             include_in_name=args.nargs_include,
-            additional_name_stem=args.name_additional
+            additional_name_stem=args.name_additional,
+            workers=args.workers,
+            as_frame=True,
         )
 
+    report_photo_failures(parser, targets)
+
 
 def lc_photo_download():
     parser = argparse.ArgumentParser(
@@ -323,6 +413,7 @@ def lc_photo_download():
         action="store",
     )
 
+    add_photo_download_args(parser)
     args = parser.parse_args()
 
     download_args = {}
@@ -339,21 +430,26 @@ def lc_photo_download():
     if not args.west:
         download_args["west_photo"] = ""
 
-    df = pd.read_csv(args.input)
-    convert_dates_to_datetime(df)
+    df = read_data(args.input)
 
     if args.all:
-        download_lc_photos(
+        targets = download_lc_photos(
             df,
             args.out,
             include_in_name=args.nargs_include,
             additional_name_stem=args.name_additional,
+            workers=args.workers,
+            as_frame=True,
         )
     else:
-        download_lc_photos(
+        targets = download_lc_photos(
             df,
             args.out,
             **download_args,
             include_in_name=args.nargs_include,
-            additional_name_stem=args.name_additional
+            additional_name_stem=args.name_additional,
+            workers=args.workers,
+            as_frame=True,
         )
+
+    report_photo_failures(parser, targets)
@@ -0,0 +1,239 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+__doc__ = """
+# Overview
+This submodule contains a persistent on-disk cache for GLOBE API responses. Passing a `cache_dir` to `go_utils.download.get_api_data` (or using the `--cache` flag of the download CLIs) stores the raw results of each query so that repeated analysis runs don't have to download the same data again.
+
+# Cache Entries
+Each entry is keyed on the normalized query (protocol, start date, end date, and bounding box) and stores the raw API results as gzip compressed JSON.
+
+Observations older than a few weeks essentially never change, so an entry whose end date lies more than `immutable_after` before the time it was downloaded is treated as historical and never expires. Entries that include recent dates expire after `default_ttl`.
+
+When the cache grows beyond `max_cache_bytes`, the least recently used entries are evicted first. Writing an entry checks the size of the cache at most once every `eviction_interval` per cache directory, so the cache can briefly exceed `max_cache_bytes` by the entries written in between.
+
+Several processes or threads can share a cache directory. Entries are written to a temporary file and then moved into place, and entries that are removed by another process while they are being read, marked as used, or evicted are skipped.
+"""
+
+default_ttl = timedelta(days=1)
+immutable_after = timedelta(days=30)
+max_cache_bytes = 2 * 1024**3
+eviction_interval = timedelta(minutes=1)
+
+_entry_suffix = ".json.gz"
+_last_evictions = {}
+_eviction_lock = threading.Lock()
+
+
+def get_cache_key(protocol, start_date, end_date, latlon_box=None):
+    """
+    Generates the cache key of a GLOBE API query. Equivalent queries (e.g. dates with different formatting or a bounding box with integer coordinates) share the same key.
+
+    Parameters
+    ----------
+    protocol : str
+        The GLOBE Observer Protocol of the query.
+    start_date : str
+        The start date of the query.
+    end_date : str
+        The end date of the query.
+    latlon_box : dict of {str, double}, optional
+        The bounding box of the query. None if the query isn't restricted to a bounding box.
+
+    Returns
+    -------
+    str
+        A hex digest identifying the query.
+    """
+    query = _normalize_query(protocol, start_date, end_date, latlon_box)
+    return hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()
+
+
+def _normalize_query(protocol, start_date, end_date, latlon_box):
+    return {
+        "protocol": protocol,
+        "start_date": pd.Timestamp(start_date).strftime("%Y-%m-%d"),
+        "end_date": pd.Timestamp(end_date).strftime("%Y-%m-%d"),
+        "latlon_box": (
+            {key: float(value) for key, value in latlon_box.items()}
+            if latlon_box
+            else None
+        ),
+    }
+
+
+def _entry_path(cache_dir, key):
+    return os.path.join(cache_dir, f"{key}{_entry_suffix}")
+
+
+def _is_expired(entry, fetched_at, ttl):
+    end = datetime.strptime(entry["query"]["end_date"], "%Y-%m-%d")
+    if fetched_at - end > immutable_after:
+        return False
+    return datetime.now() - fetched_at > ttl
+
+
+def read_cache(cache_dir, key, ttl=default_ttl):
+    """
+    Reads the raw results of a cached query.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory of the cache.
+    key : str
+        The key of the query (see [get_cache_key](#get_cache_key)).
+    ttl : datetime.timedelta, default=1 day
+        How long an entry containing recent observations stays valid.
+
+    Returns
+    -------
+    list of dict or None
+        The cached API results or None if the query isn't cached or has expired.
+    """
+    path = _entry_path(cache_dir, key)
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            entry = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if _is_expired(entry, datetime.fromtimestamp(entry["fetched_at"]), ttl):
+        _remove_entry(path)
+        return None
+
+    try:
+        # Marks the entry as recently used for the size based eviction
+        os.utime(path)
+    except FileNotFoundError:
+        # The entry was removed by another process after it was read
+        pass
+    return entry["results"]
+
+
+def _remove_entry(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        # Another process removed or evicted the entry in the meantime
+        pass
+
+
+def write_cache(cache_dir, key, query, results):
+    """
+    Stores the raw results of a query in the cache and evicts old entries if the cache has grown too large. The size of the cache is checked at most once every `eviction_interval`.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory of the cache. It is created if it doesn't exist.
+    key : str
+        The key of the query (see [get_cache_key](#get_cache_key)).
+    query : dict
+        The normalized query, stored alongside the results to determine whether the entry can expire.
+    results : list of dict
+        The raw results returned by the GLOBE API.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = {
+        "query": query,
+        "fetched_at": datetime.now().timestamp(),
+        "results": results,
+    }
+    path = _entry_path(cache_dir, key)
+    # Writes to a temporary file first so concurrent readers never see a partial entry
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+        json.dump(entry, file, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+    if _is_eviction_due(cache_dir):
+        evict_cache(cache_dir)
+
+
+def _is_eviction_due(cache_dir):
+    # Listing a large cache directory on every write is expensive, so eviction is throttled
+    cache_dir = os.path.abspath(cache_dir)
+    now = datetime.now()
+    with _eviction_lock:
+        last_eviction = _last_evictions.get(cache_dir)
+        if last_eviction is not None and now - last_eviction < eviction_interval:
+            return False
+        _last_evictions[cache_dir] = now
+    return True
+
+
+def _list_entries(cache_dir):
+    # Entries removed by another process while the directory is listed are skipped
+    try:
+        names = os.listdir(cache_dir)
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        if name.endswith(_entry_suffix):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+    return entries
+
+
+def evict_cache(cache_dir, max_bytes=max_cache_bytes):
+    """
+    Removes the least recently used entries until the cache is no larger than `max_bytes`.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory of the cache.
+    max_bytes : int, default=2 GiB
+        The maximum size of the cache in bytes. Use 0 to clear the cache.
+    """
+    entries = _list_entries(cache_dir)
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        _remove_entry(os.path.join(cache_dir, name))
+        total_size -= size
+
+
+def cached_query(cache_dir, protocol, start_date, end_date, latlon_box, download):
+    """
+    Returns the cached results of a query, downloading and storing them on a cache miss.
+
+    Parameters
+    ----------
+    cache_dir : str
+        The directory of the cache.
+    protocol : str
+        The GLOBE Observer Protocol of the query.
+    start_date : str
+        The start date of the query.
+    end_date : str
+        The end date of the query.
+    latlon_box : dict of {str, double} or None
+        The bounding box of the query.
+    download : callable
+        Called without arguments on a cache miss. Must return the raw API results.
+
+    Returns
+    -------
+    list of dict
+        The raw API results of the query.
+    """
+    query = _normalize_query(protocol, start_date, end_date, latlon_box)
+    key = get_cache_key(protocol, start_date, end_date, latlon_box)
+    results = read_cache(cache_dir, key)
+    if results is None:
+        results = download()
+        write_cache(cache_dir, key, query, results)
+    return results
@@ -1,8 +1,9 @@
 import logging
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
-from pytz import timezone
+from pytz import UnknownTimeZoneError, timezone
 from timezonefinder import TimezoneFinder
 
 __doc__ = """
@@ -40,19 +41,36 @@ The GLOBE API CSV’s lacked standardization in indicating No Data. Indicators r
 
 ## Round Appropriate Columns
 [This method](#round_cols) does the following:
-1. Identifies all numerical columns (e.g. `float64`, `float`, `int`, `int64`).
+1. Identifies all numerical columns (e.g. `float64`, `float`, `int`, `int64`, and sparse numerical columns).
 2. Rounds Latitudes and Longitude Columns to 5 places. To reduce data density, all latitude and longitude values were rounded to 5 decimal places. This corresponds to about a meter of accuracy. Furthermore, any larger number of decimal places consume unnecessary amounts of storage as the GLOBE Observer app cannot attain such precision.
-3. Converts other Numerical Data to Integers. To improve the datasets’ memory and performance, non latitude and longitude numerical values were converted to integers for the remaining columns, including `Id`, `MeasurementElevation`, and `elevation` columns.  This is appropriate since ids are always discrete values. `MeasurementElevation` and `elevation` are imprecise estimates from 3rd party sources, rendering additional precision an unnecessary waste of memory. However, by converting these values to integers, we could no longer use np.nan, a float, to denote extraneous/empty values. Thus, for integer columns, we used -9999 to denote extraneous/empty values.
+3. Converts other Numerical Data to Integers. To improve the datasets’ memory and performance, non latitude and longitude numerical values were converted to integers for the remaining columns, including `Id`, `MeasurementElevation`, and `elevation` columns.  This is appropriate since ids are always discrete values. `MeasurementElevation` and `elevation` are imprecise estimates from 3rd party sources, rendering additional precision an unnecessary waste of memory. However, by converting these values to integers, we could no longer use np.nan, a float, to denote extraneous/empty values. Thus, for integer columns, we used -9999 to denote extraneous/empty values. With `compact=True`, each integer column is stored with the smallest integer type that fits its values (e.g. `int8` for Land Cover percentages and `int32` for ids) instead of `int64`.
 
 **Note**: Larvae Counts were also converted to integers and Land Classification Column percentages were also converted to integers, reducing our data density. This logic is further discussed in go_utils.mhm.larvae_to_num for mosquito habitat mapper and go_utils.lc.unpack_classifications
 
+## Completeness Scores
+The cumulative completeness scores of `go_utils.mhm.completion_score_flag` and `go_utils.lc.completion_scores` are the share of non null values in each row. [This method](#build_completeness_index) stores the non null mask of every column along with the number of non null values in each row, so the scores can be recomputed without counting every column again. When only some columns change (e.g. after filling in a column), [this method](#update_completeness_index) updates the index for those columns only. The sub completeness scores count the set bits of the bit decimal flags with [this method](#count_set_bits), so the bit binary strings aren't needed.
+
 """
 
 
+@lru_cache(maxsize=None)
+def _get_timezone_finder():
+    return TimezoneFinder()
+
+
+@lru_cache(maxsize=65536)
+def _lookup_timezone(latitude, longitude):
+    return _get_timezone_finder().timezone_at(lng=longitude, lat=latitude)
+
+
 def adjust_timezones(df, time_col, latitude_col, longitude_col, inplace=False):
     """
     Calculates timezone offset and adjusts date columns accordingly. This is done because GLOBE data uses UTC timezones and it can be useful to have the time adjusted to the local observation time.
 
+    Most observations are made at a limited set of sites, so the timezone of each unique location (rounded to 5 decimal places) is only looked up once and cached between calls. The times of each timezone are then converted at once.
+
+    A `pytz.UnknownTimeZoneError` is raised if no timezone is found for a location.
+
     Parameters
     ----------
     df : pd.DataFrame
@@ -71,23 +89,39 @@ def adjust_timezones(df, time_col, latitude_col, longitude_col, inplace=False):
     pd.DataFrame or None
         A DataFrame with its time entry adjusted to its local timezone. If `inplace=True` it returns None.
     """
-    tf = TimezoneFinder()
-
-    def convert_timezone(time, latitude, longitude):
-        utc_tz = pd.to_datetime(time, utc=True)
-        local_time_zone = timezone(tf.timezone_at(lng=longitude, lat=latitude))
-        return utc_tz.astimezone(local_time_zone)
-
-    time_zone_converter = np.vectorize(convert_timezone)
-
     if not inplace:
         df = df.copy()
 
-    df[time_col] = time_zone_converter(
-        df[time_col].to_numpy(),
-        df[latitude_col].to_numpy(),
-        df[longitude_col].to_numpy(),
+    locations = pd.DataFrame(
+        {
+            "latitude": np.round(df[latitude_col].to_numpy(dtype=float), 5),
+            "longitude": np.round(df[longitude_col].to_numpy(dtype=float), 5),
+        }
     )
+    unique_locations = locations.drop_duplicates()
+    time_zones = pd.Series(
+        [
+            _lookup_timezone(latitude, longitude)
+            for latitude, longitude in unique_locations.itertuples(index=False)
+        ],
+        index=pd.MultiIndex.from_frame(unique_locations),
+    ).reindex(pd.MultiIndex.from_frame(locations))
+
+    utc_times = pd.Series(pd.to_datetime(df[time_col].to_numpy(), utc=True))
+    local_times = np.empty(len(df), dtype=object)
+    for time_zone, positions in utc_times.groupby(
+        time_zones.to_numpy(), dropna=False
+    ).indices.items():
+        if pd.isna(time_zone):
+            raise UnknownTimeZoneError(
+                f"No timezone was found for the location of row {df.index[positions[0]]}"
+            )
+        local_times[positions] = (
+            utc_times.iloc[positions]
+            .dt.tz_convert(timezone(time_zone))
+            .to_numpy(dtype=object)
+        )
+    df[time_col] = local_times
 
     if not inplace:
         return df
@@ -245,7 +279,45 @@ def rename_latlon_cols(
         return df
 
 
-def round_cols(df, inplace=False):
+compact_int_dtypes = [np.int8, np.int16, np.int32, np.int64]
+
+
+def _round_decimals(values, decimals):
+    rounded = np.round(values, decimals)
+    # np.round rounds the scaled value, so values that are (almost) exactly halfway can round differently from Python's round
+    scaled = values * 10**decimals
+    is_halfway = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    rounded[is_halfway] = [
+        round(value, decimals) for value in values[is_halfway].tolist()
+    ]
+    return rounded
+
+
+def _compact_int_dtype(values, fill_value=0):
+    low = min(values.min(), fill_value) if len(values) else fill_value
+    high = max(values.max(), fill_value) if len(values) else fill_value
+    for dtype in compact_int_dtypes:
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _round_sparse_cols(df, compact):
+    sparse_cols = [
+        name
+        for name, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.SparseDtype) and np.issubdtype(dtype.subtype, np.number)
+    ]
+    for name in sparse_cols:
+        logging.info(f"Converted to integer: {name}")
+        values = df[name].fillna(-9999).astype(pd.SparseDtype(int, 0))
+        if compact:
+            dtype = _compact_int_dtype(values.sparse.sp_values)
+            values = values.astype(pd.SparseDtype(dtype, 0))
+        df[name] = values
+
+
+def round_cols(df, inplace=False, compact=False):
     """This rounds columns in the DataFrame. More specifically, latitude and longitude data is rounded to 5 decimal places, other fields are rounded to integers, and null values (for the integer columns) are set to -9999.
 
     See [here](#round-appropriate-columns) for more information.
@@ -262,6 +334,8 @@ def round_cols(df, inplace=False):
         The DataFrame that requires rounding.
     inplace : bool, default=False
         Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+    compact : bool, default=False
+        Whether to store the integer columns with the smallest integer type that fits their values (`int8`, `int16`, `int32`, or `int64`) instead of `int64`. This greatly reduces the memory of wide DataFrames like the unpacked Land Cover data.
 
     Returns
     -------
@@ -281,15 +355,18 @@ def round_cols(df, inplace=False):
     ]
 
     # Rounds cols appropriately
-    column_round = np.vectorize(lambda x, digits: round(x, digits))
     for name in number_cols:
-        df[name] = df[name].fillna(-9999)
+        values = df[name].fillna(-9999).to_numpy()
         if ("latitude" in name.lower()) or ("longitude" in name.lower()):
             logging.info(f"Rounded to 5 decimals: {name}")
-            df[name] = column_round(df[name].to_numpy(), 5)
+            df[name] = _round_decimals(values, 5)
         else:
             logging.info(f"Converted to integer: {name}")
-            df[name] = df[name].to_numpy().astype(int)
+            values = values.astype(int)
+            df[name] = values.astype(_compact_int_dtype(values)) if compact else values
+
+    # Sparse columns (e.g. unpacked Land Cover classifications) stay sparse
+    _round_sparse_cols(df, compact)
 
     if not inplace:
         return df
@@ -339,3 +416,147 @@ def standardize_null_vals(df, null_val=np.nan, inplace=False):
 
     if not inplace:
         return df
+
+
+def build_completeness_index(df):
+    """
+    Stores the non null mask of each column and the number of non null values in each row. These are used to compute the cumulative completeness scores.
+
+    See [here](#completeness-scores) for more information.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame to index.
+
+    Returns
+    -------
+    dict
+        The non null `masks` of each column and the non null `counts` of each row.
+    """
+    completeness_index = {"masks": {}, "counts": np.zeros(len(df), dtype=int)}
+    update_completeness_index(completeness_index, df, df.columns)
+    return completeness_index
+
+
+def update_completeness_index(completeness_index, df, columns):
+    """
+    Updates a completeness index (see [build_completeness_index](#build_completeness_index)) for columns that were added, changed, or removed from a DataFrame. The other columns aren't read again.
+
+    Parameters
+    ----------
+    completeness_index : dict
+        The completeness index of the DataFrame. It is updated in place.
+    df : pd.DataFrame
+        The DataFrame the index was built from.
+    columns : list of str
+        The columns that have changed. Columns that are no longer in the DataFrame are removed from the index.
+    """
+    masks, counts = completeness_index["masks"], completeness_index["counts"]
+    if len(counts) != len(df):
+        raise ValueError(
+            f"The completeness index has {len(counts)} rows but the DataFrame has {len(df)} rows."
+        )
+    for column in columns:
+        if column in masks:
+            counts -= masks.pop(column)
+        if column in df.columns:
+            masks[column] = df[column].notna().to_numpy(dtype=bool)
+            counts += masks[column]
+
+
+def get_cumulative_scores(completeness_index):
+    """
+    Computes the cumulative completeness score of each row: the share of its values that aren't null, rounded to 2 decimal places.
+
+    Parameters
+    ----------
+    completeness_index : dict
+        The completeness index of the DataFrame (see [build_completeness_index](#build_completeness_index)).
+
+    Returns
+    -------
+    np.ndarray of float
+        The cumulative completeness score of each row.
+    """
+    return np.round(
+        completeness_index["counts"] / max(len(completeness_index["masks"]), 1), 2
+    )
+
+
+# The number of set bits of every 8 bit integer
+_set_bit_counts = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def count_set_bits(bit_decimals):
+    """
+    Counts the set bits of bit decimal flags (e.g. `mhm_PhotoBitDecimal`) by looking up the count of each 8 bit flag in a table.
+
+    Parameters
+    ----------
+    bit_decimals : array-like of int
+        The bit decimal flags, which must fit in an unsigned 8 bit integer.
+
+    Returns
+    -------
+    np.ndarray of int
+        The number of set bits of each flag.
+    """
+    return _set_bit_counts[np.asarray(bit_decimals, dtype=np.uint8)]
+
+
+def count_occurrences(values, substrings):
+    """
+    Counts the occurrences of substrings in each value of a column (e.g. the number of photos in a `;` separated list of photo urls). The values are joined into a single array of characters, so each substring is searched for in one pass over the whole column instead of value by value.
+
+    Parameters
+    ----------
+    values : pd.Series of str
+        The values to search. Null values have no occurrences.
+    substrings : list of str
+        The substrings to count. Overlapping occurrences of a substring are all counted.
+
+    Returns
+    -------
+    list of np.ndarray of int
+        The number of occurrences in each value for each substring.
+    """
+    texts = values.fillna("").astype(str)
+    text = "".join(texts)
+    if text.isascii():
+        characters = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+    else:
+        characters = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    ends = np.cumsum(np.fromiter(map(len, texts), dtype=int, count=len(texts)))
+
+    occurrences = []
+    for substring in substrings:
+        num_starts = max(len(characters) - len(substring) + 1, 0)
+        starts = np.flatnonzero(characters[:num_starts] == ord(substring[0]))
+        for offset, character in enumerate(substring[1:], 1):
+            starts = starts[characters[starts + offset] == ord(character)]
+        rows = np.searchsorted(ends, starts, side="right")
+        # Drops the occurrences that span two values
+        rows = rows[starts + len(substring) <= ends[rows]]
+        occurrences.append(np.bincount(rows, minlength=len(texts)))
+    return occurrences
+
+
+def get_bit_binary(bit_decimals, num_bits):
+    """
+    Converts bit decimal flags (e.g. `lc_PhotoBitDecimal`) into their bit binary strings (e.g. `lc_PhotoBitBinary`).
+
+    Parameters
+    ----------
+    bit_decimals : np.ndarray of int
+        The bit decimal flags.
+    num_bits : int
+        The number of bits of the flags. The bit binary strings are padded with zeros to this length.
+
+    Returns
+    -------
+    np.ndarray of str
+        The bit binary string of each flag.
+    """
+    bit_binaries = np.array([format(i, f"0{num_bits}b") for i in range(2**num_bits)])
+    return bit_binaries[bit_decimals]
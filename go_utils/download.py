@@ -1,10 +1,18 @@
+import csv
 import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 
 import go_utils.lc as lc
 import go_utils.mhm as mhm
+from go_utils.cache import cached_query
 from go_utils.constants import (
     end_date,
     landcover_protocol,
@@ -12,6 +20,15 @@ from go_utils.constants import (
     start_date,
 )
 
+api_url = "https://api.globe.gov/search/v1/measurement/protocol/measureddate/"
+
+chunk_offsets = {
+    "year": pd.offsets.YearBegin(),
+    "month": pd.offsets.MonthBegin(),
+    "week": pd.offsets.Week(weekday=0),
+    "day": pd.offsets.Day(),
+}
+
 
 def parse_api_data(response_json):
     try:
@@ -20,6 +37,10 @@ def parse_api_data(response_json):
     except KeyError:
         raise RuntimeError("Data Download Failed. The GLOBE API is most likely down.")
 
+    # Date ranges without any observations have nothing to expand
+    if df.empty:
+        return df
+
     # Expand the 'data' column by listing the contents and passing as a new dataframe
     df = pd.concat([df, pd.DataFrame(list(df["data"]))], axis=1)
     # Drop the previously nested data column
@@ -45,12 +66,263 @@ def is_valid_latlon_box(latlon_box):
     return valid_lon_checks and valid_lat_checks
 
 
+def _get_api_url(protocol, start_date, end_date, latlon_box):
+    if latlon_box is not None:
+        return f"{api_url}lat/lon/?protocols={protocol}&startdate={start_date}&enddate={end_date}&minlat={str(latlon_box['min_lat'])}&maxlat={str(latlon_box['max_lat'])}&minlon={str(latlon_box['min_lon'])}&maxlon={str(latlon_box['max_lon'])}&geojson=FALSE&sample=FALSE"
+    return f"{api_url}?protocols={protocol}&startdate={start_date}&enddate={end_date}&geojson=FALSE&sample=FALSE"
+
+
+def _check_latlon_box(latlon_box):
+    if is_valid_latlon_box(latlon_box):
+        return latlon_box
+    logging.warning(
+        "You did not enter any valid/specific coordinates, so we gave you all the observations for your protocol, date_range, and any countryNames you may have specified.\n"
+    )
+    return None
+
+
+def create_session(pool_size=10, retries=3):
+    """
+    Creates a `requests.Session` whose connections are kept alive and shared between requests. The session can be used from multiple threads at once.
+
+    Parameters
+    ----------
+    pool_size : int, default=10
+        The maximum number of connections kept open per host. This should be at least the number of threads using the session.
+    retries : int, default=3
+        The number of times a failed connection is retried.
+
+    Returns
+    -------
+    requests.Session
+        A session with a pooled adapter mounted for http and https urls.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _request_api_results(url, session=None):
+    # Downloads data from the GLOBE API
+    if session is None:
+        response = requests.get(url)
+    else:
+        response = session.get(url)
+
+    if not response:
+        raise RuntimeError(
+            "Failed to get data from the API. Double check your specified settings to make sure they are valid."
+        )
+
+    response_json = response.json()
+    if "results" not in response_json:
+        raise RuntimeError("Data Download Failed. The GLOBE API is most likely down.")
+    return response_json["results"]
+
+
+def _download_api_data(protocol, date_range, latlon_box, session=None, cache_dir=None):
+    url = _get_api_url(protocol, *date_range, latlon_box)
+    if cache_dir:
+        results = cached_query(
+            cache_dir,
+            protocol,
+            *date_range,
+            latlon_box,
+            lambda: _request_api_results(url, session),
+        )
+    else:
+        results = _request_api_results(url, session)
+
+    # Convert measured date data into datetime
+    df = parse_api_data({"results": results})
+    convert_dates_to_datetime(df)
+    return df
+
+
+def split_date_range(start_date, end_date, chunk="month"):
+    """
+    Splits a date range into consecutive, non-overlapping date ranges. Each range is inclusive of its start and end date, which matches how the GLOBE API treats `startdate` and `enddate`.
+
+    Parameters
+    ----------
+    start_date : str
+        The start date of the full range in the format of (YYYY-MM-DD).
+    end_date : str
+        The end date of the full range in the format of (YYYY-MM-DD).
+    chunk : str, {"year", "month", "week", "day"}, default="month"
+        The calendar period each range should cover. Ranges are aligned to the start of each period (e.g. the first of the month), so the first and last ranges may be shorter.
+
+    Returns
+    -------
+    list of tuple of str
+        The (start date, end date) pairs in chronological order.
+    """
+    if chunk not in chunk_offsets:
+        raise ValueError(
+            f"Invalid chunk '{chunk}', must be one of: {', '.join(chunk_offsets)}."
+        )
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    if start > end:
+        return []
+
+    boundaries = pd.date_range(start, end, freq=chunk_offsets[chunk])
+    chunk_starts = [start] + [boundary for boundary in boundaries if boundary > start]
+    chunk_ends = [boundary - pd.Timedelta(days=1) for boundary in chunk_starts[1:]]
+    chunk_ends.append(end)
+
+    return [
+        (chunk_start.strftime("%Y-%m-%d"), chunk_end.strftime("%Y-%m-%d"))
+        for chunk_start, chunk_end in zip(chunk_starts, chunk_ends)
+    ]
+
+
+def _adaptive_date_ranges(start_date, end_date, target_rows, initial_days=31):
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    window_days = initial_days
+    while start <= end:
+        chunk_end = min(start + pd.Timedelta(days=window_days - 1), end)
+        num_rows = yield start.strftime("%Y-%m-%d"), chunk_end.strftime("%Y-%m-%d")
+        # Resizes the next window so it is expected to return around target_rows entries
+        if num_rows:
+            scale = target_rows / num_rows
+            window_days = int(min(max(window_days * min(scale, 2), 1), 366))
+        else:
+            window_days = min(window_days * 2, 366)
+        start = chunk_end + pd.Timedelta(days=1)
+
+
+def iter_api_data(
+    protocol,
+    start_date=start_date,
+    end_date=end_date,
+    is_clean=True,
+    latlon_box={"min_lat": -90, "max_lat": 90, "min_lon": -180, "max_lon": 180},
+    chunk="month",
+    target_rows=10000,
+    workers=1,
+    session=None,
+    cache_dir=None,
+):
+    """Downloads GLOBE API data one date range at a time. Each date range is requested, parsed, and yielded before the next one is downloaded, so only a single chunk of the response is held in memory at once.
+
+    This is the streaming API of the submodule: iterating over the chunks (e.g. with [write_data_chunks](#write_data_chunks)) keeps the memory use bounded by the size of a single chunk, no matter how large the date range is.
+
+    Do note that each chunk is cleaned independently. Homogenous columns are kept so that every chunk has the same columns, except for Landcover classification columns which are only added for the classifications in the chunk. Use [get_api_data](#get_api_data) with the `chunk` parameter if you need a single consistently cleaned DataFrame.
+
+    Parameters
+    ----------
+    protocol : str
+               The desired GLOBE Observer Protocol. See [get_api_data](#get_api_data) for the supported protocols.
+    start_date : str, default= 2017-05-31
+                 The desired start date of the dataset in the format of (YYYY-MM-DD).
+    end_date : str, default= today's date in YYYY-MM-DD form.
+               The desired end date of the dataset in the format of (YYYY-MM-DD).
+    is_clean : bool, default=True
+               Whether each chunk should be cleaned and flagged.
+    latlon_box : dict of {str, double}, optional
+                 The longitudes and latitudes of a bounding box for the dataset. The minimum/maximum latitudes and longitudes must be specified with the following keys: "min_lat", "min_lon", "max_lat", "max_lon". The default value specifies all latitude and longitude coordinates.
+    chunk : str, {"year", "month", "week", "day", "adaptive"}, default="month"
+            The date range each request covers. `"adaptive"` resizes each date range based on the number of entries the previous request returned.
+    target_rows : int, default=10000
+                  The desired number of entries per request when `chunk="adaptive"`.
+    workers : int, default=1
+              The number of date ranges that are downloaded concurrently. The chunks are still yielded in chronological order. Adaptive chunks are always downloaded one at a time as each date range depends on the previous response.
+    session : requests.Session, optional
+              The session used for the requests. If `workers` is greater than 1 and no session is given, a pooled session is created with [create_session](#create_session) and closed once the iteration ends.
+    cache_dir : str, optional
+                A directory used to cache the raw API responses of each chunk. See `go_utils.cache` for more information.
+
+    Yields
+    ------
+    pd.DataFrame
+      A DataFrame containing the GLOBE Observer Data of a single date range. Date ranges without any observations are skipped.
+    """
+    latlon_box = _check_latlon_box(latlon_box)
+
+    created_session = None
+    if chunk == "adaptive":
+        chunks = _iter_adaptive_chunks(
+            protocol, start_date, end_date, latlon_box, target_rows, session, cache_dir
+        )
+    else:
+        date_ranges = split_date_range(start_date, end_date, chunk)
+        if workers > 1 and session is None:
+            session = created_session = create_session(workers)
+        download_args = (protocol, latlon_box, session, cache_dir)
+        if workers > 1:
+            chunks = _iter_parallel_chunks(date_ranges, workers, download_args)
+        else:
+            chunks = (
+                _download_api_data(protocol, date_range, latlon_box, session, cache_dir)
+                for date_range in date_ranges
+            )
+
+    try:
+        for df in chunks:
+            if df.empty:
+                continue
+            if is_clean:
+                df = default_data_clean(df, protocol, remove_homogenous=False)
+            yield df
+    finally:
+        # Waits for the pending requests before the created session is closed,
+        # even if the chunks weren't fully consumed
+        chunks.close()
+        if created_session is not None:
+            created_session.close()
+
+
+def _iter_adaptive_chunks(
+    protocol, start_date, end_date, latlon_box, target_rows, session, cache_dir
+):
+    date_ranges = _adaptive_date_ranges(start_date, end_date, target_rows)
+    try:
+        date_range = next(date_ranges)
+        while True:
+            df = _download_api_data(
+                protocol, date_range, latlon_box, session, cache_dir
+            )
+            yield df
+            date_range = date_ranges.send(len(df))
+    except StopIteration:
+        return
+
+
+def _iter_parallel_chunks(date_ranges, workers, download_args):
+    # Only keeps a bounded number of requests in flight and yields them in the order of the date ranges
+    protocol, latlon_box, session, cache_dir = download_args
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for date_range in date_ranges:
+            pending.append(
+                executor.submit(
+                    _download_api_data,
+                    protocol,
+                    date_range,
+                    latlon_box,
+                    session,
+                    cache_dir,
+                )
+            )
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
 def get_api_data(
     protocol,
     start_date=start_date,
     end_date=end_date,
     is_clean=True,
     latlon_box={"min_lat": -90, "max_lat": 90, "min_lon": -180, "max_lon": 180},
+    chunk=None,
+    workers=1,
+    cache_dir=None,
 ):
     """Utility function for interfacing with the GLOBE API.
     More information about the API can be viewed [here](https://www.globe.gov/es/globe-data/globe-api).
@@ -65,6 +337,12 @@ def get_api_data(
                The desired end date of the dataset in the format of (YYYY-MM-DD).
     latlon_box : dict of {str, double}, optional
                  The longitudes and latitudes of a bounding box for the dataset. The minimum/maximum latitudes and longitudes must be specified with the following keys: "min_lat", "min_lon", "max_lat", "max_lon". The default value specifies all latitude and longitude coordinates.
+    chunk : str, {"year", "month", "week", "day", "adaptive"}, optional
+            If specified, the date range is downloaded in pieces of this size (see [iter_api_data](#iter_api_data)) instead of in a single request. The raw pieces are combined before cleaning, so the result is the same as an unchunked download while the raw API responses never have to be held in memory all at once. The combined DataFrame still has to fit in memory; use [iter_api_data](#iter_api_data) to process or [write](#write_data_chunks) the data one chunk at a time instead.
+    workers : int, default=1
+              The number of chunks downloaded concurrently over a shared connection pool. If `workers` is greater than 1 and no `chunk` is specified, the data is downloaded in monthly chunks.
+    cache_dir : str, optional
+                A directory used to cache the raw API responses. Repeated queries are then read from disk instead of being downloaded again. See `go_utils.cache` for more information.
 
     Returns
     -------
@@ -72,25 +350,30 @@ def get_api_data(
       A DataFrame containing Raw GLOBE Observer Data of the specified parameters
     """
 
-    if is_valid_latlon_box(latlon_box):
-        url = f"https://api.globe.gov/search/v1/measurement/protocol/measureddate/lat/lon/?protocols={protocol}&startdate={start_date}&enddate={end_date}&minlat={str(latlon_box['min_lat'])}&maxlat={str(latlon_box['max_lat'])}&minlon={str(latlon_box['min_lon'])}&maxlon={str(latlon_box['max_lon'])}&geojson=FALSE&sample=FALSE"
-    else:
-        logging.warning(
-            "You did not enter any valid/specific coordinates, so we gave you all the observations for your protocol, date_range, and any countryNames you may have specified.\n"
-        )
-        url = f"https://api.globe.gov/search/v1/measurement/protocol/measureddate/?protocols={protocol}&startdate={start_date}&enddate={end_date}&geojson=FALSE&sample=FALSE"
-
-    # Downloads data from the GLOBE API
-    response = requests.get(url)
+    if workers > 1 and not chunk:
+        chunk = "month"
 
-    if not response:
-        raise RuntimeError(
-            "Failed to get data from the API. Double check your specified settings to make sure they are valid."
+    if chunk:
+        chunks = list(
+            iter_api_data(
+                protocol,
+                start_date=start_date,
+                end_date=end_date,
+                is_clean=False,
+                latlon_box=latlon_box,
+                chunk=chunk,
+                workers=workers,
+                cache_dir=cache_dir,
+            )
+        )
+        if not chunks:
+            return pd.DataFrame()
+        df = pd.concat(chunks, ignore_index=True)
+    else:
+        latlon_box = _check_latlon_box(latlon_box)
+        df = _download_api_data(
+            protocol, (start_date, end_date), latlon_box, cache_dir=cache_dir
         )
-
-    # Convert measured date data into datetime
-    df = parse_api_data(response.json())
-    convert_dates_to_datetime(df)
 
     if is_clean:
         df = default_data_clean(df, protocol)
@@ -103,12 +386,311 @@ def convert_dates_to_datetime(df):
         df[column] = pd.to_datetime(df[column], errors="coerce")
 
 
-def default_data_clean(df, protocol):
+def default_data_clean(df, protocol, remove_homogenous=True, homogenous_exclude=[]):
     module_mapper = {mosquito_protocol: mhm, landcover_protocol: lc}
     if protocol in module_mapper:
-        df = module_mapper[protocol].apply_cleanup(df)
+        cleanup_args = {}
+        if protocol == landcover_protocol:
+            # Only the Landcover cleanup removes homogenous columns
+            cleanup_args["remove_homogenous"] = remove_homogenous
+            cleanup_args["homogenous_exclude"] = homogenous_exclude
+        df = module_mapper[protocol].apply_cleanup(df, **cleanup_args)
         df = module_mapper[protocol].add_flags(df)
     else:
         logging.warning("The protocol you entered is not supported for cleanup.")
 
     return df
+
+
+csv_rewrite_rows = 100000
+
+file_formats = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+}
+
+
+def get_file_format(path, file_format=None):
+    """
+    Determines the format of a data file from its extension.
+
+    Parameters
+    ----------
+    path : str
+           The path of the data file.
+    file_format : str, {"csv", "parquet", "feather"}, optional
+                  Overrides the format inferred from the extension.
+
+    Returns
+    -------
+    str
+      The format of the file. Files with an unknown extension are treated as CSV.
+    """
+    if file_format:
+        if file_format not in file_formats.values():
+            raise ValueError(
+                f"Invalid file format '{file_format}', the supported formats are 'csv', 'parquet', and 'feather'."
+            )
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    return file_formats.get(extension, "csv")
+
+
+def write_data(df, path, file_format=None, append=False):
+    """
+    Writes GLOBE Observer data to a file. Parquet and Feather files preserve the dtypes of the DataFrame (e.g. the datetime and flag columns) and are much faster to write and reload than CSV files, especially for unpacked Land Cover data. They require `pyarrow` (`pip install go-utils[parquet]`).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+         The DataFrame to write.
+    path : str
+           The path of the output file.
+    file_format : str, {"csv", "parquet", "feather"}, optional
+                  The format of the output file. By default, the format is inferred from the extension of `path` (`.parquet`/`.pq`, `.feather`, anything else is written as CSV).
+    append : bool, default=False
+             Appends the rows to an existing CSV file without writing the header. Only supported for CSV files.
+    """
+    file_format = get_file_format(path, file_format)
+    if append and file_format != "csv":
+        raise ValueError(f"Appending isn't supported for {file_format} files.")
+
+    if file_format == "parquet":
+        df.to_parquet(path, index=False)
+    elif file_format == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(
+            path,
+            mode="a" if append else "w",
+            header=not append,
+            sep=",",
+            index=False,
+            encoding="utf-8",
+            quoting=csv.QUOTE_ALL,
+            quotechar='"',
+            escapechar="”",
+        )
+
+
+def read_data(path, file_format=None, columns=None):
+    """
+    Reads GLOBE Observer data written by [write_data](#write_data) (or any CSV file of GLOBE Observer data). Date columns of CSV files are converted to datetimes, while Parquet and Feather files are loaded with their stored dtypes.
+
+    Parameters
+    ----------
+    path : str
+           The path of the data file.
+    file_format : str, {"csv", "parquet", "feather"}, optional
+                  The format of the file. By default, the format is inferred from the extension of `path`.
+    columns : list of str, optional
+              Only reads these columns.
+
+    Returns
+    -------
+    pd.DataFrame
+      The stored GLOBE Observer data.
+    """
+    file_format = get_file_format(path, file_format)
+    if file_format == "parquet":
+        return pd.read_parquet(path, columns=columns)
+    if file_format == "feather":
+        return pd.read_feather(path, columns=columns)
+
+    df = pd.read_csv(path, usecols=columns)
+    convert_dates_to_datetime(df)
+    return df
+
+
+def _is_classification_column(column):
+    return re.search(r"_(North|South|East|West|Overall)_", column) is not None
+
+
+def _align_columns(df, columns):
+    # Classification percentages missing from a chunk are 0, other missing columns are left empty
+    missing = [column for column in columns if column not in df.columns]
+    df = df.reindex(columns=columns)
+    for column in missing:
+        if _is_classification_column(column):
+            df[column] = 0.0
+    return df
+
+
+def _rewrite_csv(path, columns):
+    # Streams the stored rows into a file with the new header, so the file is never fully loaded
+    temp_path = f"{path}.tmp"
+    write_data(pd.DataFrame(columns=columns), temp_path, "csv")
+    parts = pd.read_csv(
+        path, dtype=str, keep_default_na=False, chunksize=csv_rewrite_rows
+    )
+    for part in parts:
+        write_data(_align_columns(part, columns), temp_path, "csv", append=True)
+    os.replace(temp_path, path)
+
+
+def _write_csv_chunks(chunks, path):
+    columns, num_rows = None, 0
+    for df in chunks:
+        if columns is None:
+            columns = df.columns
+            write_data(df, path, "csv")
+        else:
+            new_columns = df.columns.difference(columns, sort=False)
+            if len(new_columns):
+                columns = columns.append(new_columns)
+                _rewrite_csv(path, columns)
+            write_data(_align_columns(df, columns), path, "csv", append=True)
+        num_rows += len(df)
+
+    if columns is None:
+        write_data(pd.DataFrame(), path, "csv")
+    return num_rows
+
+
+def _unify_arrow_types(current, new):
+    import pyarrow as pa
+
+    if current == new or pa.types.is_null(new):
+        return current
+    if pa.types.is_null(current):
+        return new
+    if pa.types.is_integer(current) and pa.types.is_integer(new):
+        return pa.int64()
+    numeric_types = (pa.types.is_integer, pa.types.is_floating)
+    if any(is_type(current) for is_type in numeric_types) and any(
+        is_type(new) for is_type in numeric_types
+    ):
+        return pa.float64()
+    return pa.string()
+
+
+def _unify_arrow_schemas(schema, new_schema):
+    import pyarrow as pa
+
+    fields = [
+        (
+            pa.field(
+                field.name,
+                _unify_arrow_types(field.type, new_schema.field(field.name).type),
+            )
+            if field.name in new_schema.names
+            else field
+        )
+        for field in schema
+    ]
+    fields += [field for field in new_schema if field.name not in schema.names]
+    return pa.schema(fields)
+
+
+def _conform_table(table, schema):
+    import pyarrow as pa
+
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            columns.append(table[field.name].cast(field.type))
+        elif _is_classification_column(field.name):
+            columns.append(pa.array(np.zeros(table.num_rows)).cast(field.type))
+        else:
+            columns.append(pa.nulls(table.num_rows, field.type))
+    return pa.table(columns, schema=schema)
+
+
+def _open_arrow_writer(path, schema, file_format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format == "parquet":
+        return pq.ParquetWriter(path, schema)
+    return pa.ipc.new_file(path, schema)
+
+
+def _iter_arrow_tables(path, file_format):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_format == "parquet":
+        with pq.ParquetFile(path) as parquet_file:
+            for batch in parquet_file.iter_batches():
+                yield pa.Table.from_batches([batch])
+    else:
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield pa.Table.from_batches([reader.get_batch(i)])
+
+
+def _rewrite_arrow_file(path, schema, file_format):
+    # Copies the stored batches into a file with the new schema and keeps its writer open
+    old_path = f"{path}.old"
+    os.replace(path, old_path)
+    writer = _open_arrow_writer(path, schema, file_format)
+    for table in _iter_arrow_tables(old_path, file_format):
+        writer.write_table(_conform_table(table, schema))
+    os.remove(old_path)
+    return writer
+
+
+def _write_arrow_chunks(chunks, path, file_format):
+    import pyarrow as pa
+
+    temp_path = f"{path}.tmp"
+    writer, schema, num_rows = None, None, 0
+    try:
+        for df in chunks:
+            table = pa.Table.from_pandas(
+                df, preserve_index=False
+            ).replace_schema_metadata()
+            if writer is None:
+                schema = table.schema
+                writer = _open_arrow_writer(temp_path, schema, file_format)
+            elif not table.schema.equals(schema):
+                new_schema = _unify_arrow_schemas(schema, table.schema)
+                if not new_schema.equals(schema):
+                    writer.close()
+                    writer = _rewrite_arrow_file(temp_path, new_schema, file_format)
+                    schema = new_schema
+            writer.write_table(_conform_table(table, schema))
+            num_rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        # Writes an empty file when there were no chunks
+        _open_arrow_writer(temp_path, pa.schema([]), file_format).close()
+    os.replace(temp_path, path)
+    return num_rows
+
+
+def write_data_chunks(chunks, path, file_format=None):
+    """
+    Writes GLOBE Observer data to a file one chunk at a time, so that only a single chunk is held in memory at once. This is meant for the chunks of [iter_api_data](#iter_api_data), for example:
+    ```python
+    from go_utils.download import iter_api_data, write_data_chunks
+
+    write_data_chunks(iter_api_data("land_covers"), "lc.parquet")
+    ```
+
+    The columns of the file are the columns of the first chunk. If a later chunk contains new columns (e.g. a new Landcover classification), the rows that were already written are copied into a file with the new columns. Columns a chunk lacks are left empty, except for Landcover classification percentages, which are set to 0. Parquet and Feather columns whose dtypes differ between chunks are stored with a common type (e.g. integer and float columns as floats).
+
+    Parameters
+    ----------
+    chunks : iterable of pd.DataFrame
+             The DataFrames to write.
+    path : str
+           The path of the output file.
+    file_format : str, {"csv", "parquet", "feather"}, optional
+                  The format of the output file. By default, the format is inferred from the extension of `path`. Parquet and Feather files require `pyarrow`.
+
+    Returns
+    -------
+    int
+      The number of written rows.
+    """
+    file_format = get_file_format(path, file_format)
+    if file_format == "csv":
+        return _write_csv_chunks(chunks, path)
+    return _write_arrow_chunks(chunks, path, file_format)
@@ -1,5 +1,8 @@
+from itertools import chain
+
 import numpy as np
-from pandas.api.types import is_hashable
+import pandas as pd
+from pandas.api.types import is_list_like
 
 __doc__ = """
 # Overview
@@ -44,15 +47,15 @@ def filter_out_entries(df, mask, include, inplace):
         final_mask = mask
     else:
         final_mask = ~mask
-    filtered_df = df[final_mask]
     if not inplace:
-        return filtered_df
-    else:
-        df.mask(~df.isin(filtered_df), inplace=True)
-        df.dropna(how="all", inplace=True)
-        for col in df.columns:
-            if df[col].dtype != filtered_df[col].dtype:
-                df[col] = df[col].astype(filtered_df[col].dtype)
+        return df[final_mask]
+
+    # Drops the rows by position so that duplicate index labels are handled correctly
+    final_mask = np.asarray(final_mask, dtype=bool)
+    index = df.index
+    df.reset_index(drop=True, inplace=True)
+    df.drop(index=np.flatnonzero(~final_mask), inplace=True)
+    df.index = index[final_mask]
 
 
 def filter_invalid_coords(
@@ -100,7 +103,25 @@ def filter_invalid_coords(
     return filter_out_entries(df, mask, True, inplace)
 
 
-def filter_duplicates(df, columns, group_size, keep_first=True, inplace=False):
+def _get_duplicate_groups(df, columns):
+    # Entries with missing values in `columns` aren't grouped and get a code of -1
+    codes = df.groupby(by=columns, sort=False).ngroup()
+    codes = codes.fillna(-1).to_numpy(dtype=np.int64)
+    grouped = codes >= 0
+    sizes = np.zeros(len(codes), dtype=np.int64)
+    sizes[grouped] = np.bincount(codes[grouped])[codes[grouped]]
+    return codes, sizes
+
+
+def filter_duplicates(
+    df,
+    columns,
+    group_size,
+    keep_first=True,
+    inplace=False,
+    group_id_col=None,
+    group_size_col=None,
+):
     """
     Filters possible duplicate data by grouping together suspiciously similar entries.
 
@@ -112,8 +133,14 @@ def filter_duplicates(df, columns, group_size, keep_first=True, inplace=False):
         The name of the columns that duplicate data would share. This can include things such as MGRS Latitude, MGRS Longitude, measure date, and other fields (e.g. mosquito water source for mosquito habitat mapper).
     group_size : int
         The number of duplicate entries in a group needed to classify the group as duplicate data.
+    keep_first : bool, default=True
+        Whether to keep the first entry of each duplicate group.
     inplace : bool, default=False
         Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+    group_id_col : str, optional
+        If given, a column with this name is added containing the ID of the group each entry belongs to. Entries with missing values in `columns` aren't grouped and get a missing ID.
+    group_size_col : str, optional
+        If given, a column with this name is added containing the size of the group each entry belongs to. Entries with missing values in `columns` get a missing size.
 
     Returns
     -------
@@ -124,12 +151,19 @@ def filter_duplicates(df, columns, group_size, keep_first=True, inplace=False):
     if not inplace:
         df = df.copy()
 
-    # groups / filters suspected events
-    suspect_df = df.groupby(by=columns).filter(lambda x: len(x) >= group_size)
+    codes, sizes = _get_duplicate_groups(df, columns)
+    if group_id_col:
+        df[group_id_col] = pd.array(codes, dtype="Int64")
+        df[group_id_col] = df[group_id_col].mask(codes < 0)
+    if group_size_col:
+        df[group_size_col] = pd.array(sizes, dtype="Int64")
+        df[group_size_col] = df[group_size_col].mask(codes < 0)
+
+    suspect_mask = sizes >= group_size
     if keep_first:
-        suspect_df = suspect_df.groupby(by=columns, as_index=False).nth[1:]
-    suspect_mask = df.isin(suspect_df)
-    suspect_mask = np.any(suspect_mask, axis=1)
+        # Groups are numbered in order of appearance, so an entry is the first of its group if its code exceeds all previous codes
+        previous_max = np.maximum.accumulate(np.concatenate([[-1], codes[:-1]]))
+        suspect_mask &= codes <= previous_max
 
     return filter_out_entries(df, suspect_mask, False, inplace)
 
@@ -166,29 +200,69 @@ def filter_poor_geolocational_data(
         A DataFrame with bad latitude and longitude entries removed. If `inplace=True` it returns None.
     """
 
-    def geolocational_filter(gps_lat, gps_lon, recorded_lat, recorded_lon):
-        return (
-            (recorded_lat == gps_lat and recorded_lon == gps_lon)
-            or gps_lat == int(gps_lat)
-            or gps_lon == int(gps_lon)
-        )
-
     if not inplace:
         df = df.copy()
 
-    vectorized_filter = np.vectorize(geolocational_filter)
-    bad_data = vectorized_filter(
-        df[latitude_col].to_numpy(),
-        df[longitude_col].to_numpy(),
-        df[mgrs_latitude_col].to_numpy(),
-        df[mgrs_longitude_col].to_numpy(),
+    gps_lat = df[latitude_col].to_numpy(dtype=float)
+    gps_lon = df[longitude_col].to_numpy(dtype=float)
+    bad_data = (
+        (df[mgrs_latitude_col].to_numpy(dtype=float) == gps_lat)
+        & (df[mgrs_longitude_col].to_numpy(dtype=float) == gps_lon)
+        | (gps_lat == np.trunc(gps_lat))
+        | (gps_lon == np.trunc(gps_lon))
     )
 
     return filter_out_entries(df, bad_data, False, inplace)
 
 
+def _is_team_list(teams):
+    # Entries without teams are NaN instead of lists
+    return np.fromiter(map(is_list_like, teams), dtype=bool, count=len(teams))
+
+
+def build_team_index(df, globe_teams_column):
+    """
+    Indexes the rows of a DataFrame by the GLOBE teams they belong to. Building the index once is faster than searching every team list when filtering the same DataFrame by several teams (see [filter_by_globe_team](#filter_by_globe_team)).
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame to index
+    globe_teams_column : str
+        The column containing the GLOBE teams.
+
+    Returns
+    -------
+    dict of {str, np.ndarray}
+        The positions of the rows that contain each GLOBE team. The index is only valid as long as the rows of `df` aren't changed.
+    """
+    teams = df[globe_teams_column].to_numpy()
+    is_team_list = _is_team_list(teams)
+    team_lists = teams[is_team_list]
+    rows = np.repeat(
+        np.flatnonzero(is_team_list),
+        np.fromiter(map(len, team_lists), dtype=np.int64, count=len(team_lists)),
+    )
+    codes, names = pd.factorize(list(chain.from_iterable(team_lists)))
+    # Missing team names are factorized to -1
+    rows, codes = rows[codes >= 0], codes[codes >= 0]
+
+    # Sorts the rows by team so that each team's rows are a contiguous slice
+    order = np.argsort(codes, kind="stable")
+    splits = np.cumsum(np.bincount(codes, minlength=len(names)))[:-1]
+    return {
+        name: np.unique(team_rows)
+        for name, team_rows in zip(names, np.split(rows[order], splits))
+    }
+
+
 def filter_by_globe_team(
-    df, globe_teams_column, target_teams, exclude=False, inplace=False
+    df,
+    globe_teams_column,
+    target_teams,
+    exclude=False,
+    inplace=False,
+    team_index=None,
 ):
     """
     Finds or filters out specific globe teams.
@@ -205,29 +279,28 @@ def filter_by_globe_team(
         Whether to exclude the specified teams from the dataset.
     inplace : bool, default=False
         Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+    team_index : dict of {str, np.ndarray}, optional
+        The team index of `df` created by [build_team_index](#build_team_index). Pass it when filtering the same DataFrame by several teams so that the team lists are only searched once.
+
     Returns
     -------
     pd.DataFrame or None
         A DataFrame with only the specified GLOBE teams (if exclude is False) or without the specified GLOBE teams (if exclude is True). If `inplace=True` it returns None.
     """
+    if team_index is None:
+        team_index = build_team_index(df, globe_teams_column)
 
-    def is_desired_team(team_list):
-        if not exclude:
-            return any(
-                [
-                    team in team_list if not is_hashable(team_list) else False
-                    for team in target_teams
-                ]
-            )
-        else:
-            return all(
-                [
-                    team not in team_list if not is_hashable(team_list) else False
-                    for team in target_teams
-                ]
-            )
-
-    desired_team_filter = np.vectorize(is_desired_team)
-    desired_data_mask = desired_team_filter(df[globe_teams_column].to_numpy())
+    desired_data_mask = np.zeros(len(df), dtype=bool)
+    for team in target_teams:
+        desired_data_mask[team_index.get(team, [])] = True
+
+    if exclude:
+        # Entries without a team list are also filtered out
+        desired_data_mask = ~desired_data_mask & _is_team_list(
+            df[globe_teams_column].to_numpy()
+        )
+        # Nothing is excluded when there are no target teams
+        if not len(target_teams):
+            desired_data_mask[:] = True
 
     return filter_out_entries(df, desired_data_mask, True, inplace)
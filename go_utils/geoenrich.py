@@ -1,18 +1,204 @@
-from datetime import datetime
+import json
+import os
+from datetime import datetime, timedelta
 
 import numpy as np
-from arcgis.features import GeoAccessor
-from arcgis.gis import GIS
+import pandas as pd
 
 from go_utils.constants import (
-    abbreviation_dict,
     end_date,
     landcover_protocol,
     mosquito_protocol,
     region_dict,
     start_date,
 )
-from go_utils.download import convert_dates_to_datetime, default_data_clean
+from go_utils.download import (
+    convert_dates_to_datetime,
+    default_data_clean,
+    read_data,
+    write_data,
+)
+
+__doc__ = """
+# Overview
+This submodule downloads GLOBE Observer data from ArcGIS layers that are enriched with the country of each observation.
+
+# Layer Snapshots
+Downloading a whole enriched layer takes a while, so passing a `snapshot_dir` to [get_country_api_data](#get_country_api_data) (or using the `--cache` flag of the download CLIs) keeps a local Parquet snapshot of each layer. Snapshots require `pyarrow`, which can be installed with `pip install go-utils[parquet]`.
+
+The layers are updated daily, so a snapshot younger than `default_snapshot_age` is read from disk without contacting ArcGIS. Older snapshots are refreshed incrementally by only downloading the features with a higher `OBJECTID` than the snapshot has seen, along with the features edited since the last refresh if the layer tracks edits. If the refreshed snapshot doesn't have as many features as the layer (e.g. because features were deleted or the layer was republished), the whole layer is downloaded again.
+
+# Offline Enrichment
+When the ArcGIS layers are unavailable, [add_country_columns](#add_country_columns) assigns the country (and region) of each observation from a local GeoJSON file of country boundaries, such as the Esri World Countries layer the enriched layers are based on.
+
+The boundaries are indexed with [build_country_index](#build_country_index) which divides the globe into a grid and determines the country at the center of each grid cell. The country of an observation is then found by only checking the boundaries that pass through its grid cell between the cell center and the observation, so most observations don't need any exact polygon tests. Observations in grid cells whose center lies within several overlapping countries (e.g. disputed territories) are tested against all the boundaries at their latitude instead, and are assigned the first of their countries in the boundaries file. Smaller grid cells use more memory but need fewer polygon tests, which matters for detailed boundaries.
+"""
+
+item_id_dict = {
+    mosquito_protocol: "a018521fbc3f42bc848d3fa4c52e02ce",
+    landcover_protocol: "fe54b831415f44d2b1640327ae276fb8",
+}
+
+# The names of the MeasuredAt fields in the layers (mhm names are truncated by ArcGIS)
+measured_fields = {
+    mosquito_protocol: "MeasuredAt",
+    landcover_protocol: "landcoversMeasuredAt",
+}
+
+# The country columns of the layers
+country_columns = ["COUNTRY", "countryName", "countryCode"]
+
+default_snapshot_age = timedelta(days=1)
+
+# Marks the grid cells whose center is within several overlapping countries
+_overlapping_countries = -2
+
+# The maximum number of point-edge pairs tested at once, which bounds the memory used by the offline enrichment
+max_edge_pairs = 1000000
+
+
+def _get_layer(protocol):
+    # Imported here so that the offline enrichment doesn't need ArcGIS
+    from arcgis.gis import GIS
+
+    gis = GIS()
+    item = gis.content.get(itemid=item_id_dict[protocol])
+    return item.layers[0]
+
+
+def _query_layer(layer, where="1=1", out_fields="*"):
+    if not isinstance(out_fields, str):
+        out_fields = ",".join(out_fields)
+    df = layer.query(where=where, out_fields=out_fields, return_geometry=False).sdf
+    if "SHAPE" in df:
+        df = df.drop(["SHAPE"], axis=1)
+    return df
+
+
+def _get_layer_property(layer, *keys):
+    value = getattr(layer, "properties", None)
+    try:
+        for key in keys:
+            value = value[key]
+    except (KeyError, TypeError):
+        return None
+    return value
+
+
+def _quote(value):
+    escaped_value = str(value).replace("'", "''")
+    return f"'{escaped_value}'"
+
+
+def _get_date_literal(layer, field, date):
+    field_types = {
+        field_info["name"]: field_info["type"]
+        for field_info in _get_layer_property(layer, "fields") or []
+    }
+    if field_types.get(field) == "esriFieldTypeString":
+        return _quote(f"{date:%Y-%m-%d}")
+    return f"timestamp '{date:%Y-%m-%d %H:%M:%S}'"
+
+
+def _get_where_clause(layer, protocol, start_date, end_date, countries):
+    # The clause only has to select a superset of the data since it's also filtered locally
+    field = measured_fields[protocol]
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    conditions = [
+        f"{field} >= {_get_date_literal(layer, field, start)}",
+        f"{field} < {_get_date_literal(layer, field, end)}",
+    ]
+    if countries:
+        country_list = ", ".join(_quote(country) for country in sorted(countries))
+        conditions.append(f"COUNTRY IN ({country_list})")
+    return " AND ".join(conditions)
+
+
+def _get_changes_query(layer, snapshot_df, object_id_field):
+    where = f"{object_id_field} > {snapshot_df[object_id_field].max()}"
+    edit_date_field = _get_layer_property(layer, "editFieldsInfo", "editDateField")
+    if edit_date_field and edit_date_field in snapshot_df:
+        # Features edited in the same second as the last edit are requested again and deduplicated by their object ID
+        last_edit = pd.Timestamp(snapshot_df[edit_date_field].max())
+        if not pd.isna(last_edit):
+            where += (
+                f" OR {edit_date_field} >= timestamp '{last_edit:%Y-%m-%d %H:%M:%S}'"
+            )
+    return where
+
+
+def _refresh_snapshot(layer, snapshot_df):
+    object_id_field = _get_layer_property(layer, "objectIdField") or "OBJECTID"
+    if snapshot_df is None or snapshot_df.empty:
+        return _query_layer(layer)
+
+    changes_df = _query_layer(
+        layer, _get_changes_query(layer, snapshot_df, object_id_field)
+    )
+    if not changes_df.empty:
+        is_changed = snapshot_df[object_id_field].isin(changes_df[object_id_field])
+        snapshot_df = pd.concat(
+            [snapshot_df[~is_changed], changes_df], ignore_index=True
+        )
+
+    # Deleted features can't be detected incrementally
+    if len(snapshot_df) != layer.query(where="1=1", return_count_only=True):
+        return _query_layer(layer)
+    return snapshot_df
+
+
+def _check_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "Layer snapshots are stored as Parquet files, which requires pyarrow. Install it with `pip install go-utils[parquet]`."
+        ) from e
+
+
+def get_layer_snapshot(
+    protocol, snapshot_dir, max_age=default_snapshot_age, layer=None
+):
+    """
+    Reads the local snapshot of the country enriched layer of a protocol, refreshing it if it's older than `max_age`. See [here](#layer-snapshots) for more information. Snapshots are stored as Parquet files, so an `ImportError` is raised if `pyarrow` isn't installed.
+
+    Parameters
+    ----------
+    protocol : str, {"mosquito_habitat_mapper", "land_covers"}
+        The desired GLOBE Observer Protocol.
+    snapshot_dir : str
+        The directory of the snapshots. It is created if it doesn't exist.
+    max_age : datetime.timedelta, default=1 day
+        How long a snapshot is used before it is refreshed.
+    layer : arcgis.features.FeatureLayer, optional
+        The layer to snapshot. Defaults to the country enriched layer of the protocol. Any object with a compatible `query` method and `properties` can be used (e.g. for testing).
+
+    Returns
+    -------
+    pd.DataFrame
+        The raw layer data without its geometry.
+    """
+    # Checked before downloading the layer so a missing pyarrow doesn't waste the download
+    _check_pyarrow()
+    path = os.path.join(snapshot_dir, f"{protocol}.parquet")
+    snapshot_df = None
+    if os.path.exists(path):
+        snapshot_df = read_data(path)
+        modified_at = datetime.fromtimestamp(os.path.getmtime(path))
+        if datetime.now() - modified_at < max_age:
+            return snapshot_df
+
+    if layer is None:
+        layer = _get_layer(protocol)
+    snapshot_df = _refresh_snapshot(layer, snapshot_df)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    # Writes to a temporary file first so an interrupted refresh doesn't corrupt the snapshot
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    write_data(snapshot_df, temp_path, file_format="parquet")
+    os.replace(temp_path, path)
+    return snapshot_df
 
 
 def get_country_api_data(
@@ -22,10 +208,15 @@ def get_country_api_data(
     is_clean=True,
     countries=[],
     regions=[],
+    snapshot_dir=None,
+    layer=None,
+    out_fields=None,
 ):
     """
     Gets country enriched API Data. Due note that this data comes from layers in ArcGIS that are updated daily. Therefore, there will be some delay between when an entry is uploaded onto the GLOBE data base and being on the ArcGIS dataset.
 
+    Unless a `snapshot_dir` is given, the date range and countries are sent along with the layer query so that only the matching features are downloaded.
+
     Parameters
     ----------
     protocol : str, {"mosquito_habitat_mapper", "land_covers"}
@@ -40,24 +231,37 @@ def get_country_api_data(
         The list of desired regions. Look at go_utils.info.region_dict to see supported region names and the countries they enclose. If the list is empty, all data will be included.
     latlon_box : dict of {str, double}, optional
         The longitudes and latitudes of a bounding box for the dataset. The minimum/maximum latitudes and longitudes must be specified with the following keys: "min_lat", "min_lon", "max_lat", "max_lon". The default value specifies all latitude and longitude coordinates.
+    snapshot_dir : str, optional
+        The directory of the local layer snapshots. If given, the layer is read from its snapshot, which is only refreshed once it's older than a day. See [here](#layer-snapshots) for more information.
+    layer : arcgis.features.FeatureLayer, optional
+        The layer to download the data from. Defaults to the country enriched layer of the protocol.
+    out_fields : list of str, optional
+        The layer fields to download (e.g. `MeasuredAt` instead of `mosquitohabitatmapperMeasuredAt` since the mhm field names are truncated). The measured date and country fields are always included. By default all fields are downloaded, which cleaning the data requires.
     """
 
-    item_id_dict = {
-        mosquito_protocol: "a018521fbc3f42bc848d3fa4c52e02ce",
-        landcover_protocol: "fe54b831415f44d2b1640327ae276fb8",
-    }
-
     if protocol not in item_id_dict:
         raise ValueError(
             "Invalid protocol, currently only 'mosquito_habitat_mapper' and 'land_covers' are supported."
         )
 
-    gis = GIS()
-    item = gis.content.get(itemid=item_id_dict[protocol])
-    df = GeoAccessor.from_layer(item.layers[0])
+    countries = set(countries)
+    for region in regions:
+        countries.update(region_dict[region])
+    fields = "*"
+    if out_fields:
+        fields = list(
+            dict.fromkeys([*out_fields, measured_fields[protocol], "COUNTRY"])
+        )
 
-    if "SHAPE" in df:
-        df.drop(["SHAPE"], axis=1, inplace=True)
+    if snapshot_dir:
+        df = get_layer_snapshot(protocol, snapshot_dir, layer=layer)
+        if fields != "*":
+            df = df[fields]
+    else:
+        if layer is None:
+            layer = _get_layer(protocol)
+        where = _get_where_clause(layer, protocol, start_date, end_date, countries)
+        df = _query_layer(layer, where, fields)
 
     # Due to the size of the mhm column names, ArcGIS truncates the names so it must be renamed in this step.
     if protocol == "mosquito_habitat_mapper":
@@ -73,30 +277,360 @@ def get_country_api_data(
             inplace=True,
         )
 
-    # Filter the dates
+    # Filter the dates and countries locally as well since snapshots contain the whole layer
     start = datetime.strptime(start_date, "%Y-%m-%d")
     end = datetime.strptime(end_date, "%Y-%m-%d")
     measured_at = protocol.replace("_", "") + "MeasuredAt"
 
     convert_dates_to_datetime(df)
 
-    df = df[(df[measured_at] >= start) & (df[measured_at] <= end)]
+    mask = (df[measured_at] >= start) & (df[measured_at] <= end)
+    if countries:
+        mask &= df["COUNTRY"].isin(countries)
+    df = df[mask]
 
     if is_clean:
-        df = default_data_clean(df, protocol)
+        # The country columns are homogenous when a single country is requested,
+        # but are kept so that the data has the same columns for any countries
+        df = default_data_clean(df, protocol, homogenous_exclude=country_columns)
+    return df
 
-    for region in regions:
-        countries.extend(region_dict[region])
-    countries_set = set(countries)
-    # Return the regular data if nothing is specified
-    if not countries_set:
-        return df
-    else:
-        mask = _get_valid_countries_mask(df, protocol, countries_set)
-        return df[mask]
+
+def _get_rings(geometry):
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return geometry["coordinates"]
+    if geometry["type"] == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    return []
 
 
-def _get_valid_countries_mask(df, protocol, country_list):
-    country_filter = np.vectorize(lambda country_col: country_col in country_list)
-    mask = country_filter(df[f"{abbreviation_dict[protocol]}_COUNTRY"].to_numpy())
-    return mask
+def _get_boundary_edges(features, name_property):
+    names, edges, edge_countries = {}, [], []
+    for feature in features:
+        name = feature["properties"][name_property]
+        country_id = names.setdefault(name, len(names))
+        for ring in _get_rings(feature["geometry"]):
+            start = np.asarray(ring, dtype=float)[:, :2]
+            end = np.roll(start, -1, axis=0)
+            edges.append(np.hstack([start, end]))
+            edge_countries.append(np.full(len(start), country_id))
+    if not edges:
+        return list(names), np.empty((0, 4)), np.empty(0, dtype=np.int64)
+    return list(names), np.vstack(edges), np.concatenate(edge_countries)
+
+
+def _get_cell_rows(latitudes, cell_size, n_rows):
+    return np.clip(np.floor((latitudes + 90) / cell_size), 0, n_rows - 1).astype(int)
+
+
+def _get_cell_cols(longitudes, cell_size, n_cols):
+    return np.clip(np.floor((longitudes + 180) / cell_size), 0, n_cols - 1).astype(int)
+
+
+def _bucket_edges(first_rows, last_rows, first_cols, last_cols, n_cols, n_buckets):
+    # Adds each edge to every bucket its bounding box overlaps, grouped by bucket
+    widths = last_cols - first_cols + 1
+    counts = (last_rows - first_rows + 1) * widths
+    edge_ids = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = first_rows[edge_ids] + offsets // widths[edge_ids]
+    cols = first_cols[edge_ids] + offsets % widths[edge_ids]
+    buckets = rows * n_cols + cols
+    order = np.argsort(buckets, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(np.bincount(buckets, minlength=n_buckets))])
+    return edge_ids[order], starts
+
+
+def _get_center_countries(edges, edge_countries, cell_size, n_rows, n_cols):
+    # Casts a ray from the west along the center of each row of cells
+    x1, y1, x2, y2 = edges.T
+    rows = _get_cell_rows(edges[:, [1, 3]], cell_size, n_rows)
+    band_edges, band_starts = _bucket_edges(
+        rows.min(axis=1),
+        rows.max(axis=1),
+        np.zeros(len(edges), dtype=int),
+        np.zeros(len(edges), dtype=int),
+        1,
+        n_rows,
+    )
+    center_xs = -180 + (np.arange(n_cols) + 0.5) * cell_size
+    center_countries = np.full((n_rows, n_cols), -1, dtype=np.int64)
+    for row in range(n_rows):
+        y = -90 + (row + 0.5) * cell_size
+        ids = band_edges[band_starts[row] : band_starts[row + 1]]
+        ids = ids[(y1[ids] > y) != (y2[ids] > y)]
+        crossings = x1[ids] + (y - y1[ids]) * (x2[ids] - x1[ids]) / (y2[ids] - y1[ids])
+        order = np.argsort(crossings)
+
+        # The country the ray is in after each crossing
+        inside, states = set(), [-1]
+        for country in edge_countries[ids[order]]:
+            inside ^= {country}
+            states.append(
+                _overlapping_countries if len(inside) > 1 else min(inside, default=-1)
+            )
+        positions = np.searchsorted(crossings[order], center_xs)
+        center_countries[row] = np.array(states)[positions]
+    return center_countries, band_edges, band_starts
+
+
+def build_country_index(boundaries, name_property="COUNTRY", cell_size=0.5):
+    """
+    Indexes country boundaries for [get_countries](#get_countries) and [add_country_columns](#add_country_columns). See [here](#offline-enrichment) for more information.
+
+    Parameters
+    ----------
+    boundaries : str or dict
+        The path of a GeoJSON file or a loaded GeoJSON FeatureCollection containing the country (Multi)Polygons in longitude/latitude coordinates.
+    name_property : str, default="COUNTRY"
+        The feature property containing the country names. The names should match the ones in `go_utils.constants.region_dict` to determine regions.
+    cell_size : float, default=0.5
+        The size of the grid cells in degrees.
+
+    Returns
+    -------
+    dict
+        The country index.
+    """
+    if isinstance(boundaries, str):
+        with open(boundaries, "r", encoding="utf-8") as file:
+            boundaries = json.load(file)
+    names, edges, edge_countries = _get_boundary_edges(
+        boundaries["features"], name_property
+    )
+
+    n_rows, n_cols = int(np.ceil(180 / cell_size)), int(np.ceil(360 / cell_size))
+    rows = _get_cell_rows(edges[:, [1, 3]], cell_size, n_rows)
+    cols = _get_cell_cols(edges[:, [0, 2]], cell_size, n_cols)
+    cell_edges, cell_starts = _bucket_edges(
+        rows.min(axis=1),
+        rows.max(axis=1),
+        cols.min(axis=1),
+        cols.max(axis=1),
+        n_cols,
+        n_rows * n_cols,
+    )
+    center_countries, row_edges, row_starts = _get_center_countries(
+        edges, edge_countries, cell_size, n_rows, n_cols
+    )
+    return {
+        "names": names,
+        "cell_size": cell_size,
+        "edges": edges,
+        "edge_countries": edge_countries,
+        "cell_edges": cell_edges,
+        "cell_starts": cell_starts,
+        "row_edges": row_edges,
+        "row_starts": row_starts,
+        "center_countries": center_countries,
+    }
+
+
+def _is_between(values, start, end):
+    return (values >= np.minimum(start, end)) & (values < np.maximum(start, end))
+
+
+def _get_crossed_edges(index, point_ids, edge_ids, center_xs, center_ys, xs, ys):
+    # Checks whether edges cross the path from the cell center to the point, which first goes north/south and then east/west
+    x1, y1, x2, y2 = index["edges"][edge_ids].T
+    center_xs, center_ys = center_xs[point_ids], center_ys[point_ids]
+    xs, ys = xs[point_ids], ys[point_ids]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossed_ys = y1 + (center_xs - x1) * (y2 - y1) / (x2 - x1)
+        crossed_xs = x1 + (ys - y1) * (x2 - x1) / (y2 - y1)
+    crosses_vertical = ((x1 > center_xs) != (x2 > center_xs)) & _is_between(
+        crossed_ys, center_ys, ys
+    )
+    crosses_horizontal = ((y1 > ys) != (y2 > ys)) & _is_between(
+        crossed_xs, center_xs, xs
+    )
+    return crosses_vertical != crosses_horizontal
+
+
+def _pair_bucket_edges(bucket_edges, bucket_starts, buckets):
+    # Pairs each point with the edges in its bucket
+    starts = bucket_starts[buckets]
+    counts = bucket_starts[buckets + 1] - starts
+    point_ids = np.repeat(np.arange(len(buckets)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return point_ids, bucket_edges[starts[point_ids] + offsets]
+
+
+def _get_point_batches(bucket_starts, buckets):
+    # Splits the points into consecutive batches paired with at most `max_edge_pairs` edges (or a single point)
+    pair_ends = np.cumsum(bucket_starts[buckets + 1] - bucket_starts[buckets])
+    start = 0
+    while start < len(buckets):
+        first_pair = pair_ends[start - 1] if start else 0
+        stop = np.searchsorted(pair_ends, first_pair + max_edge_pairs, side="right")
+        stop = max(stop, start + 1)
+        yield slice(start, stop)
+        start = stop
+
+
+def _get_odd_countries(point_ids, countries, n_countries):
+    # Finds the countries of which each point crossed an odd number of edges
+    keys, key_counts = np.unique(
+        point_ids * n_countries + countries, return_counts=True
+    )
+    return np.divmod(keys[key_counts % 2 == 1], n_countries)
+
+
+def _get_first_countries(n_points, point_ids, countries, n_countries):
+    first_countries = np.full(n_points, n_countries)
+    np.minimum.at(first_countries, point_ids, countries)
+    first_countries[first_countries == n_countries] = -1
+    return first_countries
+
+
+def _get_exact_countries(index, xs, ys, rows):
+    # Casts a ray from each point to the west and counts the crossed edges of each country
+    point_ids, edge_ids = _pair_bucket_edges(
+        index["row_edges"], index["row_starts"], rows
+    )
+    x1, y1, x2, y2 = index["edges"][edge_ids].T
+    point_xs, point_ys = xs[point_ids], ys[point_ids]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossed_xs = x1 + (point_ys - y1) * (x2 - x1) / (y2 - y1)
+    crossed = ((y1 > point_ys) != (y2 > point_ys)) & (crossed_xs < point_xs)
+
+    n_countries = len(index["names"])
+    inside_points, inside_countries = _get_odd_countries(
+        point_ids[crossed], index["edge_countries"][edge_ids[crossed]], n_countries
+    )
+    return _get_first_countries(len(xs), inside_points, inside_countries, n_countries)
+
+
+def _get_cell_countries(country_index, xs, ys, rows, cols):
+    # Walks from the center of each point's cell to the point, marking points in cells with overlapping countries
+    cell_size = country_index["cell_size"]
+    n_cols = country_index["center_countries"].shape[1]
+    center_countries = country_index["center_countries"][rows, cols]
+
+    point_ids, edge_ids = _pair_bucket_edges(
+        country_index["cell_edges"], country_index["cell_starts"], rows * n_cols + cols
+    )
+    center_xs = -180 + (cols + 0.5) * cell_size
+    center_ys = -90 + (rows + 0.5) * cell_size
+    crossed = _get_crossed_edges(
+        country_index, point_ids, edge_ids, center_xs, center_ys, xs, ys
+    )
+
+    # A country is entered or left if an odd number of its edges are crossed
+    n_countries = len(country_index["names"])
+    toggled_points, toggled_countries = _get_odd_countries(
+        point_ids[crossed],
+        country_index["edge_countries"][edge_ids[crossed]],
+        n_countries,
+    )
+    is_left = toggled_countries == center_countries[toggled_points]
+    is_kept = center_countries >= 0
+    is_kept[toggled_points[is_left]] = False
+    countries = _get_first_countries(
+        len(ys),
+        np.concatenate([np.flatnonzero(is_kept), toggled_points[~is_left]]),
+        np.concatenate([center_countries[is_kept], toggled_countries[~is_left]]),
+        n_countries,
+    )
+    countries[center_countries == _overlapping_countries] = _overlapping_countries
+    return countries
+
+
+def get_countries(latitudes, longitudes, country_index):
+    """
+    Finds the countries containing a set of coordinates. If a coordinate lies within several overlapping countries, the first of them in the boundaries is returned.
+
+    Parameters
+    ----------
+    latitudes : array-like of float
+        The latitudes of the coordinates.
+    longitudes : array-like of float
+        The longitudes of the coordinates.
+    country_index : dict
+        The country boundaries indexed by [build_country_index](#build_country_index).
+
+    Returns
+    -------
+    np.ndarray of str
+        The country of each coordinate or None if it isn't in any country.
+    """
+    ys = np.asarray(latitudes, dtype=float)
+    xs = np.asarray(longitudes, dtype=float)
+    cell_size = country_index["cell_size"]
+    n_rows, n_cols = country_index["center_countries"].shape
+    rows = _get_cell_rows(np.nan_to_num(ys), cell_size, n_rows)
+    cols = _get_cell_cols(np.nan_to_num(xs), cell_size, n_cols)
+
+    # The points are processed in batches since cells can hold many edges
+    countries = np.empty(len(ys), dtype=np.int64)
+    for batch in _get_point_batches(country_index["cell_starts"], rows * n_cols + cols):
+        countries[batch] = _get_cell_countries(
+            country_index, xs[batch], ys[batch], rows[batch], cols[batch]
+        )
+
+    # The countries of cell centers within several countries aren't tracked, so these points are tested exactly
+    overlapping = np.flatnonzero(countries == _overlapping_countries)
+    for batch in _get_point_batches(country_index["row_starts"], rows[overlapping]):
+        ids = overlapping[batch]
+        countries[ids] = _get_exact_countries(
+            country_index, xs[ids], ys[ids], rows[ids]
+        )
+
+    is_valid = (np.abs(ys) <= 90) & (np.abs(xs) <= 180)
+    countries[~is_valid] = -1
+    names = np.array([*country_index["names"], None], dtype=object)
+    return names[countries]
+
+
+def add_country_columns(
+    df,
+    latitude_col,
+    longitude_col,
+    country_index,
+    country_col="COUNTRY",
+    region_col=None,
+    inplace=False,
+):
+    """
+    Adds the country of each observation using local country boundaries instead of the ArcGIS layers. See [here](#offline-enrichment) for more information.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame containing the observations (e.g. from `go_utils.download.get_api_data`)
+    latitude_col : str
+        The name of the column that contains latitude values
+    longitude_col : str
+        The name of the column that contains longitude values
+    country_index : dict
+        The country boundaries indexed by [build_country_index](#build_country_index).
+    country_col : str, default="COUNTRY"
+        The name of the added country column.
+    region_col : str, optional
+        If given, a column with this name is added containing the region of each country according to `go_utils.constants.region_dict`.
+    inplace : bool, default=False
+        Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+
+    Returns
+    -------
+    pd.DataFrame or None
+        A DataFrame with the country column (and region column) added. If `inplace=True` it returns None.
+    """
+    if not inplace:
+        df = df.copy()
+
+    df[country_col] = get_countries(
+        df[latitude_col].to_numpy(), df[longitude_col].to_numpy(), country_index
+    )
+    if region_col:
+        country_regions = {
+            country: region
+            for region, countries in region_dict.items()
+            for country in countries
+        }
+        df[region_col] = df[country_col].map(country_regions)
+
+    if not inplace:
+        return df
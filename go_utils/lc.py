@@ -1,5 +1,6 @@
 import math
 import re
+from functools import lru_cache
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -7,7 +8,12 @@ import pandas as pd
 import seaborn as sns
 
 from go_utils.cleanup import (
+    build_completeness_index,
     camel_case,
+    count_occurrences,
+    count_set_bits,
+    get_bit_binary,
+    get_cumulative_scores,
     remove_homogenous_cols,
     rename_latlon_cols,
     replace_column_prefix,
@@ -24,12 +30,17 @@ The classification data for each entry is condensed into several entries separat
 The end result is a DataFrame that contains columns for every Unique Landcover Classification (per direction) and its respective percentages for each entry.
 
 There are four main steps to this procedure:
-1.Identifying Land Cover Classifications for each Cardinal Direction: An internal method returns the unique description (e.g. HerbaceousGrasslandTallGrass) listed in a column. This method is run for all 4 cardinal directions to obtain the all unique classifications per direction.
+1. Identifying Land Cover Classifications for each Cardinal Direction: The semicolon separated entries of all 4 cardinal directions are exploded into a single long table of (entry, direction, classification, percentage) rows using pandas string methods. The unique descriptions (e.g. HerbaceousGrasslandTallGrass) of this table are the classifications per direction.
 2. Creating empty columns for each Classification from each Cardinal Direction: Using the newly identified classifications new columns are made for each unique classification. These columns initially contained the default float64 value of 0.0. By initializing all the classification column values to 0.0, we ensure no empty values are set to -9999 in the round_cols(df) method (discussed in General Cleanup Procedures - Round Appropriate Columns). This step eases future numerical analysis.
 3. Grouping and Alphabetically Sorting Directional Column Information: To better organize the DataFrame, columns containing any of the following directional substrings: "downward", "upward", "west", "east", "north", "south" (case insensitive) are identified and alphabetically sorted. Then an internal method called move_cols, specified column headers to move (direction_data_cols), and the location before the desired point of insertion, the program returns a reordered DataFrame, where all directional columns are grouped together. This greatly improves the Land Covers dataset’s organization and accessibility.
-4. Adding Classification Percentages to their respective Land Cover Classification Columns - To fill in each classification column with their respective percentages, an internal method is applied to each row in the dataframe. This method iterates through each classification direction (ie “lc_EastClassifications”) and sets each identified Classification column with its respective percentage.
+4. Adding Classification Percentages to their respective Land Cover Classification Columns - Each row of the long table is scattered into its classification column (e.g. “lc_East_UrbanOther”) in a single array operation, rather than iterating over each row of the dataframe. The overall percentages are the sum of the directional percentages divided by 4.
 
 NOTE: After these procedures, the original directional classification columns (e.g. “lc_EastClassifications”) are not dropped.
+
+### Compact Representations
+Since each entry only lists a handful of classifications, almost all of the unpacked values are 0. There are two options to reduce the memory of the classification data:
+- Sparse columns: `unpack_classifications(lc_df, sparse=True)` (or `apply_cleanup(lc_df, sparse=True)`) stores the classification columns as sparse columns that only store the nonzero percentages. [This method](#densify_classifications) converts them back to regular columns.
+- Long format: [This method](#get_classification_table) returns a table with one row per classification entry (observation id, direction, classification, percent) instead of unpacking the classifications. [This method](#pivot_classification_table) materializes the unpacked columns from that table.
 """
 
 classifications = []
@@ -62,6 +73,44 @@ def cleanup_column_prefix(df, inplace=False):
         return df
 
 
+classification_delimiters = [" ", ",", "-", "/"]
+
+_name_pattern = re.compile(r"(?<=\[).*(?=\])")
+_percentage_pattern = re.compile(r".*(?=%)")
+
+
+@lru_cache(maxsize=4096)
+def parse_classification(entry):
+    """
+    Parses a singular landcover classification. For example, the classification `"60% MUC 02 (b) [Trees, Closely Spaced, Deciduous - Broad Leaved]"` is parsed into `("Trees, Closely Spaced, Deciduous - Broad Leaved", "TreesCloselySpacedDeciduousBroadLeaved", 60.0)`.
+
+    The vocabulary of classifications is small, so the results are cached and each unique entry is only parsed once.
+
+    Parameters
+    ----------
+    entry : str
+        A single landcover classification.
+
+    Returns
+    -------
+    tuple of (str, str, float)
+        The Landcover description, the camel cased description (as used in column names), and the percentage of the classification.
+    """
+    name = _name_pattern.search(entry).group()
+    percent = float(_percentage_pattern.search(entry).group())
+    return name, camel_case(name, classification_delimiters).strip(), percent
+
+
+@lru_cache(maxsize=4096)
+def _parse_classifications(info):
+    return tuple(parse_classification(entry) for entry in info.split(";"))
+
+
+@lru_cache(maxsize=4096)
+def _extract_classification_names(info):
+    return tuple(extract_classification_name(entry) for entry in info.split(";"))
+
+
 def extract_classification_name(entry):
     """
     Extracts the name (landcover description) of a singular landcover classification. For example in the classification of `"60% MUC 02 (b) [Trees, Closely Spaced, Deciduous - Broad Leaved]"`, the `"Trees, Closely Spaced, Deciduous - Broad Leaved"` is extracted.
@@ -77,7 +126,8 @@ def extract_classification_name(entry):
         The Landcover description of a classification
     """
 
-    return re.search(r"(?<=\[).*(?=\])", entry).group()
+    # Doesn't go through parse_classification so that entries without a percentage can be named
+    return _name_pattern.search(entry).group()
 
 
 def extract_classification_percentage(entry):
@@ -95,12 +145,7 @@ def extract_classification_percentage(entry):
         The percentage of a landcover classification
     """
 
-    return float(re.search(".*(?=%)", entry).group())
-
-
-def _extract_landcover_items(func, info):
-    entries = info.split(";")
-    return [func(entry) for entry in entries]
+    return float(_percentage_pattern.search(entry).group())
 
 
 def extract_classifications(info):
@@ -116,7 +161,7 @@ def extract_classifications(info):
     list of str
         The different landcover classifications stored within the landcover entry.
     """
-    return _extract_landcover_items(extract_classification_name, info)
+    return list(_extract_classification_names(info))
 
 
 def extract_percentages(info):
@@ -133,7 +178,7 @@ def extract_percentages(info):
         The different landcover percentages stored within the landcover entry.
     """
 
-    return _extract_landcover_items(extract_classification_percentage, info)
+    return [percent for _, _, percent in _parse_classifications(info)]
 
 
 def extract_classification_dict(info):
@@ -150,23 +195,50 @@ def extract_classification_dict(info):
         The landcover descriptions and percentages stored as a dict in the form: `{"description" : percentage}`.
     """
 
-    entries = info.split(";")
-    return {
-        extract_classification_name(entry): extract_classification_percentage(entry)
-        for entry in entries
-    }
+    return {name: percent for name, _, percent in _parse_classifications(info)}
 
 
-def _get_classifications_for_direction(df, direction_col_name):
-    list_of_land_types = []
-    for info in df[direction_col_name]:
-        # Note: Sometimes info = np.nan, a float -- In that case we do NOT parse/split
-        if type(info) == str:
-            [
-                list_of_land_types.append(camel_case(entry, [" ", ",", "-", "/"]))
-                for entry in extract_classifications(info)
-            ]
-    return np.unique(list_of_land_types).tolist()
+def _explode_classifications(lc_df, classifications):
+    entries = []
+    for direction_index, classification in enumerate(classifications):
+        column = lc_df[classification]
+        # Note: Sometimes the value is np.nan -- In that case we do NOT parse/split
+        rows = np.flatnonzero(column.notna().to_numpy())
+        split = (
+            pd.Series(column.to_numpy()[rows], index=rows, dtype=object)
+            .str.split(";")
+            .explode()
+        )
+
+        # Each unique entry is only parsed once
+        unique_entries = pd.Index(split.unique())
+        parsed = [parse_classification(entry) for entry in unique_entries]
+        entry_codes = unique_entries.get_indexer(split)
+        entries.append(
+            pd.DataFrame(
+                {
+                    "row": split.index.to_numpy(dtype=np.int64),
+                    "direction_index": direction_index,
+                    "direction": classification.replace("Classifications", "_"),
+                    "overall": re.sub(
+                        r"(north|south|east|west).*",
+                        "Overall_",
+                        classification,
+                        flags=re.IGNORECASE,
+                    ),
+                    "description": np.array(
+                        [name for name, _, _ in parsed], dtype=object
+                    )[entry_codes],
+                    "name": np.array(
+                        [camel_name for _, camel_name, _ in parsed], dtype=object
+                    )[entry_codes],
+                    "percent": np.array(
+                        [percent for _, _, percent in parsed], dtype=float
+                    )[entry_codes],
+                }
+            )
+        )
+    return pd.concat(entries, ignore_index=True)
 
 
 def _move_cols(df, cols_to_move=[], ref_col=""):
@@ -184,6 +256,34 @@ def _move_cols(df, cols_to_move=[], ref_col=""):
     return df[cols_before_index + cols_at_index + cols_after_index]
 
 
+def _fill_dense_classifications(
+    index, columns, overall_columns, rows, positions, percents
+):
+    # Fills a single array and concats it to the original to avoid iteratively growing the LC DataFrame
+    values = np.zeros((len(index), len(columns)))
+    np.add.at(values, (rows, positions), percents)
+    values[:, pd.Index(columns).get_indexer(overall_columns)] /= 4
+    return pd.DataFrame(values, columns=columns, index=index)
+
+
+def _fill_sparse_classifications(
+    index, columns, overall_columns, rows, positions, percents
+):
+    # Fills one column at a time so that the dense matrix is never materialized
+    order = np.argsort(positions, kind="stable")
+    bounds = np.searchsorted(positions[order], np.arange(len(columns) + 1))
+    overall_columns = set(overall_columns)
+    data = {}
+    for i, column in enumerate(columns):
+        entries = order[bounds[i] : bounds[i + 1]]
+        values = np.zeros(len(index))
+        np.add.at(values, rows[entries], percents[entries])
+        if column in overall_columns:
+            values /= 4
+        data[column] = pd.arrays.SparseArray(values, fill_value=0.0)
+    return pd.DataFrame(data, columns=columns, index=index)
+
+
 def unpack_classifications(
     lc_df,
     north="lc_NorthClassifications",
@@ -192,6 +292,7 @@ def unpack_classifications(
     west="lc_WestClassifications",
     ref_col="lc_pid",
     unpack=True,
+    sparse=False,
 ):
     """
     Unpacks the classification data in the *raw* GLOBE Observer Landcover data. This method assumes that the columns have been renamed with accordance to the [column cleanup](#cleanup_column_prefix) method.
@@ -218,6 +319,8 @@ def unpack_classifications(
         The name of the column which all of the expanded values will be placed after. For example, if the columns were `[1, 2, 3, 4]` and you chose 3, the new columns will now be `[1, 2, 3, (all classification columns), 4]`.
     unpack: bool, default=True
         True if you want to unpack the directional classifications, False if you only want overall classifications
+    sparse: bool, default=False
+        True if you want the classification columns to be stored as sparse columns (`pd.SparseDtype` with a fill value of 0). Since each observation only lists a handful of classifications, this greatly reduces the memory of the DataFrame. Use [densify_classifications](#densify_classifications) to get a dense copy.
 
     Returns
     -------
@@ -230,61 +333,176 @@ def unpack_classifications(
     """
 
     classifications = [north, east, south, west]
+    entries = _explode_classifications(lc_df, classifications)
+    rows = entries["row"].to_numpy(dtype=np.int64)
+    percents = entries["percent"].to_numpy()
+    direction_names = entries["direction"] + entries["name"]
+    overall_names = entries["overall"] + entries["name"]
+
+    direction_cols = sorted(direction_names.unique())
+    overall_columns = sorted(overall_names.unique())
+    direction_data_cols = sorted(
+        overall_columns + direction_cols if unpack else overall_columns
+    )
+    column_positions = pd.Index(direction_data_cols)
+
+    positions = column_positions.get_indexer(overall_names)
+    if unpack:
+        # Repeated classifications within a direction keep the last percentage
+        is_last = (
+            ~pd.DataFrame({"row": rows, "name": direction_names})
+            .duplicated(keep="last")
+            .to_numpy()
+        )
+        rows = np.concatenate([rows, rows[is_last]])
+        positions = np.concatenate(
+            [positions, column_positions.get_indexer(direction_names[is_last])]
+        )
+        percents = np.concatenate([percents, percents[is_last]])
 
-    def set_directions(row):
-        for classification in classifications:
-            if not pd.isnull(row[classification]):
-                entries = row[classification].split(";")
-                for entry in entries:
-                    percent, name = (
-                        extract_classification_percentage(entry),
-                        extract_classification_name(entry),
-                    )
-                    name = camel_case(name, [" ", ",", "-", "/"])
-                    classification = classification.replace("Classifications", "_")
-                    overall = re.sub(
-                        r"(north|south|east|west).*",
-                        "Overall_",
-                        key,
-                        flags=re.IGNORECASE,
-                    )
-                    row[f"{classification}{name.strip()}"] = percent
-                    row[f"{overall}{name.strip()}"] += percent
-        return row
-
-    land_type_columns_to_add = {
-        classification: _get_classifications_for_direction(lc_df, classification)
-        for classification in classifications
+    fill_classifications = (
+        _fill_sparse_classifications if sparse else _fill_dense_classifications
+    )
+    blank_df = fill_classifications(
+        lc_df.index, direction_data_cols, overall_columns, rows, positions, percents
+    )
+    lc_df = pd.concat([lc_df, blank_df], axis=1)
+    lc_df = _move_cols(lc_df, cols_to_move=direction_data_cols, ref_col=ref_col)
+
+    return lc_df, overall_columns, direction_cols
+
+
+def get_classification_table(
+    lc_df,
+    id_col="lc_LandCoverId",
+    north="lc_NorthClassifications",
+    east="lc_EastClassifications",
+    south="lc_SouthClassifications",
+    west="lc_WestClassifications",
+):
+    """
+    Parses the classification data of the GLOBE Observer Landcover data into a long-format table with one row per classification entry. This is a compact alternative to [unpacking](#unpack_classifications) the classifications into around 250 mostly empty columns. A dense view can be created with [pivot_classification_table](#pivot_classification_table).
+
+    Parameters
+    ----------
+    lc_df : pd.DataFrame
+        A DataFrame containing GLOBE Observer Landcover data that has had the column names simplified.
+    id_col : str, default="lc_LandCoverId"
+        The name of the column which identifies each observation.
+    north: str, default="lc_NorthClassifications"
+        The name of the column which contains the North Classifications
+    east: str, default="lc_EastClassifications"
+        The name of the column which contains the East Classifications
+    south: str, default="lc_SouthClassifications"
+        The name of the column which contains the South Classifications
+    west: str, default="lc_WestClassifications"
+        The name of the column which contains the West Classifications
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame with the columns `id_col`, `direction` (e.g. `"North"`), `classification` (e.g. `"HerbaceousGrasslandTallGrass"`), and `percent`. The `direction` and `classification` columns are categorical.
+    """
+    directions = {north: "North", east: "East", south: "South", west: "West"}
+    entries = _explode_classifications(lc_df, list(directions))
+    direction_names = {
+        column.replace("Classifications", "_"): name
+        for column, name in directions.items()
     }
-    overall_columns = set()
-    direction_cols = set()
-    for key, values in land_type_columns_to_add.items():
-        direction_name = key.replace("Classifications", "_")
-        overall = re.sub(
-            r"(north|south|east|west).*", "Overall_", key, flags=re.IGNORECASE
-        )
-        for value in values:
-            direction_cols.add(direction_name + value)
-            overall_columns.add(overall + value)
-    overall_columns = list(overall_columns)
-    direction_cols = list(direction_cols)
-    direction_data_cols = sorted(overall_columns + direction_cols)
-
-    # Creates a blank DataFrame and concats it to the original to avoid iteratively growing the LC DataFrame
-    blank_df = pd.DataFrame(
-        np.zeros((len(lc_df), len(direction_data_cols))), columns=direction_data_cols
+    return pd.DataFrame(
+        {
+            id_col: lc_df[id_col].to_numpy()[entries["row"].to_numpy(dtype=np.int64)],
+            "direction": entries["direction"].map(direction_names).astype("category"),
+            "classification": entries["name"].astype("category"),
+            "percent": entries["percent"],
+        }
     )
 
-    lc_df = pd.concat([lc_df, blank_df], axis=1)
 
-    lc_df = _move_cols(lc_df, cols_to_move=direction_data_cols, ref_col=ref_col)
-    lc_df = lc_df.apply(set_directions, axis=1)
-    for column in overall_columns:
-        lc_df[column] /= 4
+def pivot_classification_table(
+    classification_df, id_col="lc_LandCoverId", unpack=True, prefix="lc"
+):
+    """
+    Materializes a dense view of a [classification table](#get_classification_table). The columns are named like the columns created by [unpack_classifications](#unpack_classifications) (e.g. `lc_North_UrbanOther` and `lc_Overall_UrbanOther`).
+
+    Parameters
+    ----------
+    classification_df : pd.DataFrame
+        A long-format classification table.
+    id_col : str, default="lc_LandCoverId"
+        The name of the column which identifies each observation.
+    unpack : bool, default=True
+        True if you want the directional classifications, False if you only want overall classifications
+    prefix : str, default="lc"
+        The prefix of the generated column names.
 
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame indexed by `id_col` with a column for each classification. Observations without any classifications aren't included.
+    """
+    names = classification_df["classification"].astype(str)
+    overall_df = (
+        pd.DataFrame(
+            {
+                id_col: classification_df[id_col],
+                "column": f"{prefix}_Overall_" + names,
+                "percent": classification_df["percent"],
+            }
+        )
+        .groupby([id_col, "column"])["percent"]
+        .sum()
+        .unstack(fill_value=0)
+        / 4
+    )
     if not unpack:
-        lc_df = lc_df.drop(columns=direction_cols)
-    return lc_df, overall_columns, direction_cols
+        return overall_df
+
+    direction_df = (
+        pd.DataFrame(
+            {
+                id_col: classification_df[id_col],
+                "column": f"{prefix}_"
+                + classification_df["direction"].astype(str)
+                + "_"
+                + names,
+                "percent": classification_df["percent"],
+            }
+        )
+        .drop_duplicates([id_col, "column"], keep="last")
+        .pivot(index=id_col, columns="column", values="percent")
+        .fillna(0)
+    )
+    wide_df = pd.concat([overall_df, direction_df], axis=1)
+    wide_df.columns.name = None
+    return wide_df[sorted(wide_df.columns)]
+
+
+def densify_classifications(lc_df, inplace=False):
+    """
+    Converts the sparse classification columns created by [unpack_classifications](#unpack_classifications) with `sparse=True` into regular dense columns.
+
+    Parameters
+    ----------
+    lc_df : pd.DataFrame
+        A DataFrame containing sparse classification columns.
+    inplace : bool, default=False
+        Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+
+    Returns
+    -------
+    pd.DataFrame or None
+        A DataFrame with dense classification columns. If `inplace=True` it returns None.
+    """
+    if not inplace:
+        lc_df = lc_df.copy()
+
+    for column, dtype in lc_df.dtypes.items():
+        if isinstance(dtype, pd.SparseDtype):
+            lc_df[column] = lc_df[column].sparse.to_dense()
+
+    if not inplace:
+        return lc_df
 
 
 def photo_bit_flags(
@@ -309,7 +527,7 @@ def photo_bit_flags(
     - `RejectedCount`: The number of photos that were rejected per record.
     - `PendingCount`: The number of photos that are pending approval per record.
     - `PhotoBitBinary`: A string that represents the presence of a photo in the Up, Down, North, South, East, and West directions. For example, if the entry is `110100`, that indicates that there is a valid photo for the Up, Down, and South Directions but no valid photos for the North, East, and West Directions.
-    - `PhotoBitDecimal`: The numerical representation of the lc_PhotoBitBinary string.
+    - `PhotoBitDecimal`: The numerical representation of the lc_PhotoBitBinary string, stored as an unsigned 8 bit integer.
 
     Parameters
     ----------
@@ -336,7 +554,7 @@ def photo_bit_flags(
     empty_count : str, default="lc_EmptyCount"
         The name of the column that will be storing the EmptyCount flag.
     bit_binary : str, default="lc_PhotoBitBinary"
-        The name of the column that will be storing the PhotoBitBinary flag.
+        The name of the column that will be storing the PhotoBitBinary flag. If None, the PhotoBitBinary flag isn't created.
     bit_decimal : str, default="lc_PhotoBitDecimal"
         The name of the column that will be storing the PhotoBitDecimal flag.
     inplace : bool, default=False
@@ -348,52 +566,32 @@ def photo_bit_flags(
         A DataFrame with the photo bit flags. If `inplace=True` it returns None.
     """
 
-    def pic_data(*args):
-        pic_count = 0
-        rejected_count = 0
-        pending_count = 0
-        empty_count = 0
-        valid_photo_bit_mask = ""
-
-        for entry in args:
-            if not pd.isna(entry) and "http" in entry:
-                valid_photo_bit_mask += "1"
-                pic_count += entry.count("http")
-            else:
-                valid_photo_bit_mask += "0"
-            if pd.isna(entry):
-                empty_count += 1
-            else:
-                pending_count += entry.count("pending")
-                rejected_count += entry.count("rejected")
-        return (
-            pic_count,
-            rejected_count,
-            pending_count,
-            empty_count,
-            valid_photo_bit_mask,
-            int(valid_photo_bit_mask, 2),
-        )
-
     if not inplace:
         df = df.copy()
 
-    get_photo_data = np.vectorize(pic_data)
-    (
-        df[photo_count],
-        df[rejected_count],
-        df[pending_count],
-        df[empty_count],
-        df[bit_binary],
-        df[bit_decimal],
-    ) = get_photo_data(
-        df[up].to_numpy(),
-        df[down].to_numpy(),
-        df[north].to_numpy(),
-        df[south].to_numpy(),
-        df[east].to_numpy(),
-        df[west].to_numpy(),
-    )
+    photo_counts = np.zeros(len(df), dtype=int)
+    rejected_counts = np.zeros(len(df), dtype=int)
+    pending_counts = np.zeros(len(df), dtype=int)
+    empty_counts = np.zeros(len(df), dtype=int)
+    bit_decimals = np.zeros(len(df), dtype=np.uint8)
+    for url_col in [up, down, north, south, east, west]:
+        urls = df[url_col]
+        url_counts, url_rejected_counts, url_pending_counts = count_occurrences(
+            urls, ["http", "rejected", "pending"]
+        )
+        photo_counts += url_counts
+        rejected_counts += url_rejected_counts
+        pending_counts += url_pending_counts
+        empty_counts += urls.isna().to_numpy()
+        bit_decimals = (bit_decimals << 1) | (url_counts > 0).astype(np.uint8)
+
+    df[photo_count] = photo_counts
+    df[rejected_count] = rejected_counts
+    df[pending_count] = pending_counts
+    df[empty_count] = empty_counts
+    if bit_binary:
+        df[bit_binary] = get_bit_binary(bit_decimals, 6)
+    df[bit_decimal] = bit_decimals
 
     if not inplace:
         return df
@@ -414,7 +612,7 @@ def classification_bit_flags(
     Creates the following flags:
     - `ClassificationCount`: The number of classifications per record.
     - `BitBinary`: A string that represents the presence of a classification in the North, South, East, and West directions. For example, if the entry is `1101`, that indicates that there is a valid classification for the North, South, and West Directions but no valid classifications for the East Direction.
-    - `BitDecimal`: The number of photos that are pending approval per record.
+    - `BitDecimal`: The numerical representation of the BitBinary string, stored as an unsigned 8 bit integer.
 
     Parameters
     ----------
@@ -431,7 +629,7 @@ def classification_bit_flags(
     classification_count : str, default="lc_ClassificationCount"
         The name of the column that will store the ClassificationCount flag.
     bit_binary : str, default="lc_ClassificationBitBinary"
-        The name of the column that will store the BitBinary flag.
+        The name of the column that will store the BitBinary flag. If None, the BitBinary flag isn't created.
     bit_decimal : str, default="lc_ClassificationBitDecimal"
         The name of the column that will store the BitDecimal flag.
     inplace : bool, default=False
@@ -443,46 +641,33 @@ def classification_bit_flags(
         A DataFrame with the classification bit flags. If `inplace=True` it returns None.
     """
 
-    def classification_data(*args):
-        classification_count = 0
-        classification_bit_mask = ""
-        for entry in args:
-            if pd.isna(entry) or entry is np.nan:
-                classification_bit_mask += "0"
-            else:
-                classification_count += 1
-                classification_bit_mask += "1"
-        return (
-            classification_count,
-            classification_bit_mask,
-            int(classification_bit_mask, 2),
-        )
-
     if not inplace:
         df = df.copy()
-    get_classification_data = np.vectorize(classification_data)
-
-    (
-        df[classification_count],
-        df[bit_binary],
-        df[bit_decimal],
-    ) = get_classification_data(
-        df[north],
-        df[south],
-        df[east],
-        df[west],
-    )
+
+    classification_counts = np.zeros(len(df), dtype=int)
+    bit_decimals = np.zeros(len(df), dtype=np.uint8)
+    for classification_col in [north, south, east, west]:
+        has_classification = df[classification_col].notna().to_numpy()
+        classification_counts += has_classification
+        bit_decimals = (bit_decimals << 1) | has_classification.astype(np.uint8)
+
+    df[classification_count] = classification_counts
+    if bit_binary:
+        df[bit_binary] = get_bit_binary(bit_decimals, 4)
+    df[bit_decimal] = bit_decimals
+
     if not inplace:
         return df
 
 
 def completion_scores(
     df,
-    photo_bit_binary="lc_PhotoBitBinary",
-    classification_binary="lc_ClassificationBitBinary",
+    photo_bit_decimal="lc_PhotoBitDecimal",
+    classification_decimal="lc_ClassificationBitDecimal",
     sub_completeness="lc_SubCompletenessScore",
     completeness="lc_CumulativeCompletenessScore",
     inplace=False,
+    completeness_index=None,
 ):
     """
     Adds the following completness score flags:
@@ -492,17 +677,19 @@ def completion_scores(
     Parameters
     ----------
     df : pd.DataFrame
-        A landcover DataFrame with the [`PhotoBitBinary`](#photo_bit_flags) and [`ClassificationBitBinary`](#classification_bit_flags) flags.
-    photo_bit_binary : str, default="lc_PhotoBitBinary"
-        The name of the column that stores the PhotoBitBinary flag.
-    classification_binary : str, default="lc_PhotoBitBinary"
-        The name of the column that stores the ClassificationBitBinary flag.
+        A landcover DataFrame with the [`PhotoBitDecimal`](#photo_bit_flags) and [`ClassificationBitDecimal`](#classification_bit_flags) flags.
+    photo_bit_decimal : str, default="lc_PhotoBitDecimal"
+        The name of the column that stores the PhotoBitDecimal flag.
+    classification_decimal : str, default="lc_ClassificationBitDecimal"
+        The name of the column that stores the ClassificationBitDecimal flag.
     sub_completeness : str, default="lc_PhotoBitBinary"
         The name of the column that will store the generated SubCompletenessScore flag.
     completeness : str, default="lc_PhotoBitBinary"
         The name of the column that will store the generated CompletenessScore flag.
     inplace : bool, default=False
         Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+    completeness_index : dict, optional
+        A completeness index of the DataFrame (see `go_utils.cleanup.build_completeness_index`). If None, it is built from all the columns.
 
     Returns
     -------
@@ -510,39 +697,33 @@ def completion_scores(
         A DataFrame with the completeness score flags. If `inplace=True` it returns None.
     """
 
-    def sum_bit_mask(bit_mask="0"):
-        sum = 0.0
-        for char in bit_mask:
-            sum += int(char)
-        return sum
-
     if not inplace:
         df = df.copy()
+    if completeness_index is None:
+        completeness_index = build_completeness_index(df)
 
-    scores = {}
-    scores["sub_score"] = []
-    # Cummulative Completion Score
-    scores["cumulative_score"] = round(df.count(1) / len(df.columns), 2)
-    # Sub-Score
-    for index in df.index:
-        bit_mask = df[photo_bit_binary][index] + df[classification_binary][index]
-        sub_score = round(sum_bit_mask(bit_mask=bit_mask), 2)
-        sub_score /= len(bit_mask)
-        scores["sub_score"].append(sub_score)
-
-    df[sub_completeness], df[completeness] = (
-        scores["sub_score"],
-        scores["cumulative_score"],
-    )
+    cumulative_scores = get_cumulative_scores(completeness_index)
+    # The 6 photo bits and the 4 classification bits
+    photo_bits = count_set_bits(df[photo_bit_decimal])
+    classification_bits = count_set_bits(df[classification_decimal])
+    df[sub_completeness] = (photo_bits + classification_bits) / 10.0
+    df[completeness] = cumulative_scores
 
     if not inplace:
         return df
 
 
-def apply_cleanup(lc_df, unpack=True):
+def apply_cleanup(
+    lc_df,
+    unpack=True,
+    sparse=False,
+    compact=False,
+    remove_homogenous=True,
+    homogenous_exclude=[],
+):
     """Applies a full cleanup procedure to the landcover data.
     It follows the following steps:
-    - Removes Homogenous Columns
+    - Removes Homogenous Columns (if `remove_homogenous` is True)
     - Renames Latitude and Longitudes
     - Cleans the Column Naming
     - Unpacks landcover classifications
@@ -557,6 +738,14 @@ def apply_cleanup(lc_df, unpack=True):
         A DataFrame containing **raw** Landcover Data from the API.
     unpack : bool
         If True, the Landcover data will expand the classifications into separate columns (results in around 300 columns). If False, it will just unpack overall landcover.
+    sparse : bool, default=False
+        If True, the classification columns are stored as sparse columns. See [unpack_classifications](#unpack_classifications) for more information.
+    compact : bool, default=False
+        If True, the integer columns are stored with the smallest integer type that fits their values. See `go_utils.cleanup.round_cols` for more information.
+    remove_homogenous : bool, default=True
+        If True, columns where all values are the same are removed. See `go_utils.cleanup.remove_homogenous_cols` for more information.
+    homogenous_exclude : list of str, default=[]
+        The **raw** names of columns that are kept even if all their values are the same.
 
     Returns
     -------
@@ -565,12 +754,15 @@ def apply_cleanup(lc_df, unpack=True):
     """
     lc_df = lc_df.copy()
 
-    remove_homogenous_cols(lc_df, inplace=True)
+    if remove_homogenous:
+        remove_homogenous_cols(lc_df, exclude=homogenous_exclude, inplace=True)
     rename_latlon_cols(lc_df, inplace=True)
     cleanup_column_prefix(lc_df, inplace=True)
-    lc_df, overall_cols, directional_cols = unpack_classifications(lc_df, unpack=unpack)
+    lc_df, overall_cols, directional_cols = unpack_classifications(
+        lc_df, unpack=unpack, sparse=sparse
+    )
 
-    round_cols(lc_df, inplace=True)
+    round_cols(lc_df, inplace=True, compact=compact)
     standardize_null_vals(lc_df, inplace=True)
     return lc_df
 
@@ -745,82 +937,102 @@ def qa_filter(
     return lc_df
 
 
-def _accumulate_ties(classification_list):
-    classifications = list()
-    i = 0
-    while i < len(classification_list) - 1:
-        if classification_list[i][1] == classification_list[i + 1][1]:
-            classifications.append(classification_list[i][0])
-            classifications.append(classification_list[i + 1][0])
-            i += 1
-        else:
-            break
-
-    output = ", ".join([classification for classification in classifications])
-    if not output:
-        if len(classification_list) != 0:
-            output = classification_list[0][0]
-        else:
-            output = "NA"
-    # TODO replace w regex methods
-    return output, i + 1
-
-
-def _rank_direction(classification_dict, direction_classifications):
-    if pd.isna(direction_classifications):
-        return "NA", "NA"
-    classifications_list = []
-    classifications = direction_classifications.split(";")
-    for classification_data in classifications:
-        percent = extract_classification_percentage(classification_data)
-        classification = extract_classification_name(classification_data)
-        if classification in classification_dict:
-            classification_dict[classification] += percent
-        else:
-            classification_dict[classification] = percent
-        classifications_list.append((classification, percent))
-    classifications_list = sorted(
-        classifications_list, key=lambda x: x[1], reverse=True
-    )
-    if len(classifications_list) < 2:
-        return classifications_list[0][0], "NA"
+def _is_group_start(values):
+    is_start = np.ones(len(values), dtype=bool)
+    is_start[1:] = values[1:] != values[:-1]
+    return is_start
 
-    primary_classification, i = _accumulate_ties(classifications_list)
-    secondary_classification, temp = _accumulate_ties(classifications_list[i:])
 
-    return primary_classification, secondary_classification
+def _accumulate_ties(groups, names):
+    # Joins the names of each group like the ties of a sorted classification list were accumulated:
+    # a single classification is kept as is, while tied classifications are joined pairwise
+    # (e.g. "a, b, b, c" for three tied classifications a, b, and c)
+    if not len(groups):
+        return pd.Series(dtype=object)
+    starts = _is_group_start(groups)
+    repeats = np.where(starts | np.roll(starts, -1), 1, 2)
+    groups = np.repeat(groups, repeats)
+    names = np.repeat(names, repeats).astype(object)
 
+    starts = _is_group_start(groups)
+    pieces = np.where(np.roll(starts, -1), names, names + ", ")
+    return pd.Series(
+        np.add.reduceat(pieces, np.flatnonzero(starts)), index=groups[starts]
+    )
 
-def _rank_classifications(*args):
-    classification_dict = {}
-    rank_directions = [
-        classification
-        for arg in args
-        for classification in _rank_direction(classification_dict, arg)
-    ]
-    primary, secondary = ("NA", 0), ("NA", 0)
-    if classification_dict:
-        if len(classification_dict) < 2:
-            primary = (
-                list(classification_dict.keys())[0],
-                list(classification_dict.values())[0],
+
+def _rank_groups(groups, percents, names):
+    # Entries must be sorted by group and descending percentage (ties in order of appearance)
+    # Returns the primary and secondary classifications and percentages of each group
+    is_start = _is_group_start(groups)
+    is_new_value = is_start | _is_group_start(percents)
+    value_count = np.cumsum(is_new_value)
+    ranks = value_count - value_count[is_start][np.cumsum(is_start) - 1] + 1
+
+    ranked = []
+    for rank in [1, 2]:
+        is_rank = ranks == rank
+        rank_groups = groups[is_rank]
+        is_first = _is_group_start(rank_groups)
+        ranked.append(
+            (
+                _accumulate_ties(rank_groups, names[is_rank]),
+                pd.Series(percents[is_rank][is_first], index=rank_groups[is_first]),
             )
-        else:
-            sorted_classifications = sorted(
-                classification_dict.items(), key=lambda x: x[1], reverse=True
+        )
+    return ranked
+
+
+def _rank_directions(entries, num_rows, num_directions):
+    direction_ranks = []
+    for direction_index in range(num_directions):
+        direction_entries = entries[entries["direction_index"] == direction_index]
+        rows = direction_entries["row"].to_numpy()
+        percents = direction_entries["percent"].to_numpy()
+        order = np.lexsort((-percents, rows))
+        ranked = _rank_groups(
+            rows[order],
+            percents[order],
+            direction_entries["description"].to_numpy()[order],
+        )
+        for names, _ in ranked:
+            direction_ranks.append(
+                names.reindex(range(num_rows), fill_value="NA").to_numpy(dtype=object)
             )
-            primary, i = _accumulate_ties(sorted_classifications)
-            primary = primary, sorted_classifications[0][1]
-            if i < len(sorted_classifications):
-                secondary, temp = _accumulate_ties(sorted_classifications[i:])
-                secondary = secondary, sorted_classifications[i][1]
-    return (
-        *rank_directions,
-        primary[0],
-        secondary[0],
-        primary[1] / len(args),
-        secondary[1] / len(args),
-    )
+    return direction_ranks
+
+
+def _rank_overall(entries, num_rows, num_directions):
+    # Orders the entries like they appear in the observation (by direction, then by entry)
+    entries = entries.iloc[
+        np.lexsort(
+            (
+                np.arange(len(entries)),
+                entries["direction_index"].to_numpy(),
+                entries["row"].to_numpy(),
+            )
+        )
+    ]
+    # Classifications are numbered in order of their first appearance within each observation
+    codes = entries.groupby(["row", "description"], sort=False).ngroup().to_numpy()
+    totals = np.bincount(codes, weights=entries["percent"].to_numpy())
+    _, first = np.unique(codes, return_index=True)
+    rows = entries["row"].to_numpy()[first]
+    names = entries["description"].to_numpy()[first]
+
+    order = np.lexsort((np.arange(len(totals)), -totals, rows))
+    overall = []
+    ranked = _rank_groups(rows[order], totals[order], names[order])
+    for names, _ in ranked:
+        overall.append(
+            names.reindex(range(num_rows), fill_value="NA").to_numpy(dtype=object)
+        )
+    for _, percents in ranked:
+        overall.append(
+            percents.reindex(range(num_rows), fill_value=0).to_numpy(dtype=float)
+            / num_directions
+        )
+    return overall
 
 
 def get_main_classifications(
@@ -843,28 +1055,68 @@ def get_main_classifications(
     secondary_percentage="lc_SecondaryPercentage",
     inplace=False,
 ):
+    """
+    Determines the primary and secondary classifications of each direction and of the whole observation. Classifications are ranked by their percentage, and tied classifications are all listed (e.g. `"Urban, Grass"`). The overall percentages are the sum of the directional percentages divided by 4. Missing classifications are denoted by `"NA"`.
+
+    The ranking works on the exploded classification entries of all observations at once (see [get_classification_table](#get_classification_table)) rather than on each row.
+
+    Parameters
+    ----------
+    lc_df : pd.DataFrame
+        A DataFrame containing Landcover data
+    north_classification : str, default="lc_NorthClassifications"
+        The name of the column which contains the North Classifications
+    east_classification : str, default="lc_EastClassifications"
+        The name of the column which contains the East Classifications
+    south_classification : str, default="lc_SouthClassifications"
+        The name of the column which contains the South Classifications
+    west_classification : str, default="lc_WestClassifications"
+        The name of the column which contains the West Classifications
+    north_primary, north_secondary, east_primary, east_secondary, south_primary, south_secondary, west_primary, west_secondary : str
+        The names of the newly generated columns for the primary and secondary classifications of each direction
+    primary_classification : str, default="lc_PrimaryClassification"
+        The name of the newly generated column for the overall primary classification
+    secondary_classification : str, default="lc_SecondaryClassification"
+        The name of the newly generated column for the overall secondary classification
+    primary_percentage : str, default="lc_PrimaryPercentage"
+        The name of the newly generated column for the overall percentage of the primary classification
+    secondary_percentage : str, default="lc_SecondaryPercentage"
+        The name of the newly generated column for the overall percentage of the secondary classification
+    inplace : bool, default=False
+        Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+
+    Returns
+    -------
+    pd.DataFrame or None
+        A DataFrame with the primary and secondary classifications. If `inplace=True` it returns None.
+    """
     if not inplace:
         lc_df = lc_df.copy()
-    vectorized_rank = np.vectorize(_rank_classifications)
-    (
-        lc_df[north_primary],
-        lc_df[north_secondary],
-        lc_df[east_primary],
-        lc_df[east_secondary],
-        lc_df[south_primary],
-        lc_df[south_secondary],
-        lc_df[west_primary],
-        lc_df[west_secondary],
-        lc_df[primary_classification],
-        lc_df[secondary_classification],
-        lc_df[primary_percentage],
-        lc_df[secondary_percentage],
-    ) = vectorized_rank(
-        lc_df[north_classification].to_numpy(),
-        lc_df[east_classification].to_numpy(),
-        lc_df[south_classification].to_numpy(),
-        lc_df[west_classification].to_numpy(),
-    )
+    classifications = [
+        north_classification,
+        east_classification,
+        south_classification,
+        west_classification,
+    ]
+    entries = _explode_classifications(lc_df, classifications)
+    ranks = _rank_directions(entries, len(lc_df), len(classifications))
+    ranks += _rank_overall(entries, len(lc_df), len(classifications))
+    rank_columns = [
+        north_primary,
+        north_secondary,
+        east_primary,
+        east_secondary,
+        south_primary,
+        south_secondary,
+        west_primary,
+        west_secondary,
+        primary_classification,
+        secondary_classification,
+        primary_percentage,
+        secondary_percentage,
+    ]
+    for column, values in zip(rank_columns, ranks):
+        lc_df[column] = values
 
     if not inplace:
         return lc_df
@@ -1,11 +1,15 @@
 import math
-import re
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
 from go_utils.cleanup import (
+    build_completeness_index,
+    count_occurrences,
+    count_set_bits,
+    get_bit_binary,
+    get_cumulative_scores,
     rename_latlon_cols,
     replace_column_prefix,
     round_cols,
@@ -59,19 +63,6 @@ def cleanup_column_prefix(df, inplace=False):
     return replace_column_prefix(df, "mosquitohabitatmapper", "mhm", inplace=inplace)
 
 
-def _entry_to_num(entry):
-    try:
-        if entry == "more than 100":
-            return 101, 1, 1
-        if pd.isna(entry):
-            return -9999, 0, 0
-        elif float(entry) > 100:
-            return 101, min(math.floor(math.log10(float(entry) / 100)) + 1, 4), 0
-        return float(entry), 0, 0
-    except ValueError:
-        return float(re.sub(r"-.*", "", entry)), 0, 1
-
-
 def larvae_to_num(
     mhm_df,
     larvae_count_col="mhm_LarvaeCount",
@@ -104,18 +95,34 @@ def larvae_to_num(
 
     if not inplace:
         mhm_df = mhm_df.copy()
+    # Each distinct entry is only converted once
+    codes, entries = pd.factorize(mhm_df[larvae_count_col])
+    entries = pd.Series(entries, dtype=object).astype(str)
+    is_more_than_100 = (entries == "more than 100").to_numpy()
     # Preprocessing step to remove extremely erroneous values
-    for i in mhm_df.index:
-        count = mhm_df[larvae_count_col][i]
-        if not pd.isna(count) and type(count) is str and "e+" in count:
-            mhm_df.at[i, larvae_count_col] = "100000"
-
-    larvae_conversion = np.vectorize(_entry_to_num)
-    (
-        mhm_df[larvae_count_col],
-        mhm_df[magnitude],
-        mhm_df[range_flag],
-    ) = larvae_conversion(mhm_df[larvae_count_col].to_numpy())
+    entries = entries.mask(entries.str.contains("e+", regex=False), "100000")
+
+    numbers = pd.to_numeric(entries, errors="coerce").to_numpy()
+    is_range = np.isnan(numbers) & ~is_more_than_100
+    # Ranges use their lower bound
+    numbers[is_range] = pd.to_numeric(
+        entries[is_range].str.replace(r"-.*", "", regex=True)
+    )
+
+    is_large = ~is_range & (numbers > 100)
+    magnitudes = np.zeros(len(entries), dtype=int)
+    magnitudes[is_large] = np.minimum(
+        np.floor(np.log10(numbers[is_large] / 100)) + 1, 4
+    )
+    magnitudes[is_more_than_100] = 1
+    numbers[is_large | is_more_than_100] = 101
+    if np.array_equal(numbers, np.trunc(numbers)):
+        numbers = numbers.astype(int)
+
+    # Null entries have the code -1, which selects the values appended for them
+    mhm_df[larvae_count_col] = np.append(numbers, -9999)[codes]
+    mhm_df[magnitude] = np.append(magnitudes, 0)[codes]
+    mhm_df[range_flag] = np.append((is_range | is_more_than_100).astype(int), 0)[codes]
 
     if not inplace:
         return mhm_df
@@ -270,7 +277,7 @@ def photo_bit_flags(
     - `RejectedCount`: The number of photos that were rejected per record.
     - `PendingCount`: The number of photos that are pending approval per record.
     - `PhotoBitBinary`: A string that represents the presence of a photo in the order of watersource, larvae, and abdomen. For example, if the entry is `110`, that indicates that there is a water source photo and a larvae photo, but no abdomen photo.
-    - `PhotoBitDecimal`: The numerical representation of the mhm_PhotoBitBinary string.
+    - `PhotoBitDecimal`: The numerical representation of the mhm_PhotoBitBinary string, stored as an unsigned 8 bit integer.
 
     Parameters
     ----------
@@ -289,7 +296,7 @@ def photo_bit_flags(
     pending_count : str, default="mhm_PendingCount"
         The name of the column that will store the PendingCount flag.
     photo_bit_binary : str, default="mhm_PhotoBitBinary"
-        The name of the column that will store the PhotoBitBinary flag.
+        The name of the column that will store the PhotoBitBinary flag. If None, the PhotoBitBinary flag isn't created.
     photo_bit_decimal : str, default="mhm_PhotoBitDecimal"
         The name of the column that will store the PhotoBitDecimal flag.
     inplace : bool, default=False
@@ -301,52 +308,30 @@ def photo_bit_flags(
         A DataFrame with the photo flags. If `inplace=True` it returns None.
     """
 
-    def pic_data(*args):
-        pic_count = 0
-        rejected_count = 0
-        pending_count = 0
-        valid_photo_bit_mask = ""
-
-        # bit_power = len(args) - 1
-        # For url string -- if we see ANY http, add 1
-        # also count all valid photos, rejected photos,
-        # If there are NO http then add 0, to empty photo field
-        for url_string in args:
-            if not pd.isna(url_string):
-                if "http" not in url_string:
-                    valid_photo_bit_mask += "0"
-                else:
-                    valid_photo_bit_mask += "1"
-
-                pic_count += url_string.count("http")
-                pending_count += url_string.count("pending")
-                rejected_count += url_string.count("rejected")
-            else:
-                valid_photo_bit_mask += "0"
-
-        return (
-            pic_count,
-            rejected_count,
-            pending_count,
-            valid_photo_bit_mask,
-            int(valid_photo_bit_mask, 2),
-        )
-
     if not inplace:
         df = df.copy()
 
-    get_photo_data = np.vectorize(pic_data)
-    (
-        df[photo_count],
-        df[rejected_count],
-        df[pending_count],
-        df[photo_bit_binary],
-        df[photo_bit_decimal],
-    ) = get_photo_data(
-        df[watersource_photos].to_numpy(),
-        df[larvae_photos].to_numpy(),
-        df[abdomen_photos].to_numpy(),
-    )
+    photo_counts = np.zeros(len(df), dtype=int)
+    rejected_counts = np.zeros(len(df), dtype=int)
+    pending_counts = np.zeros(len(df), dtype=int)
+    bit_decimals = np.zeros(len(df), dtype=np.uint8)
+    # For each url column -- a 1 bit if it contains ANY http, otherwise a 0 bit
+    for url_col in [watersource_photos, larvae_photos, abdomen_photos]:
+        urls = df[url_col]
+        url_counts, url_rejected_counts, url_pending_counts = count_occurrences(
+            urls, ["http", "rejected", "pending"]
+        )
+        photo_counts += url_counts
+        rejected_counts += url_rejected_counts
+        pending_counts += url_pending_counts
+        bit_decimals = (bit_decimals << 1) | (url_counts > 0).astype(np.uint8)
+
+    df[photo_count] = photo_counts
+    df[rejected_count] = rejected_counts
+    df[pending_count] = pending_counts
+    if photo_bit_binary:
+        df[photo_bit_binary] = get_bit_binary(bit_decimals, 3)
+    df[photo_bit_decimal] = bit_decimals
 
     if not inplace:
         return df
@@ -354,11 +339,12 @@ def photo_bit_flags(
 
 def completion_score_flag(
     df,
-    photo_bit_binary="mhm_PhotoBitBinary",
+    photo_bit_decimal="mhm_PhotoBitDecimal",
     has_genus="mhm_HasGenus",
     sub_completeness="mhm_SubCompletenessScore",
     completeness="mhm_CumulativeCompletenessScore",
     inplace=False,
+    completeness_index=None,
 ):
     """
     Adds the following completness score flags:
@@ -369,14 +355,16 @@ def completion_score_flag(
     ----------
     df : pd.DataFrame
         A mosquito habitat mapper DataFrame with the [`PhotoBitDecimal`](#photo_bit_flags) and [`HasGenus`](#has_genus_flags) flags.
-    photo_bit_binary: str, default="mhm_PhotoBitBinary"
-        The name of the column in the mosquito habitat mapper DataFrame that contains the PhotoBitBinary flag.
+    photo_bit_decimal: str, default="mhm_PhotoBitDecimal"
+        The name of the column in the mosquito habitat mapper DataFrame that contains the PhotoBitDecimal flag.
     sub_completeness : str, default="mhm_HasGenus"
         The name of the column in the mosquito habitat mapper DataFrame that will contain the generated SubCompletenessScore flag.
     completeness : str, default="mhm_SubCompletenessScore"
         The name of the column in the mosquito habitat mapper DataFrame that will contain the generated CumulativeCompletenessScore flag.
     inplace : bool, default=False
         Whether to return a new DataFrame. If True then no DataFrame copy is not returned and the operation is performed in place.
+    completeness_index : dict, optional
+        A completeness index of the DataFrame (see `go_utils.cleanup.build_completeness_index`). If None, it is built from all the columns.
 
     Returns
     -------
@@ -384,36 +372,22 @@ def completion_score_flag(
         A DataFrame with completion score flags. If `inplace=True` it returns None.
     """
 
-    def sum_bit_mask(bit_mask="0"):
-        total = 0.0
-        for char in bit_mask:
-            total += int(char)
-        return total
-
     if not inplace:
         df = df.copy()
+    if completeness_index is None:
+        completeness_index = build_completeness_index(df)
 
-    scores = {}
-    scores["sub_score"] = []
-    # Cummulative Completion Score
-    scores["cumulative_score"] = round(df.count(axis=1) / len(df.columns), 2)
-    # Sub-Score
-    for index in df.index:
-        bit_mask = df[photo_bit_binary][index]
-        sub_score = df[has_genus][index] + sum_bit_mask(bit_mask=bit_mask)
-        sub_score /= 4.0
-        scores["sub_score"].append(sub_score)
-
-    df[sub_completeness], df[completeness] = (
-        scores["sub_score"],
-        scores["cumulative_score"],
-    )
+    cumulative_scores = get_cumulative_scores(completeness_index)
+    # The 3 photo bits and the genus
+    set_bits = count_set_bits(df[photo_bit_decimal])
+    df[sub_completeness] = (df[has_genus].to_numpy() + set_bits) / 4.0
+    df[completeness] = cumulative_scores
 
     if not inplace:
         return df
 
 
-def apply_cleanup(mhm_df):
+def apply_cleanup(mhm_df, compact=False):
     """Applies a full cleanup procedure to the mosquito habitat mapper data. Only returns a copy.
     It follows the following steps:
     - Removes Homogenous Columns
@@ -427,6 +401,8 @@ def apply_cleanup(mhm_df):
     ----------
     mhm_df : pd.DataFrame
         A DataFrame containing **raw** Mosquito Habitat Mapper Data from the API.
+    compact : bool, default=False
+        If True, the integer columns are stored with the smallest integer type that fits their values. See `go_utils.cleanup.round_cols` for more information.
 
     Returns
     -------
@@ -438,7 +414,7 @@ def apply_cleanup(mhm_df):
     rename_latlon_cols(mhm_df, inplace=True)
     cleanup_column_prefix(mhm_df, inplace=True)
     larvae_to_num(mhm_df, inplace=True)
-    round_cols(mhm_df, inplace=True)
+    round_cols(mhm_df, inplace=True, compact=compact)
     standardize_null_vals(mhm_df, inplace=True)
     return mhm_df
 
@@ -501,12 +477,12 @@ def photo_subjects(mhm_df):
         The DataFrame containing Mosquito Habitat Mapper Data with the PhotoBitDecimal Flag.
     """
 
-    total_dict = {"Larvae Photos": 0, "Abdomen Photos": 0, "Watersource Photos": 0}
-
-    for number in mhm_df["mhm_PhotoBitDecimal"]:
-        total_dict["Watersource Photos"] += number & 4
-        total_dict["Larvae Photos"] += number & 2
-        total_dict["Abdomen Photos"] += number & 1
+    bit_decimals = mhm_df["mhm_PhotoBitDecimal"].to_numpy(dtype=int)
+    total_dict = {
+        "Larvae Photos": int(np.sum(bit_decimals & 2)),
+        "Abdomen Photos": int(np.sum(bit_decimals & 1)),
+        "Watersource Photos": int(np.sum(bit_decimals & 4)),
+    }
 
     for key in total_dict.keys():
         if total_dict[key] != 0:
@@ -1,12 +1,25 @@
+import csv
+import hashlib
 import os
 import re
+import uuid
 import warnings
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
 
 import numpy as np
 import pandas as pd
 import requests
 from PIL import Image
 
+from go_utils.download import create_session
+
 
 def get_globe_photo_id(url: str):
     """
@@ -46,7 +59,51 @@ def remove_bad_characters(filename: str):
     return re.sub(r"[<>:?\"/\\|*]", "", filename)
 
 
-def download_photo(url: str, directory: str, filename: str, resolution=None):
+photo_chunk_size = 64 * 1024
+
+
+def _stream_photo(url, path, session=None):
+    # Streams the photo into a partial file next to its path so that it's never held in memory and an interrupted download doesn't leave a truncated photo
+    # Each download gets its own partial file since several downloads can target the same path
+    temp_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        with (session or requests).get(
+            url, stream=True, allow_redirects=True
+        ) as response:
+            response.raise_for_status()
+            with open(temp_path, "xb") as file:
+                for chunk in response.iter_content(chunk_size=photo_chunk_size):
+                    file.write(chunk)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def _retry_download(url, download):
+    # Sometimes the download fails and it has to be rerun
+    try:
+        return download()
+    except Exception as e:
+        warnings.warn(f"{url} failed due to {repr(e)}, retrying...")
+    try:
+        result = download()
+    except Exception as e:
+        warnings.warn(f"{url} failed: {repr(e)}")
+        return None
+    warnings.warn("retry successful")
+    return result
+
+
+def download_photo(
+    url: str,
+    directory: str,
+    filename: str,
+    resolution=None,
+    session=None,
+    keep_aspect_ratio=False,
+):
     """
     Downloads a photo to a directory.
 
@@ -60,24 +117,70 @@ def download_photo(url: str, directory: str, filename: str, resolution=None):
         The name of the photo
     resolution : tuple of int, default = None
         The image resolution in width x height. e.g. (1920, 1080) for a 1080p image. If the resolution is None, the original resolution of the photo is downloaded.
+    session : requests.Session, optional
+        The session used to download the photo. Reusing a session (see `go_utils.download.create_session`) keeps the connection to the server open between photos.
+    keep_aspect_ratio : bool, default=False
+        Whether to keep the aspect ratio of the photo by fitting it within the resolution (see [resize_photo](#resize_photo)).
+
+    Returns
+    -------
+    bool
+        Whether the photo was downloaded. Failed downloads are retried once and then reported with a warning.
     """
     if any(pd.isna(x) for x in [url, directory, filename]):
         msg = f"Either url ({url}), directory ({directory}), or filename ({filename}) was None."
         warnings.warn(msg)
-    else:
-        downloaded_obj = requests.get(url, allow_redirects=True)
-        filename = remove_bad_characters(filename)
-        out_path = os.path.join(directory, filename)
-        if not os.path.exists(directory):
-            os.mkdir(directory)
-        if pd.isna(resolution):
-            with open(out_path, "wb") as file:
-                file.write(downloaded_obj.content)
-        else:
-            get_img_at_resolution(url, out_path, resolution)
+        return False
+
+    filename = remove_bad_characters(filename)
+    out_path = os.path.join(directory, filename)
+    os.makedirs(directory, exist_ok=True)
+    if not pd.isna(resolution):
+        return get_img_at_resolution(
+            url, out_path, resolution, session, keep_aspect_ratio
+        )
+
+    def get_img():
+        os.replace(_stream_photo(url, out_path, session), out_path)
+        return True
+
+    return _retry_download(url, get_img) is not None
+
 
+def _get_resized_size(size, resolution, keep_aspect_ratio):
+    if not keep_aspect_ratio:
+        return tuple(resolution)
+    # Fits the photo within the resolution without enlarging it
+    scale = min(resolution[0] / size[0], resolution[1] / size[1], 1)
+    return (max(round(size[0] * scale), 1), max(round(size[1] * scale), 1))
 
-def get_img_at_resolution(url, path, resolution):
+
+def resize_photo(source_path, path, resolution, keep_aspect_ratio=False):
+    """
+    Resizes a photo. Large JPEG photos are decoded at a reduced scale (Pillow's draft mode) when the resolution is much smaller, which is considerably faster than decoding the whole photo.
+
+    Parameters
+    ----------
+    source_path : str
+        The path of the photo to resize
+    path : str
+        The path to save the resized photo to. The file format is determined by its extension.
+    resolution : tuple of int
+        The image resolution in width x height. e.g. (1920, 1080) for a 1080p image.
+    keep_aspect_ratio : bool, default=False
+        Whether to keep the aspect ratio of the photo by fitting it within the resolution. Photos that already fit within the resolution aren't resized.
+    """
+    with Image.open(source_path) as img:
+        size = _get_resized_size(img.size, resolution, keep_aspect_ratio)
+        if img.format == "JPEG":
+            # Decodes at no less than twice the resolution to keep the quality of the resize
+            img.draft(img.mode, (size[0] * 2, size[1] * 2))
+        if img.size != size:
+            img = img.resize(size)
+        img.save(path)
+
+
+def get_img_at_resolution(url, path, resolution, session=None, keep_aspect_ratio=False):
     """
     Downloads an image from a url at a specified resolution
 
@@ -89,42 +192,353 @@ def get_img_at_resolution(url, path, resolution):
         The filepath to save the image to
     resolution : tuple of int
         The image resolution in width x height. e.g. (1920, 1080) for a 1080p image.
+    session : requests.Session, optional
+        The session used to download the image.
+    keep_aspect_ratio : bool, default=False
+        Whether to keep the aspect ratio of the image by fitting it within the resolution (see [resize_photo](#resize_photo)).
+
+    Returns
+    -------
+    bool
+        Whether the image was downloaded.
     """
 
     def get_img():
-        with Image.open(requests.get(url, stream=True).raw) as img:
-            img.resize(resolution).save(path)
+        temp_path = _stream_photo(url, path, session)
+        try:
+            resize_photo(temp_path, path, resolution, keep_aspect_ratio)
+        finally:
+            os.remove(temp_path)
+        return True
+
+    return _retry_download(url, get_img) is not None
+
+
+manifest_filename = "photo_manifest.csv"
+manifest_columns = ["photo_id", "url", "path", "resolution", "size", "sha256", "status"]
+target_columns = ["url", "directory", "filename", "resolution"]
+
+
+def _get_file_checksum(path):
+    checksum = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def _format_resolution(resolution):
+    if pd.isna(resolution):
+        return ""
+    return "x".join(str(size) for size in resolution)
+
 
+def read_photo_manifest(directory):
+    """
+    Reads the manifest of the photos downloaded to a directory by [download_all_photos](#download_all_photos). The manifest is stored in the `photo_manifest.csv` file of the directory.
+
+    Parameters
+    ----------
+    directory : str
+        The directory the photos were downloaded to.
+
+    Returns
+    -------
+    pd.DataFrame
+        The `photo_id`, `url`, `path` (relative to the directory), `resolution`, `size` (in bytes), `sha256` checksum and `status` (`"downloaded"` or `"failed"`) of the latest download of each photo.
+    """
+    manifest_path = os.path.join(directory, manifest_filename)
+    if not os.path.exists(manifest_path):
+        return pd.DataFrame(columns=manifest_columns)
+    manifest_df = pd.read_csv(
+        manifest_path,
+        dtype={"photo_id": str, "resolution": str, "sha256": str},
+        keep_default_na=False,
+    )
+    return manifest_df.drop_duplicates(subset="path", keep="last").reset_index(
+        drop=True
+    )
+
+
+def _is_downloaded(entry, directory, resolution, verify_checksums):
+    path = os.path.join(directory, entry["path"])
+    if (
+        entry["status"] != "downloaded"
+        or entry["resolution"] != _format_resolution(resolution)
+        or not os.path.exists(path)
+        or os.path.getsize(path) != int(entry["size"])
+    ):
+        return False
+    return not verify_checksums or _get_file_checksum(path) == entry["sha256"]
+
+
+def get_pending_targets(targets, verify_checksums=False):
+    """
+    Finds the targets that haven't been downloaded yet according to the manifests of their directories (see [read_photo_manifest](#read_photo_manifest)). Photos that failed to download, are missing, or have a different size than recorded (e.g. because the download was interrupted) are pending.
+
+    Parameters
+    ----------
+    targets : list of tuple of str
+        Contains tuples that store the url, directory, filename, and resolution of the desired photos.
+    verify_checksums : bool, default=False
+        Whether to also compare the checksums of the downloaded photos with the manifest. This requires reading every downloaded photo.
+
+    Returns
+    -------
+    list of tuple of str
+        The targets that still need to be downloaded.
+    """
+    manifests = {}
+    pending_targets = []
+    for target in targets:
+        url, directory, filename, resolution = target
+        if pd.isna(directory) or pd.isna(filename):
+            pending_targets.append(target)
+            continue
+        if directory not in manifests:
+            manifest_df = read_photo_manifest(directory)
+            manifests[directory] = dict(
+                zip(manifest_df["path"], manifest_df.to_dict("records"))
+            )
+        entry = manifests[directory].get(remove_bad_characters(filename))
+        if entry is None or not _is_downloaded(
+            entry, directory, resolution, verify_checksums
+        ):
+            pending_targets.append(target)
+    return pending_targets
+
+
+def _get_manifest_entry(target, downloaded):
+    url, directory, filename, resolution = target
+    filename = remove_bad_characters(filename)
+    path = os.path.join(directory, filename)
+    entry = {
+        "photo_id": get_globe_photo_id(url),
+        "url": url,
+        "path": filename,
+        "resolution": _format_resolution(resolution),
+        "size": "",
+        "sha256": "",
+        "status": "failed",
+    }
+    if downloaded:
+        entry.update(
+            size=os.path.getsize(path),
+            sha256=_get_file_checksum(path),
+            status="downloaded",
+        )
+    return entry
+
+
+def _fetch_target(target, session):
+    # Downloads a photo in a thread, leaving photos that need resizing in their partial file
+    url, directory, filename, resolution = target
+    if any(pd.isna(x) for x in [url, directory, filename]):
+        msg = f"Either url ({url}), directory ({directory}), or filename ({filename}) was None."
+        warnings.warn(msg)
+        return None
+
+    path = os.path.join(directory, remove_bad_characters(filename))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = _retry_download(url, lambda: _stream_photo(url, path, session))
+    if temp_path is None:
+        return _get_manifest_entry(target, False)
+
+    if not pd.isna(resolution):
+        return temp_path
+    os.replace(temp_path, path)
+    return _get_manifest_entry(target, True)
+
+
+def _resize_target(target, temp_path, keep_aspect_ratio):
+    # Resizes a downloaded photo, in a separate process if there are resize workers since decoding is CPU bound
+    url, directory, filename, resolution = target
+    path = os.path.join(directory, remove_bad_characters(filename))
     try:
-        get_img()
-    except Exception as e:  # Sometimes the image download fails and it has to be rerun
-        warnings.warn(f"{url} failed due to {repr(e)}, retrying...")
+        resize_photo(temp_path, path, resolution, keep_aspect_ratio)
+        resized = True
+    except Exception as e:  # e.g. corrupt photos or Pillow's DecompressionBombError
+        warnings.warn(f"{url} failed: {repr(e)}")
+        resized = False
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return _get_manifest_entry(target, resized)
+
+
+def _append_to_manifest(directory, entry):
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, manifest_filename)
+    is_new = not os.path.exists(manifest_path)
+    with open(manifest_path, "a", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=manifest_columns)
+        if is_new:
+            writer.writeheader()
+        writer.writerow(entry)
+
+
+def _compact_manifest(directory):
+    # Removes the outdated entries of photos that were downloaded again
+    manifest_df = read_photo_manifest(directory)
+    temp_path = os.path.join(directory, f"{manifest_filename}.tmp")
+    manifest_df.to_csv(temp_path, index=False)
+    os.replace(temp_path, os.path.join(directory, manifest_filename))
+
+
+def _get_resize_pool(targets, resize_workers):
+    # Processes are only spawned if they are requested and there are photos to resize
+    if not resize_workers or resize_workers < 1:
+        return None
+    if all(pd.isna(target[3]) for target in targets):
+        return None
+    return ProcessPoolExecutor(max_workers=resize_workers)
+
+
+def _stop_resize_pool(executors):
+    if executors["processes"] is not None:
+        executors["processes"] = None
+        warnings.warn(
+            "The resize processes stopped unexpectedly, so the remaining photos are resized in the download threads. "
+            'On macOS and Windows, scripts using resize_workers must be guarded by `if __name__ == "__main__":`.'
+        )
+
+
+def _submit_resize(executors, target, temp_path, keep_aspect_ratio):
+    # Resizes in the process pool while it works and in the download threads otherwise
+    if executors["processes"] is not None:
         try:
-            get_img()
-            warnings.warn("retry successful")
-        except Exception as e:
-            warnings.warn(f"{url} failed: {repr(e)}")
-            return
+            return executors["processes"].submit(
+                _resize_target, target, temp_path, keep_aspect_ratio
+            )
+        except BrokenProcessPool:
+            _stop_resize_pool(executors)
+    return executors["threads"].submit(
+        _resize_target, target, temp_path, keep_aspect_ratio
+    )
+
 
+def _download_targets(
+    targets, workers, session, manifest, resize_workers, keep_aspect_ratio
+):
+    downloaded, temp_paths = {}, {}
+    processes = _get_resize_pool(targets, resize_workers)
+    with ThreadPoolExecutor(max_workers=workers) as threads, processes or nullcontext():
+        executors = {"threads": threads, "processes": processes}
+        futures = {
+            threads.submit(_fetch_target, target, session): target for target in targets
+        }
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                target = futures.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    # The photo is resized again in a thread since its process died
+                    _stop_resize_pool(executors)
+                    result = temp_paths[target]
+                # Downloaded photos that need resizing are passed on to the resize workers
+                if isinstance(result, str):
+                    temp_paths[target] = result
+                    resize = _submit_resize(
+                        executors, target, result, keep_aspect_ratio
+                    )
+                    futures[resize] = target
+                    continue
+                downloaded[target] = (
+                    result is not None and result["status"] == "downloaded"
+                )
+                # The manifest is updated as the photos finish so that an interrupted run can be resumed
+                if manifest and result is not None:
+                    _append_to_manifest(target[1], result)
+    return downloaded
 
-def download_all_photos(targets):
+
+def _get_valid_targets(targets):
+    expectedNumParams = 4
+    if isinstance(targets, pd.DataFrame):
+        targets = targets[target_columns].itertuples(index=False, name=None)
+
+    valid_targets = []
+    for target in targets:
+        if (type(target) is tuple) and len(target) == expectedNumParams:
+            valid_targets.append(target)
+        else:
+            warnings.warn(f"Target incorrectly formatted: {target}")
+    return valid_targets
+
+
+def download_all_photos(
+    targets,
+    workers=1,
+    session=None,
+    manifest=True,
+    resize_workers=None,
+    keep_aspect_ratio=False,
+):
     """
     Downloads all photos given a list of targets which are tuples containing the url, directory, and filename.
 
     Parameters
     ----------
-    targets : list of tuple of str
-        Contains tuples that store the url, directory, filename, and resolution (will be None to get original photo resolution) of the desired photos to be downloaded in that order.
+    targets : list of tuple of str or pd.DataFrame
+        Contains tuples that store the url, directory, filename, and resolution (will be None to get original photo resolution) of the desired photos to be downloaded in that order. A DataFrame of targets (e.g. from [get_mhm_download_targets](#get_mhm_download_targets) with `as_frame=True`) is also accepted.
+    workers : int, default=1
+        The number of photos downloaded concurrently.
+    session : requests.Session, optional
+        The session shared by the downloads. Defaults to a session pooling a connection per worker, which is closed once the downloads finish.
+    manifest : bool, default=True
+        Whether to record the downloads in a manifest in each directory (see [read_photo_manifest](#read_photo_manifest)) and skip the photos that the manifest shows as completely downloaded. This allows an interrupted download to be resumed.
+    resize_workers : int, optional
+        The number of processes resizing photos while the others are downloaded. By default, photos are resized in the download threads. On macOS and Windows, using processes requires the calling script to be guarded by `if __name__ == "__main__":`. If the processes stop unexpectedly, the remaining photos are resized in the download threads.
+    keep_aspect_ratio : bool, default=False
+        Whether to keep the aspect ratio of the photos by fitting them within their resolution (see [resize_photo](#resize_photo)).
+
+    Returns
+    -------
+    dict of {tuple, bool}
+        Whether each correctly formatted target was downloaded (or had already been downloaded).
     """
-    expectedNumParams = 4
-    if pd.isna(targets):
+    if targets is None:
         warnings.warn("Targets was none")
-    else:
-        for target in targets:
-            if (type(target) is tuple) and len(target) == expectedNumParams:
-                download_photo(*target)
-            else:
-                warnings.warn(f"Target incorrectly formatted: {target}")
+        return {}
+    valid_targets = _get_valid_targets(targets)
+
+    pending_targets = valid_targets
+    if manifest:
+        pending_targets = get_pending_targets(valid_targets)
+    downloaded = {target: True for target in valid_targets}
+
+    workers = max(workers, 1)
+    created_session = None
+    if session is None:
+        session = created_session = create_session(pool_size=workers)
+    try:
+        downloaded.update(
+            _download_targets(
+                pending_targets,
+                workers,
+                session,
+                manifest,
+                resize_workers,
+                keep_aspect_ratio,
+            )
+        )
+    finally:
+        # Sessions passed by the caller are left open for reuse
+        if created_session is not None:
+            created_session.close()
+    if manifest:
+        for directory in {target[1] for target in pending_targets}:
+            if not pd.isna(directory) and os.path.exists(
+                os.path.join(directory, manifest_filename)
+            ):
+                _compact_manifest(directory)
+
+    num_failed = len(downloaded) - sum(downloaded.values())
+    if num_failed:
+        warnings.warn(f"Failed to download {num_failed} of {len(downloaded)} photos")
+    return downloaded
 
 
 def _format_param_name(name: str):
@@ -137,42 +551,119 @@ def _format_param_name(name: str):
     )
 
 
-# Constructs Photo Name using given included fields and additional information
-def _build_photo_name(
-    protocol, photo_id, name_fields, include_in_name=[], additional_name_stem=""
-):
-    valid_protocols = ["lc_", "mhm_"]
-    if not protocol or protocol not in valid_protocols:
-        warnings.warn("Invalid protocol")
-        return None
-    name = protocol
-    if additional_name_stem and additional_name_stem != "":
-        name += f"{additional_name_stem}_"
+def _warn_num_invalid_photos(num_invalid_photos: dict):
+    if sum(num_invalid_photos.values()) > 0:
+        msg = f"Skipped {sum(num_invalid_photos.values())} invalid photos: "
+        msg += str(num_invalid_photos)
+        warnings.warn(msg)
 
-    if include_in_name:
-        for field in list(include_in_name):
-            if field in set(name_fields):
-                name += f"{name_fields[field]}_"
 
-    name += f"{photo_id}.png"
-    name = remove_bad_characters(name)
-    return name
+# Lists every photo url with the position of its row and the formatted photo type
+def _get_photo_urls(df, photo_locations, split_urls=False):
+    url_frames = []
+    for param_name, column_name in photo_locations.items():
+        if not column_name:
+            continue
+        urls = df[column_name].reset_index(drop=True).astype(object)
+        if split_urls:
+            urls = urls.dropna().str.split(";").explode()
+        url_frames.append(
+            pd.DataFrame(
+                {
+                    "row": urls.index.to_numpy(),
+                    "url_type": _format_param_name(param_name),
+                    "url": urls.to_numpy(),
+                }
+            )
+        )
+    if not url_frames:
+        return pd.DataFrame(columns=["row", "url_type", "url"])
+    return pd.concat(url_frames, ignore_index=True)
 
 
-def _get_mosquito_classification(genus, species):
-    classification = genus
-    if pd.isna(classification):
-        classification = "None"
-    elif not pd.isna(species):
-        classification = f"{classification} {species}"
-    return classification
+# Extracts the photo ids of the valid urls and counts the invalid ones
+def _classify_photo_urls(urls):
+    has_url = urls.notna().to_numpy()
+    text = urls.where(has_url, "").astype(str)
+    is_https = has_url & text.str.contains("https", regex=False).to_numpy()
+    is_rejected = (
+        has_url & ~is_https & text.str.contains("rejected", regex=False).to_numpy()
+    )
+    is_pending = (
+        has_url
+        & ~is_https
+        & ~is_rejected
+        & text.str.contains("pending", regex=False).to_numpy()
+    )
 
+    photo_ids = text.str.extract(r"\d\d\d\d/\d\d/\d\d/(.*)/", expand=False)
+    is_valid = is_https & photo_ids.str.fullmatch(r"\d+").fillna(False).to_numpy()
+
+    num_invalid_photos = {
+        "invalid_URL": int(np.sum(~is_https & ~is_rejected & ~is_pending)),
+        "rejected": int(np.sum(is_rejected)),
+        "pending": int(np.sum(is_pending)),
+        "bad_photo_id": int(np.sum(is_https & ~is_valid)),
+    }
+    return photo_ids, is_valid, num_invalid_photos
+
+
+def _format_coordinates(coordinates):
+    return np.round(coordinates.to_numpy(dtype=float), 5).astype(str)
 
-def _warn_num_invalid_photos(num_invalid_photos: dict):
-    if sum(num_invalid_photos.values()) > 0:
-        msg = f"Skipped {sum(num_invalid_photos.values())} invalid photos: "
-        msg += str(num_invalid_photos)
-        warnings.warn(msg)
+
+def _format_dates(dates):
+    return pd.to_datetime(dates, errors="coerce").dt.strftime("%Y-%m-%d").to_numpy()
+
+
+def _get_mosquito_classifications(genus, species):
+    genus_names = genus.astype(str)
+    classifications = np.where(
+        species.isna(), genus_names, genus_names + " " + species.astype(str)
+    )
+    return np.where(genus.isna(), "None", classifications)
+
+
+# Constructs the photo names using the given included fields and additional information
+def _build_photo_names(
+    protocol, photo_ids, name_fields, include_in_name=[], additional_name_stem=""
+):
+    names = pd.Series(protocol, index=photo_ids.index)
+    if additional_name_stem:
+        names += f"{additional_name_stem}_"
+    for field in include_in_name or []:
+        if field in name_fields:
+            names += pd.Series(name_fields[field](), index=photo_ids.index) + "_"
+    names += photo_ids + ".png"
+    return names.str.replace(r"[<>:?\"/\\|*]", "", regex=True)
+
+
+def _get_download_targets(urls, names, directory, resolution, as_frame):
+    target_df = pd.DataFrame(
+        {
+            "url": urls.to_numpy(),
+            "directory": directory,
+            "filename": names.to_numpy(),
+            "resolution": [resolution] * len(urls),
+        },
+        columns=target_columns,
+    )
+    target_df = target_df.drop_duplicates(["url", "directory", "filename"])
+    if as_frame:
+        return target_df.reset_index(drop=True)
+    return set(target_df.itertuples(index=False, name=None))
+
+
+def _download_target_frame(target_df, as_frame, **download_args):
+    downloaded = download_all_photos(target_df, **download_args)
+    if not as_frame:
+        return set(target_df.itertuples(index=False, name=None))
+    is_downloaded = [
+        downloaded.get(target, False)
+        for target in target_df.itertuples(index=False, name=None)
+    ]
+    target_df["status"] = np.where(is_downloaded, "downloaded", "failed")
+    return target_df
 
 
 def get_mhm_download_targets(
@@ -191,6 +682,7 @@ def get_mhm_download_targets(
     include_in_name=[],
     additional_name_stem="",
     resolution=None,
+    as_frame=False,
 ):
     """
     Generates mosquito habitat mapper targets to download
@@ -235,89 +727,41 @@ def get_mhm_download_targets(
         Additional custom information the user can add to the name.
     resolution : tuple of int, default = None
         The image resolution in width x height. e.g. (1920, 1080) for a 1080p image. If the resolution is None, the original resolution of the photo is downloaded.
+    as_frame : bool, default=False
+        Whether to return the targets as a DataFrame instead of a set.
 
     Returns
     -------
-    set of tuple of str
-        Contains the (url, directory, and filename) for each desired mosquito habitat mapper photo
+    set of tuple of str or pd.DataFrame
+        Contains the (url, directory, filename, and resolution) for each desired mosquito habitat mapper photo. If `as_frame` is True, these are the `url`, `directory`, `filename`, and `resolution` columns of a DataFrame.
     """
     arguments = locals()
-    targets = set()
-    num_invalid_photos = {
-        "invalid_URL": 0,
-        "rejected": 0,
-        "pending": 0,
-        "bad_photo_id": 0,
-    }
-
-    def get_photo_args(
-        url_entry,
-        url_type,
-        latitude,
-        longitude,
-        watersource,
-        date,
-        mhm_id,
-        genus,
-        species,
-    ):
-        if pd.isna(url_entry):
-            return
-
-        urls = url_entry.split(";")
-        date_str = pd.to_datetime(str(date)).strftime("%Y-%m-%d")
-
-        for url in urls:
-            if not pd.isna(url) and "https" in url:
-                photo_id = get_globe_photo_id(url)
-
-                name_fields = {
-                    "url_type": url_type,
-                    "watersource": watersource,
-                    "latitude": round(latitude, 5),
-                    "longitude": round(longitude, 5),
-                    "date_str": date_str,
-                    "mhm_id": mhm_id,
-                    "classification": _get_mosquito_classification(genus, species),
-                }
+    photo_locations = {k: v for k, v in arguments.items() if "photo" in k}
+    photo_urls = _get_photo_urls(mhm_df, photo_locations, split_urls=True)
+    photo_ids, is_valid, num_invalid_photos = _classify_photo_urls(photo_urls["url"])
 
-                # Checks photo_id is valid
-                if not pd.isna(photo_id) and int(photo_id) >= 0:
-                    protocol = "mhm_"
-                    name = _build_photo_name(
-                        protocol,
-                        photo_id,
-                        name_fields,
-                        include_in_name,
-                        additional_name_stem,
-                    )
-                    targets.add((url, directory, name, resolution))
-                else:
-                    num_invalid_photos["bad_photo_id"] += 1
-            elif not pd.isna(url) and "rejected" in url:
-                num_invalid_photos["rejected"] += 1
-            elif not pd.isna(url) and "pending" in url:
-                num_invalid_photos["pending"] += 1
-            else:
-                num_invalid_photos["invalid_URL"] += 1
+    photo_urls, photo_ids = photo_urls[is_valid], photo_ids[is_valid]
+    rows = mhm_df.iloc[photo_urls["row"].to_numpy()]
+    name_fields = {
+        "url_type": lambda: photo_urls["url_type"].to_numpy(),
+        "watersource": lambda: rows[watersource_col].astype(str).to_numpy(),
+        "latitude": lambda: _format_coordinates(rows[latitude_col]),
+        "longitude": lambda: _format_coordinates(rows[longitude_col]),
+        "date_str": lambda: _format_dates(rows[date_col]),
+        "mhm_id": lambda: rows[id_col].astype(str).to_numpy(),
+        "classification": lambda: _get_mosquito_classifications(
+            rows[genus_col],
+            rows[species_col] if species_col else pd.Series("", index=rows.index),
+        ),
+    }
+    names = _build_photo_names(
+        "mhm_", photo_ids, name_fields, include_in_name, additional_name_stem
+    )
 
-    photo_locations = {k: v for k, v in arguments.items() if "photo" in k}
-    for param_name, column_name in photo_locations.items():
-        if column_name:
-            get_mosquito_args = np.vectorize(get_photo_args)
-            get_mosquito_args(
-                mhm_df[column_name].to_numpy(),
-                _format_param_name(param_name),
-                mhm_df[latitude_col].to_numpy(),
-                mhm_df[longitude_col].to_numpy(),
-                mhm_df[watersource_col].to_numpy(),
-                mhm_df[date_col],
-                mhm_df[id_col].to_numpy(),
-                mhm_df[genus_col].to_numpy(),
-                mhm_df[species_col].to_numpy() if species_col else "",
-            )
     _warn_num_invalid_photos(num_invalid_photos)
-    return targets
+    return _get_download_targets(
+        photo_urls["url"], names, directory, resolution, as_frame
+    )
 
 
 def download_mhm_photos(
@@ -336,6 +780,10 @@ def download_mhm_photos(
     include_in_name=[],
     additional_name_stem="",
     resolution=None,
+    workers=1,
+    keep_aspect_ratio=False,
+    resize_workers=None,
+    as_frame=False,
 ):
     """
     Downloads mosquito habitat mapper photos
@@ -380,15 +828,28 @@ def download_mhm_photos(
         Additional custom information the user can add to the name.
     resolution : tuple of int, default = None
         The image resolution in width x height. e.g. (1920, 1080) for a 1080p image. If the resolution is None, the original resolution of the photo is downloaded.
+    workers : int, default=1
+        The number of photos downloaded concurrently.
+    keep_aspect_ratio : bool, default=False
+        Whether to keep the aspect ratio of the photos by fitting them within the resolution (see [resize_photo](#resize_photo)).
+    resize_workers : int, optional
+        The number of processes resizing photos while the others are downloaded (see [download_all_photos](#download_all_photos)).
+    as_frame : bool, default=False
+        Whether to return the targets as a DataFrame with the outcome of each download instead of a set.
 
     Returns
     -------
-    set of tuple of str
-        Contains the (url, directory, and filename) for each desired mosquito habitat mapper photo
+    set of tuple of str or pd.DataFrame
+        Contains the (url, directory, filename, and resolution) for each desired mosquito habitat mapper photo. If `as_frame` is True, these are the `url`, `directory`, `filename`, and `resolution` columns of a DataFrame, along with a `status` column that is `"downloaded"` or `"failed"` for each photo.
     """
-    targets = get_mhm_download_targets(**locals())
-    download_all_photos(targets)
-    return targets
+    arguments = locals()
+    download_args = {
+        name: arguments.pop(name)
+        for name in ["workers", "keep_aspect_ratio", "resize_workers"]
+    }
+    as_frame = arguments.pop("as_frame")
+    target_df = get_mhm_download_targets(**arguments, as_frame=True)
+    return _download_target_frame(target_df, as_frame, **download_args)
 
 
 def get_lc_download_targets(
@@ -407,6 +868,7 @@ def get_lc_download_targets(
     include_in_name=[],
     additional_name_stem="",
     resolution=None,
+    as_frame=False,
 ):
     """
     Generates landcover targets to download
@@ -449,67 +911,36 @@ def get_lc_download_targets(
         Additional custom information the user can add to the name.
     resolution : tuple of int, default = None
         The image resolution in width x height. e.g. (1920, 1080) for a 1080p image. If the resolution is None, the original resolution of the photo is downloaded.
+    as_frame : bool, default=False
+        Whether to return the targets as a DataFrame instead of a set.
 
     Returns
     -------
-    set of tuple of str
-        Contains the (url, directory, and filename) for each desired land cover photo
+    set of tuple of str or pd.DataFrame
+        Contains the (url, directory, filename, and resolution) for each desired land cover photo. If `as_frame` is True, these are the `url`, `directory`, `filename`, and `resolution` columns of a DataFrame.
     """
     arguments = locals()
-    targets = set()
-    num_invalid_photos = {
-        "invalid_URL": 0,
-        "rejected": 0,
-        "pending": 0,
-        "bad_photo_id": 0,
-    }
+    photo_locations = {k: v for k, v in arguments.items() if "photo" in k}
+    photo_urls = _get_photo_urls(lc_df, photo_locations)
+    photo_ids, is_valid, num_invalid_photos = _classify_photo_urls(photo_urls["url"])
 
-    def get_photo_args(url, latitude, longitude, direction, date, lc_id):
-        if not pd.isna(url) and "https" in url:
-            date_str = pd.to_datetime(str(date)).strftime("%Y-%m-%d")
-            photo_id = get_globe_photo_id(url)
-
-            name_fields = {
-                "direction": direction,
-                "latitude": round(latitude, 5),
-                "longitude": round(longitude, 5),
-                "date_str": date_str,
-                "lc_id": lc_id,
-            }
-
-            if not pd.isna(photo_id) and int(photo_id) >= 0:
-                protocol = "lc_"
-                name = _build_photo_name(
-                    protocol,
-                    photo_id,
-                    name_fields,
-                    include_in_name,
-                    additional_name_stem,
-                )
-                targets.add((url, directory, name, resolution))
-            else:
-                num_invalid_photos["bad_photo_id"] += 1
-        elif not pd.isna(url) and "rejected" in url:
-            num_invalid_photos["rejected"] += 1
-        elif not pd.isna(url) and "pending" in url:
-            num_invalid_photos["pending"] += 1
-        else:
-            num_invalid_photos["invalid_URL"] += 1
+    photo_urls, photo_ids = photo_urls[is_valid], photo_ids[is_valid]
+    rows = lc_df.iloc[photo_urls["row"].to_numpy()]
+    name_fields = {
+        "direction": lambda: photo_urls["url_type"].to_numpy(),
+        "latitude": lambda: _format_coordinates(rows[latitude_col]),
+        "longitude": lambda: _format_coordinates(rows[longitude_col]),
+        "date_str": lambda: _format_dates(rows[date_col]),
+        "lc_id": lambda: rows[id_col].astype(str).to_numpy(),
+    }
+    names = _build_photo_names(
+        "lc_", photo_ids, name_fields, include_in_name, additional_name_stem
+    )
 
-    photo_locations = {k: v for k, v in arguments.items() if "photo" in k}
-    for param_name, column_name in photo_locations.items():
-        if column_name:
-            get_lc_photo_args = np.vectorize(get_photo_args)
-            get_lc_photo_args(
-                lc_df[column_name].to_numpy(),
-                lc_df[latitude_col].to_numpy(),
-                lc_df[longitude_col].to_numpy(),
-                _format_param_name(param_name),
-                lc_df[date_col],
-                lc_df[id_col].to_numpy(),
-            )
     _warn_num_invalid_photos(num_invalid_photos)
-    return targets
+    return _get_download_targets(
+        photo_urls["url"], names, directory, resolution, as_frame
+    )
 
 
 def download_lc_photos(
@@ -528,6 +959,10 @@ def download_lc_photos(
     include_in_name=[],
     additional_name_stem="",
     resolution=None,
+    workers=1,
+    keep_aspect_ratio=False,
+    resize_workers=None,
+    as_frame=False,
 ):
     """
     Downloads Landcover photos for landcover data.
@@ -570,12 +1005,25 @@ def download_lc_photos(
         Additional custom information the user can add to the name.
     resolution : tuple of int, default = None
         The image resolution in width x height. e.g. (1920, 1080) for a 1080p image. If the resolution is None, the original resolution of the photo is downloaded.
+    workers : int, default=1
+        The number of photos downloaded concurrently.
+    keep_aspect_ratio : bool, default=False
+        Whether to keep the aspect ratio of the photos by fitting them within the resolution (see [resize_photo](#resize_photo)).
+    resize_workers : int, optional
+        The number of processes resizing photos while the others are downloaded (see [download_all_photos](#download_all_photos)).
+    as_frame : bool, default=False
+        Whether to return the targets as a DataFrame with the outcome of each download instead of a set.
 
     Returns
     -------
-    set of tuple of str
-        Contains the (url, directory, and filename) for each desired land cover photo
+    set of tuple of str or pd.DataFrame
+        Contains the (url, directory, filename, and resolution) for each desired land cover photo. If `as_frame` is True, these are the `url`, `directory`, `filename`, and `resolution` columns of a DataFrame, along with a `status` column that is `"downloaded"` or `"failed"` for each photo.
     """
-    targets = get_lc_download_targets(**locals())
-    download_all_photos(targets)
-    return targets
+    arguments = locals()
+    download_args = {
+        name: arguments.pop(name)
+        for name in ["workers", "keep_aspect_ratio", "resize_workers"]
+    }
+    as_frame = arguments.pop("as_frame")
+    target_df = get_lc_download_targets(**arguments, as_frame=True)
+    return _download_target_frame(target_df, as_frame, **download_args)
@@ -0,0 +1,244 @@
+import json
+import os
+from datetime import timedelta
+
+import pandas as pd
+
+from go_utils.constants import (
+    abbreviation_dict,
+    end_date,
+    landcover_protocol,
+    mosquito_protocol,
+    start_date,
+)
+from go_utils.download import (
+    _align_columns,
+    _is_classification_column,
+    _rewrite_csv,
+    default_data_clean,
+    get_api_data,
+    get_file_format,
+    read_data,
+    write_data,
+)
+
+__doc__ = """
+# Overview
+This submodule keeps a rolling local copy of a GLOBE Observer dataset up to date without downloading the whole archive on every refresh.
+
+# Sync State
+The data store can be a CSV, Parquet, or Feather file (see `go_utils.download.write_data`). New observations are appended to CSV stores, while Parquet and Feather stores are rewritten on each sync.
+
+Next to the data store (e.g. `mhm.csv`), a state file (e.g. `mhm.csv.sync.json`) records the latest `MeasuredAt` time of the stored observations (the high-water mark).
+
+On each sync, only observations measured after the high-water mark minus a lookback window are requested. The lookback window accounts for observations that are uploaded some time after they were measured. Observations whose IDs are already in the ID column of the store are dropped and the rest are appended to the store.
+
+The downloaded observations are cleaned without removing homogenous columns (see `go_utils.cleanup.remove_homogenous_cols`), since a column that has a single value within a sync window usually varies across the whole store. If a later download contains columns the store doesn't have yet (e.g. a new Land Cover classification), the store is rewritten with the new columns. Land Cover classification percentages the new observations lack are set to 0, while any other stored column that is missing from the download raises an error.
+"""
+
+default_lookback = timedelta(days=14)
+
+id_columns = {
+    mosquito_protocol: "mhm_MosquitoHabitatMapperId",
+    landcover_protocol: "lc_LandCoverId",
+}
+
+
+def _state_path(path):
+    return f"{path}.sync.json"
+
+
+def read_sync_state(path):
+    """
+    Reads the sync state of a data store.
+
+    Parameters
+    ----------
+    path : str
+        The path of the data store.
+
+    Returns
+    -------
+    dict or None
+        The sync state containing the `protocol` and `high_water_mark`, or None if the store hasn't been synced yet.
+    """
+    state_path = _state_path(path)
+    if not os.path.exists(path) or not os.path.exists(state_path):
+        return None
+    with open(state_path, "r") as file:
+        return json.load(file)
+
+
+def _write_sync_state(path, state):
+    temp_path = f"{_state_path(path)}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(state, file)
+    os.replace(temp_path, _state_path(path))
+
+
+def _check_store_columns(path, store_columns, df):
+    missing = [
+        column
+        for column in store_columns
+        if column not in df.columns and not _is_classification_column(column)
+    ]
+    if missing:
+        raise ValueError(
+            f"The downloaded data is missing the columns {missing} of {path}."
+        )
+
+
+def _fill_classifications(df):
+    columns = [column for column in df.columns if _is_classification_column(column)]
+    return df.assign(**{column: df[column].fillna(0) for column in columns})
+
+
+def _append_to_store(path, df):
+    if not os.path.exists(path):
+        write_data(_fill_classifications(df), path)
+    elif get_file_format(path) != "csv":
+        # Columnar stores can't be appended to, so they are rewritten
+        store_df = read_data(path)
+        _check_store_columns(path, store_df.columns, df)
+        df = pd.concat([store_df, df], ignore_index=True)
+        write_data(_fill_classifications(df), path)
+    else:
+        store_columns = pd.read_csv(path, nrows=0).columns
+        _check_store_columns(path, store_columns, df)
+        new_columns = df.columns.difference(store_columns, sort=False)
+        if len(new_columns):
+            # Rewrites the store so that its header includes the new columns
+            store_columns = store_columns.append(new_columns)
+            _rewrite_csv(path, store_columns)
+        df = _fill_classifications(_align_columns(df, store_columns))
+        write_data(df, path, append=True)
+
+
+def _read_stored_ids(path, id_col):
+    if not os.path.exists(path):
+        return set()
+    return set(read_data(path, columns=[id_col])[id_col])
+
+
+def _load_state(path, protocol, measured_col):
+    state = read_sync_state(path)
+    if state is None and os.path.exists(path):
+        # Bootstraps the state of a store that was downloaded without syncing
+        store_df = read_data(path, columns=[measured_col])
+        state = {
+            "protocol": protocol,
+            "high_water_mark": _to_datetime(store_df[measured_col].max()),
+        }
+    elif state is not None:
+        state["high_water_mark"] = _to_datetime(state["high_water_mark"])
+
+    if state is not None and state["protocol"] != protocol:
+        raise ValueError(
+            f"{path} contains {state['protocol']} data, not {protocol} data."
+        )
+    return state
+
+
+def _to_datetime(timestamp):
+    if pd.isna(timestamp):
+        return None
+    return pd.Timestamp(timestamp).tz_localize(None).to_pydatetime()
+
+
+def sync_api_data(
+    protocol,
+    path,
+    start_date=start_date,
+    end_date=end_date,
+    lookback=default_lookback,
+    id_col="",
+    measured_col="",
+    process=None,
+    **download_args,
+):
+    """
+    Downloads the observations that aren't in a local data store yet and appends them to it. The first sync downloads everything from `start_date`. Later syncs only download the observations measured after the stored high-water mark (minus `lookback`).
+
+    A store that was created without syncing (e.g. by a regular `mhm-download`) is synced by reading its measured dates. Either way, the IDs of the stored observations are read from the store on each sync.
+
+    See [here](#sync-state) for more information.
+
+    Parameters
+    ----------
+    protocol : str, {"mosquito_habitat_mapper", "land_covers"}
+        The desired GLOBE Observer Protocol.
+    path : str
+        The path of the data store. It is created on the first sync, in the format given by its extension.
+    start_date : str, default= 2017-05-31
+        The start date of the first sync in the format of (YYYY-MM-DD). Ignored once the store has a high-water mark.
+    end_date : str, default= today's date in YYYY-MM-DD form.
+        The end date of the sync in the format of (YYYY-MM-DD).
+    lookback : datetime.timedelta, default=14 days
+        How far before the high-water mark new observations are requested, to catch observations that were uploaded late.
+    id_col : str, optional
+        The column containing the observation IDs. Defaults to the ID column of the cleaned protocol data (e.g. `lc_LandCoverId`).
+    measured_col : str, optional
+        The column containing the measured time. Defaults to the cleaned `MeasuredAt` column of the protocol (e.g. `lc_MeasuredAt`).
+    process : callable, optional
+        Applied to the newly downloaded DataFrame before it is appended (e.g. a QA filter). Must return a DataFrame with the columns of the store. Only the observations it returns advance the high-water mark.
+    **download_args
+        Additional arguments passed to `go_utils.download.get_api_data` (e.g. `latlon_box`, `workers`, `cache_dir`).
+
+    Returns
+    -------
+    pd.DataFrame
+        The newly appended observations.
+    """
+    if protocol not in id_columns:
+        raise ValueError(
+            "Invalid protocol, currently only 'mosquito_habitat_mapper' and 'land_covers' are supported."
+        )
+    id_col = id_col or id_columns[protocol]
+    measured_col = measured_col or f"{abbreviation_dict[protocol]}_MeasuredAt"
+
+    state = _load_state(path, protocol, measured_col)
+    high_water_mark = None if state is None else state["high_water_mark"]
+    if high_water_mark is not None:
+        start_date = (high_water_mark - lookback).strftime("%Y-%m-%d")
+
+    df = get_api_data(protocol, start_date, end_date, is_clean=False, **download_args)
+    if df.empty:
+        return df
+    df = default_data_clean(df, protocol, remove_homogenous=False)
+
+    stored_ids = _read_stored_ids(path, id_col)
+    df = df[~df[id_col].isin(stored_ids)].drop_duplicates(subset=id_col, keep="last")
+    if process is not None:
+        df = process(df)
+    _append_to_store(path, df)
+
+    latest = _to_datetime(df[measured_col].max())
+    if latest is not None and (high_water_mark is None or latest > high_water_mark):
+        high_water_mark = latest
+    if high_water_mark is not None:
+        _write_sync_state(
+            path,
+            {
+                "protocol": protocol,
+                "high_water_mark": high_water_mark.isoformat(),
+            },
+        )
+
+    return df
+
+
+def read_synced_data(path):
+    """
+    Reads a data store created by [sync_api_data](#sync_api_data).
+
+    Parameters
+    ----------
+    path : str
+        The path of the data store.
+
+    Returns
+    -------
+    pd.DataFrame
+        The stored observations with their date columns converted to datetimes.
+    """
+    return read_data(path)
@@ -0,0 +1,146 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from test_data import sample_mhm_json
+
+from go_utils.cache import (
+    evict_cache,
+    get_cache_key,
+    read_cache,
+    write_cache,
+)
+from go_utils.download import get_api_data
+
+sample_results = json.loads(sample_mhm_json)["results"]
+
+
+def _query(end_date):
+    return {
+        "protocol": "mosquito_habitat_mapper",
+        "start_date": "2017-05-31",
+        "end_date": end_date,
+        "latlon_box": None,
+    }
+
+
+@pytest.mark.util
+def test_cache_key():
+    key = get_cache_key("land_covers", "2021-01-01", "2021-1-31")
+    assert key == get_cache_key("land_covers", "2021-01-01", "2021-01-31", None)
+    assert key != get_cache_key("land_covers", "2021-01-01", "2021-02-01")
+    assert key != get_cache_key("mosquito_habitat_mapper", "2021-01-01", "2021-01-31")
+
+    box = {"min_lat": 0, "max_lat": 10, "min_lon": 0, "max_lon": 10}
+    float_box = {key: float(value) for key, value in box.items()}
+    assert get_cache_key("land_covers", "2021-01-01", "2021-01-31", box) == (
+        get_cache_key("land_covers", "2021-01-01", "2021-01-31", float_box)
+    )
+
+
+@pytest.mark.util
+def test_cache_expiration(tmp_path):
+    cache_dir = str(tmp_path)
+    write_cache(cache_dir, "recent", _query("2021-01-31"), sample_results)
+    assert read_cache(cache_dir, "recent") == sample_results
+    assert read_cache(cache_dir, "missing") is None
+
+    # Entries containing recent observations expire
+    recent_end = datetime.now().strftime("%Y-%m-%d")
+    write_cache(cache_dir, "recent", _query(recent_end), sample_results)
+    assert read_cache(cache_dir, "recent", ttl=timedelta(0)) is None
+    assert "recent.json.gz" not in os.listdir(cache_dir)
+
+    # Historical entries never expire
+    write_cache(cache_dir, "historical", _query("2021-01-31"), sample_results)
+    assert read_cache(cache_dir, "historical", ttl=timedelta(0)) == sample_results
+
+
+@pytest.mark.util
+def test_cache_eviction(tmp_path):
+    cache_dir = str(tmp_path)
+    for i, key in enumerate(["first", "second", "third"]):
+        write_cache(cache_dir, key, _query("2021-01-31"), sample_results)
+        access_time = datetime.now().timestamp() - 100 + i
+        os.utime(os.path.join(cache_dir, f"{key}.json.gz"), (access_time, access_time))
+
+    # Reading an entry marks it as recently used
+    read_cache(cache_dir, "first")
+    # The entries can differ in size by a few bytes since their timestamps differ
+    entry_size = max(
+        os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir)
+    )
+    evict_cache(cache_dir, max_bytes=2 * entry_size)
+    assert sorted(os.listdir(cache_dir)) == ["first.json.gz", "third.json.gz"]
+
+    evict_cache(cache_dir, max_bytes=0)
+    assert not os.listdir(cache_dir)
+
+
+@pytest.mark.util
+def test_cache_races(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    write_cache(cache_dir, "entry", _query("2021-01-31"), sample_results)
+
+    def removed(path, *args):
+        raise FileNotFoundError(path)
+
+    # The entry is removed by another process after it was read
+    monkeypatch.setattr("go_utils.cache.os.utime", removed)
+    assert read_cache(cache_dir, "entry") == sample_results
+
+    # Entries removed by another process during the eviction are skipped
+    listdir = os.listdir
+    monkeypatch.setattr(
+        "go_utils.cache.os.listdir", lambda path: listdir(path) + ["gone.json.gz"]
+    )
+    evict_cache(cache_dir, max_bytes=0)
+    monkeypatch.setattr("go_utils.cache.os.remove", removed)
+    evict_cache(cache_dir, max_bytes=0)
+    recent_end = datetime.now().strftime("%Y-%m-%d")
+    write_cache(cache_dir, "recent", _query(recent_end), sample_results)
+    assert read_cache(cache_dir, "recent", ttl=timedelta(0)) is None
+    evict_cache(str(tmp_path / "missing"), max_bytes=0)
+
+
+@pytest.mark.util
+def test_eviction_throttling(tmp_path, monkeypatch):
+    evictions = []
+    monkeypatch.setattr("go_utils.cache.evict_cache", evictions.append)
+    for key in ["first", "second", "third"]:
+        write_cache(str(tmp_path), key, _query("2021-01-31"), sample_results)
+    assert evictions == [str(tmp_path)]
+
+    monkeypatch.setattr("go_utils.cache.eviction_interval", timedelta(0))
+    write_cache(str(tmp_path), "fourth", _query("2021-01-31"), sample_results)
+    assert len(evictions) == 2
+
+
+class MockResponse:
+    def __bool__(self):
+        return True
+
+    def json(self):
+        return json.loads(sample_mhm_json)
+
+
+@pytest.mark.util
+def test_cached_download(tmp_path, monkeypatch):
+    requested_urls = []
+
+    def mock_get(url, *args, **kwargs):
+        requested_urls.append(url)
+        return MockResponse()
+
+    monkeypatch.setattr("go_utils.download.requests.get", mock_get)
+
+    args = ("mosquito_habitat_mapper", "2021-01-01", "2021-02-28")
+    df = get_api_data(*args, is_clean=False, cache_dir=str(tmp_path))
+    cached_df = get_api_data(*args, is_clean=False, cache_dir=str(tmp_path))
+    assert len(requested_urls) == 1
+    assert cached_df.equals(df)
+
+    get_api_data(*args, is_clean=False, chunk="month", cache_dir=str(tmp_path))
+    get_api_data(*args, is_clean=False, chunk="month", cache_dir=str(tmp_path))
+    assert len(requested_urls) == 3
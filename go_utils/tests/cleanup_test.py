@@ -3,15 +3,24 @@ from datetime import timedelta
 import numpy as np
 import pandas as pd
 import pytest
+from pytz import UnknownTimeZoneError
+from timezonefinder import TimezoneFinder
 
 from go_utils.cleanup import (
+    _lookup_timezone,
     adjust_timezones,
+    build_completeness_index,
     camel_case,
+    count_occurrences,
+    count_set_bits,
+    get_bit_binary,
+    get_cumulative_scores,
     remove_homogenous_cols,
     rename_latlon_cols,
     replace_column_prefix,
     round_cols,
     standardize_null_vals,
+    update_completeness_index,
 )
 
 camel_case_data = [
@@ -73,6 +82,48 @@ def test_datetime_convert(lat, lon, offset):
     assert output_df.equals(df)
 
 
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_mixed_timezones():
+    locations = [location[:2] for location in time_zone_data] * 3
+    df = pd.DataFrame.from_dict(
+        {
+            "lat": [lat for lat, _ in locations],
+            "lon": [lon for _, lon in locations],
+            "measuredAt": pd.to_datetime(["2021-01-05T17:42:00"] * len(locations)),
+        }
+    )
+    output_df = adjust_timezones(df, "measuredAt", "lat", "lon")
+    tf = TimezoneFinder()
+    for (lat, lon), time in zip(locations, output_df["measuredAt"]):
+        assert str(time.tz) == tf.timezone_at(lat=lat, lng=lon)
+        assert time == pd.Timestamp("2021-01-05T17:42:00", tz="UTC")
+
+    # Each location is only looked up once
+    hits = _lookup_timezone.cache_info().hits
+    adjust_timezones(df, "measuredAt", "lat", "lon")
+    assert _lookup_timezone.cache_info().hits == hits + len(time_zone_data)
+
+
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_missing_timezone(monkeypatch):
+    # Locations without a timezone must not be silently left unconverted
+    monkeypatch.setattr(
+        "go_utils.cleanup._lookup_timezone",
+        lambda lat, lon: None if lat == 0 else "UTC",
+    )
+    df = pd.DataFrame.from_dict(
+        {
+            "lat": [48.21, 0],
+            "lon": [16.36, 0],
+            "measuredAt": pd.to_datetime(["2021-01-05T17:42:00"] * 2),
+        }
+    )
+    with pytest.raises(UnknownTimeZoneError):
+        adjust_timezones(df, "measuredAt", "lat", "lon")
+
+
 @pytest.mark.util
 @pytest.mark.cleanup
 def test_homogenous_cols():
@@ -145,6 +196,51 @@ def test_column_round():
     assert output_df.equals(df)
 
 
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_halfway_round():
+    # Halfway values are rounded like Python's round
+    df = pd.DataFrame.from_dict({"latitude": [37.957385, 24.434825, -1.000005]})
+    output_df = round_cols(df)
+    assert output_df["latitude"].tolist() == [
+        round(value, 5) for value in df["latitude"].tolist()
+    ]
+
+
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_compact_round():
+    df = pd.DataFrame.from_dict(
+        {
+            "latitude": [1.123456, np.nan],
+            "percent": [12.0, 100.0],
+            "elevation": [25.5, np.nan],
+            "id": [70000.0, 2.0],
+        }
+    )
+    output_df = round_cols(df, compact=True)
+    assert output_df.dtypes.tolist() == [np.float64, np.int8, np.int16, np.int32]
+    assert output_df["elevation"].tolist() == [25, -9999]
+    pd.testing.assert_frame_equal(output_df, round_cols(df), check_dtype=False)
+
+    sparse_df = pd.DataFrame.from_dict(
+        {"percent": pd.arrays.SparseArray([0.0, 12.75, 0.0], fill_value=0.0)}
+    )
+    output_df = round_cols(sparse_df, compact=True)
+    assert output_df["percent"].dtype == pd.SparseDtype(np.int8, 0)
+
+
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_round_sparse_cols():
+    df = pd.DataFrame.from_dict(
+        {"classification": pd.arrays.SparseArray([0.0, 12.75, 0.0], fill_value=0.0)}
+    )
+    output_df = round_cols(df)
+    assert output_df["classification"].dtype == pd.SparseDtype(int, 0)
+    assert output_df["classification"].tolist() == [0, 12, 0]
+
+
 @pytest.mark.util
 @pytest.mark.cleanup
 def test_null_standardize():
@@ -161,3 +257,60 @@ def test_null_standardize():
     assert not output_df.equals(df)
     standardize_null_vals(df, ".", inplace=True)
     assert output_df.equals(df)
+
+
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_completeness_index():
+    df = pd.DataFrame(
+        {"a": [1, np.nan, 3, np.nan], "b": ["x", "y", None, None], "c": [1, 2, 3, 4]}
+    )
+    completeness_index = build_completeness_index(df)
+    assert completeness_index["counts"].tolist() == df.count(axis=1).tolist()
+    assert get_cumulative_scores(completeness_index).tolist() == [1, 0.67, 0.67, 0.33]
+
+    df["a"] = df["a"].fillna(0)
+    df["d"] = [np.nan, 1, np.nan, 1]
+    df = df.drop(columns="c")
+    update_completeness_index(completeness_index, df, ["a", "c", "d"])
+    assert set(completeness_index["masks"]) == {"a", "b", "d"}
+    assert completeness_index["counts"].tolist() == df.count(axis=1).tolist()
+
+    with pytest.raises(ValueError):
+        update_completeness_index(completeness_index, df.iloc[:2], ["a"])
+
+
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_count_set_bits():
+    bit_decimals = pd.Series([5, 0, 15, 63, 255], dtype=np.uint8)
+    assert count_set_bits(bit_decimals).tolist() == [2, 0, 4, 6, 8]
+    assert count_set_bits(pd.Series([3, 16], dtype=np.int64)).tolist() == [2, 1]
+    assert len(count_set_bits(pd.Series([], dtype=np.uint8))) == 0
+
+
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_count_occurrences():
+    # "h" followed by "ttp" doesn't count as an occurrence
+    values = pd.Series(
+        ["https://a;https://b", "pending", None, "h", "ttp", "é https://c", ""]
+    )
+    http_counts, pending_counts = count_occurrences(values, ["http", "pending"])
+    assert http_counts.tolist() == [2, 0, 0, 0, 0, 1, 0]
+    assert pending_counts.tolist() == [0, 1, 0, 0, 0, 0, 0]
+
+    (http_counts,) = count_occurrences(pd.Series([np.nan, np.nan]), ["http"])
+    assert http_counts.tolist() == [0, 0]
+
+
+@pytest.mark.util
+@pytest.mark.cleanup
+def test_bit_binary():
+    bit_decimals = np.array([0, 5, 63, 16], dtype=np.uint8)
+    assert get_bit_binary(bit_decimals, 6).tolist() == [
+        "000000",
+        "000101",
+        "111111",
+        "010000",
+    ]
@@ -1,10 +1,27 @@
 import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
 import numpy as np
+import pandas as pd
 import pytest
 from test_data import globe_down_json, sample_lc_json, sample_mhm_json
 
-from go_utils.download import get_api_data, parse_api_data
+from go_utils.download import (
+    convert_dates_to_datetime,
+    create_session,
+    get_api_data,
+    get_file_format,
+    iter_api_data,
+    parse_api_data,
+    read_data,
+    split_date_range,
+    write_data,
+    write_data_chunks,
+)
 from go_utils.geoenrich import get_country_api_data
 
 globe_test_data = [sample_lc_json, sample_mhm_json]
@@ -31,6 +48,258 @@ def test_globe_normal(test_data):
     assert not df.empty
 
 
+@pytest.mark.util
+def test_empty_results():
+    df = parse_api_data({"count": 0, "message": "success", "results": []})
+    assert df.empty
+
+
+date_range_data = [
+    (
+        "2021-01-15",
+        "2021-03-10",
+        "month",
+        [
+            ("2021-01-15", "2021-01-31"),
+            ("2021-02-01", "2021-02-28"),
+            ("2021-03-01", "2021-03-10"),
+        ],
+    ),
+    (
+        "2021-05-05",
+        "2021-05-20",
+        "week",
+        [
+            ("2021-05-05", "2021-05-09"),
+            ("2021-05-10", "2021-05-16"),
+            ("2021-05-17", "2021-05-20"),
+        ],
+    ),
+    (
+        "2020-12-31",
+        "2021-01-01",
+        "year",
+        [("2020-12-31", "2020-12-31"), ("2021-01-01", "2021-01-01")],
+    ),
+    ("2021-01-01", "2021-01-01", "day", [("2021-01-01", "2021-01-01")]),
+    ("2021-02-01", "2021-01-01", "month", []),
+]
+
+
+@pytest.mark.util
+@pytest.mark.parametrize("start, end, chunk, expected", date_range_data)
+def test_split_date_range(start, end, chunk, expected):
+    assert split_date_range(start, end, chunk) == expected
+
+
+@pytest.mark.util
+def test_invalid_chunk():
+    with pytest.raises(ValueError, match="chunk"):
+        split_date_range("2021-01-01", "2021-02-01", "fortnight")
+
+
+class MockResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def __bool__(self):
+        return True
+
+    def json(self):
+        return json.loads(self.text)
+
+
+@pytest.mark.util
+def test_chunked_download(monkeypatch):
+    requested_urls = []
+
+    def mock_get(url, *args, **kwargs):
+        requested_urls.append(url)
+        return MockResponse(sample_lc_json)
+
+    monkeypatch.setattr("go_utils.download.requests.get", mock_get)
+
+    chunks = list(
+        iter_api_data("land_covers", "2021-01-15", "2021-03-10", is_clean=False)
+    )
+    assert len(chunks) == 3
+    assert "startdate=2021-02-01&enddate=2021-02-28" in requested_urls[1]
+    assert_dates(chunks[0], "lc")
+
+    requested_urls.clear()
+    df = get_api_data(
+        "land_covers", "2021-01-15", "2021-03-10", is_clean=False, chunk="month"
+    )
+    assert len(requested_urls) == 3
+    assert len(df) == 3 * len(chunks[0])
+    assert np.all(df.index == np.arange(len(df)))
+
+    requested_urls.clear()
+    chunks = list(
+        iter_api_data(
+            "land_covers",
+            "2021-01-01",
+            "2021-12-31",
+            is_clean=False,
+            chunk="adaptive",
+            target_rows=20,
+        )
+    )
+    # Each request returns 2 entries so the adaptive windows keep growing
+    assert len(requested_urls) < 12
+    assert "startdate=2021-01-01&enddate=2021-01-31" in requested_urls[0]
+    assert "enddate=2021-12-31" in requested_urls[-1]
+
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        start = query["startdate"][0]
+        # Earlier date ranges respond slower so they finish out of order
+        time.sleep(0.1 if start.endswith("01-01") else 0)
+        results = [
+            {
+                "protocol": query["protocols"][0],
+                "measuredDate": start,
+                "data": {"landcoversMeasuredAt": f"{start}T00:00:00"},
+            }
+        ]
+        body = json.dumps({"count": 1, "message": "success", "results": results})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode("utf-8"))
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubAPIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        "go_utils.download.api_url", f"http://127.0.0.1:{server.server_port}/"
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.util
+def test_parallel_download(stub_api):
+    df = get_api_data(
+        "land_covers", "2021-01-01", "2021-06-30", is_clean=False, workers=4
+    )
+    assert list(df["measuredDate"].dt.strftime("%Y-%m-%d")) == [
+        f"2021-0{month}-01" for month in range(1, 7)
+    ]
+
+    session = create_session(pool_size=2)
+    chunks = list(
+        iter_api_data(
+            "land_covers",
+            "2020-12-25",
+            "2021-01-20",
+            is_clean=False,
+            chunk="week",
+            workers=2,
+            session=session,
+        )
+    )
+    assert [chunk.loc[0, "measuredDate"].strftime("%Y-%m-%d") for chunk in chunks] == [
+        "2020-12-25",
+        "2020-12-28",
+        "2021-01-04",
+        "2021-01-11",
+        "2021-01-18",
+    ]
+    assert_dates(chunks[0], "lc")
+
+
+@pytest.mark.util
+def test_parallel_download_closes_session(stub_api, monkeypatch):
+    sessions = []
+
+    def tracked_session(pool_size):
+        sessions.append(create_session(pool_size))
+        return sessions[-1]
+
+    monkeypatch.setattr("go_utils.download.create_session", tracked_session)
+    closed = []
+    chunks = iter_api_data(
+        "land_covers", "2021-01-01", "2021-06-30", is_clean=False, workers=2
+    )
+    next(chunks)
+    monkeypatch.setattr(sessions[0], "close", lambda: closed.append(True))
+    chunks.close()
+    assert closed == [True]
+
+
+@pytest.mark.util
+@pytest.mark.parametrize("filename", ["lc.csv", "mhm.csv"])
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".feather"])
+def test_write_read_data(tmp_path, filename, extension):
+    if extension != ".csv":
+        pytest.importorskip("pyarrow")
+    df = pd.read_csv(f"go_utils/tests/sample_data/{filename}")
+    convert_dates_to_datetime(df)
+
+    path = str(tmp_path / f"data{extension}")
+    write_data(df, path)
+    stored_df = read_data(path)
+    pd.testing.assert_frame_equal(stored_df, df, check_dtype=extension != ".csv")
+    assert_dates(stored_df, "")
+
+    columns = list(df.columns[:3])
+    assert list(read_data(path, columns=columns).columns) == columns
+
+
+@pytest.mark.util
+@pytest.mark.parametrize("extension", [".csv", ".parquet", ".feather"])
+def test_write_data_chunks(tmp_path, monkeypatch, extension):
+    if extension != ".csv":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr("go_utils.download.csv_rewrite_rows", 1)
+    chunks = [
+        pd.DataFrame({"lc_pid": [1, 2], "lc_Comments": [None, None]}),
+        pd.DataFrame({"lc_pid": [3], "lc_Comments": ["dry"], "lc_North_Trees": [40.0]}),
+        pd.DataFrame({"lc_pid": [4.5], "lc_Comments": [None], "lc_Extra": ["x"]}),
+    ]
+
+    path = str(tmp_path / f"data{extension}")
+    assert write_data_chunks(iter(chunks), path) == 4
+    stored_df = read_data(path)
+    assert list(stored_df.columns) == [
+        "lc_pid",
+        "lc_Comments",
+        "lc_North_Trees",
+        "lc_Extra",
+    ]
+    assert list(stored_df["lc_pid"]) == [1, 2, 3, 4.5]
+    assert list(stored_df["lc_North_Trees"]) == [0, 0, 40, 0]
+    assert stored_df.loc[2, "lc_Comments"] == "dry"
+    assert stored_df[["lc_Comments", "lc_Extra"]].isna().sum().tolist() == [3, 3]
+
+    empty_path = str(tmp_path / f"empty{extension}")
+    assert write_data_chunks([], empty_path) == 0
+    assert os.path.exists(empty_path)
+
+
+@pytest.mark.util
+def test_file_format():
+    assert get_file_format("data.PARQUET") == "parquet"
+    assert get_file_format("data.feather") == "feather"
+    assert get_file_format("data.txt") == "csv"
+    assert get_file_format("data.csv", "parquet") == "parquet"
+    with pytest.raises(ValueError, match="format"):
+        get_file_format("data.csv", "xlsx")
+    with pytest.raises(ValueError, match="Appending"):
+        write_data(pd.DataFrame(), "data.parquet", append=True)
+
+
 @pytest.mark.downloadtest
 def test_bad_api_call():
     with pytest.raises(RuntimeError, match="settings"):
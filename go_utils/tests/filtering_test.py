@@ -3,6 +3,7 @@ import pandas as pd
 import pytest
 
 from go_utils.filtering import (
+    build_team_index,
     filter_by_globe_team,
     filter_duplicates,
     filter_invalid_coords,
@@ -41,6 +42,27 @@ def test_filtering_util(mask, include, desired_indexes):
     assert filtered_df.equals(df)
 
 
+@pytest.mark.util
+@pytest.mark.filtering
+def test_inplace_filtering_util():
+    df = pd.DataFrame.from_dict(
+        {
+            "id": [1, 2, 3, 4],
+            "name": ["a", None, "c", "d"],
+            "empty": [np.nan] * 4,
+        }
+    )
+    df.index = [5, 5, 7, 8]
+    mask = np.array([True, False, True, False])
+
+    filtered_df = filter_out_entries(df, mask, True, False)
+    filter_out_entries(df, mask, True, True)
+    assert df.index.tolist() == [5, 7]
+    assert df["id"].tolist() == [1, 3]
+    assert df.dtypes.equals(filtered_df.dtypes)
+    assert filtered_df.equals(df)
+
+
 teams_df = pd.DataFrame.from_dict(
     {
         "Teams": [
@@ -80,6 +102,20 @@ def test_teams_filtering(desired_teams, exclude, desired_indexes):
     assert filtered_df.equals(df)
 
 
+@pytest.mark.util
+@pytest.mark.filtering
+def test_team_index():
+    team_index = build_team_index(teams_df, "Teams")
+    assert sorted(team_index) == ["A", "B", "C", "D", "E"]
+    assert team_index["A"].tolist() == [0, 1, 4]
+
+    for desired_teams, exclude, desired_indexes in teams_test_data:
+        filtered_df = filter_by_globe_team(
+            teams_df, "Teams", desired_teams, exclude, team_index=team_index
+        )
+        assert filtered_df.index.tolist() == desired_indexes
+
+
 duplicates_test_data = [
     (
         {
@@ -133,6 +169,47 @@ def test_duplicate_filter(
     assert filtered_df.equals(df)
 
 
+@pytest.mark.util
+@pytest.mark.filtering
+def test_duplicate_group_columns():
+    df = pd.DataFrame(
+        {
+            "Latitude": [5, 5, np.nan, 8, 5],
+            "Longitude": [6, 6, 10, 2, 6],
+        },
+        index=[0, 0, 1, 2, 3],
+    )
+    filtered_df = filter_duplicates(
+        df,
+        ["Latitude", "Longitude"],
+        3,
+        group_id_col="group_id",
+        group_size_col="group_size",
+    )
+    assert filtered_df.index.tolist() == [0, 1, 2]
+    assert filtered_df["group_id"].fillna(-1).tolist() == [0, -1, 1]
+    assert filtered_df["group_size"].fillna(-1).tolist() == [3, -1, 1]
+    assert "group_id" not in df
+
+
+@pytest.mark.util
+@pytest.mark.filtering
+def test_duplicate_filter_shared_index():
+    # Unrelated entries sharing an index label with a duplicate are kept
+    df = pd.DataFrame(
+        {
+            "Latitude": [5, 5, 8],
+            "Longitude": [6, 6, 6],
+            "siteId": [1, 1, 1],
+        },
+        index=[0, 1, 1],
+    )
+    filtered_df = filter_duplicates(df, ["Latitude", "Longitude"], 2)
+    assert filtered_df.equals(df.iloc[[0, 2]])
+    filtered_df = filter_duplicates(df, ["Latitude", "Longitude"], 2, False)
+    assert filtered_df.equals(df.iloc[[2]])
+
+
 @pytest.mark.util
 @pytest.mark.filtering
 def test_poor_geolocational_data_filter():
@@ -0,0 +1,321 @@
+import os
+import sys
+from datetime import timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from go_utils import geoenrich
+from go_utils.geoenrich import (
+    add_country_columns,
+    build_country_index,
+    get_countries,
+    get_country_api_data,
+    get_layer_snapshot,
+)
+
+
+class LayerStandIn:
+    def __init__(self, df):
+        self.df = df
+        self.properties = {"objectIdField": "OBJECTID"}
+        self.queries = []
+
+    def query(
+        self, where="1=1", out_fields="*", return_geometry=True, return_count_only=False
+    ):
+        if return_count_only:
+            return len(self.df)
+        self.queries.append(where)
+        df = self.df
+        if where.startswith("OBJECTID"):
+            df = df.query(where)
+        # Other where clauses are ignored so that the local filtering is tested as well
+        if out_fields != "*":
+            df = df[out_fields.split(",")]
+        return SimpleNamespace(sdf=df.reset_index(drop=True))
+
+
+def _layer_data(object_ids):
+    return pd.DataFrame(
+        {
+            "OBJECTID": object_ids,
+            "MeasuredAt": [f"2020-01-{object_id:02d}" for object_id in object_ids],
+            "COUNTRY": ["United States", "Canada"] * (len(object_ids) // 2)
+            + ["United States"] * (len(object_ids) % 2),
+            "Comments": [""] * len(object_ids),
+        }
+    )
+
+
+@pytest.mark.util
+def test_layer_snapshot_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    layer = LayerStandIn(_layer_data([1, 2, 3]))
+    with pytest.raises(ImportError, match="pyarrow"):
+        get_layer_snapshot("mosquito_habitat_mapper", str(tmp_path), layer=layer)
+    assert layer.queries == []
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.util
+def test_layer_snapshot(tmp_path):
+    pytest.importorskip("pyarrow")
+    snapshot_dir = str(tmp_path)
+    protocol = "mosquito_habitat_mapper"
+    layer = LayerStandIn(_layer_data([1, 2, 3]))
+
+    df = get_layer_snapshot(protocol, snapshot_dir, layer=layer)
+    assert df["OBJECTID"].tolist() == [1, 2, 3]
+    assert os.listdir(snapshot_dir) == [f"{protocol}.parquet"]
+
+    # Recent snapshots are read from disk
+    layer.df = _layer_data([1, 2, 3, 4, 5])
+    df = get_layer_snapshot(protocol, snapshot_dir, layer=layer)
+    assert len(df) == 3
+    assert layer.queries == ["1=1"]
+
+    # Only the new features are downloaded when refreshing
+    df = get_layer_snapshot(protocol, snapshot_dir, timedelta(0), layer)
+    assert df["OBJECTID"].tolist() == [1, 2, 3, 4, 5]
+    assert layer.queries[-1] == "OBJECTID > 3"
+
+    # Deleted features cause the whole layer to be downloaded again
+    layer.df = _layer_data([1, 3, 5, 6])
+    df = get_layer_snapshot(protocol, snapshot_dir, timedelta(0), layer)
+    assert df["OBJECTID"].tolist() == [1, 3, 5, 6]
+    assert layer.queries[-2:] == ["OBJECTID > 5", "1=1"]
+
+    query_count = len(layer.queries)
+    df = get_country_api_data(
+        protocol,
+        "2020-01-02",
+        "2020-01-05",
+        is_clean=False,
+        snapshot_dir=snapshot_dir,
+        layer=layer,
+    )
+    assert df["mosquitohabitatmapperOBJECTID"].tolist() == [3, 5]
+    assert len(layer.queries) == query_count
+
+
+@pytest.mark.util
+def test_country_query():
+    layer = LayerStandIn(_layer_data([1, 2, 3, 4, 5]))
+    layer.properties["fields"] = [{"name": "MeasuredAt", "type": "esriFieldTypeDate"}]
+    df = get_country_api_data(
+        "mosquito_habitat_mapper",
+        "2020-01-02",
+        "2020-01-05",
+        is_clean=False,
+        countries=["United States", "Côte d'Ivoire"],
+        layer=layer,
+        out_fields=["OBJECTID"],
+    )
+    assert layer.queries == [
+        "MeasuredAt >= timestamp '2020-01-02 00:00:00' "
+        "AND MeasuredAt < timestamp '2020-01-06 00:00:00' "
+        "AND COUNTRY IN ('Côte d''Ivoire', 'United States')"
+    ]
+    assert df.columns.tolist() == [
+        "mosquitohabitatmapperOBJECTID",
+        "mosquitohabitatmapperMeasuredAt",
+        "COUNTRY",
+    ]
+    assert df["mosquitohabitatmapperOBJECTID"].tolist() == [3, 5]
+
+    layer.properties["fields"][0]["type"] = "esriFieldTypeString"
+    get_country_api_data(
+        "mosquito_habitat_mapper", "2020-01-02", "2020-01-05", False, layer=layer
+    )
+    assert (
+        layer.queries[-1] == "MeasuredAt >= '2020-01-02' AND MeasuredAt < '2020-01-06'"
+    )
+
+
+@pytest.mark.util
+def test_single_country_columns():
+    df = pd.read_csv("go_utils/tests/sample_data/lc.csv")
+    df["COUNTRY"] = np.where(df.index % 2, "Canada", "United States")
+    layer = LayerStandIn(df)
+    layer.properties["fields"] = [
+        {"name": "landcoversMeasuredAt", "type": "esriFieldTypeDate"}
+    ]
+
+    df = get_country_api_data(
+        "land_covers", "2017-05-31", "2022-01-01", countries=["Canada"], layer=layer
+    )
+    assert len(df) and (df["lc_COUNTRY"] == "Canada").all()
+    assert {"lc_countryName", "lc_countryCode"} <= set(df.columns)
+
+
+def _square(min_lon, min_lat, max_lon, max_lat):
+    return [
+        [min_lon, min_lat],
+        [max_lon, min_lat],
+        [max_lon, max_lat],
+        [min_lon, max_lat],
+        [min_lon, min_lat],
+    ]
+
+
+boundaries = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "properties": {"COUNTRY": "Benin"},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [_square(0, 0, 10, 10), _square(4, 4, 6, 6)],
+            },
+        },
+        {
+            "type": "Feature",
+            "properties": {"COUNTRY": "Fiji"},
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [
+                    [_square(177.3, -18.2, 180, -16)],
+                    [_square(-180, -18.2, -179.5, -16)],
+                ],
+            },
+        },
+        {
+            "type": "Feature",
+            "properties": {"COUNTRY": "Atlantis"},
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[10, 0], [20, 10], [10, 10], [10, 0]]],
+            },
+        },
+    ],
+}
+
+
+@pytest.mark.util
+@pytest.mark.parametrize("cell_size", [0.5, 3, 45])
+def test_offline_countries(cell_size):
+    country_index = build_country_index(boundaries, cell_size=cell_size)
+    df = pd.DataFrame(
+        {
+            "Latitude": [1, 5, 9.9, 5, 9, -17, -17, 0, np.nan, 95],
+            "Longitude": [1, 5, 9.9, 16, 11, 178, -179.9, -1, 5, 5],
+        }
+    )
+    enriched_df = add_country_columns(
+        df, "Latitude", "Longitude", country_index, region_col="Region"
+    )
+    assert enriched_df["COUNTRY"].tolist() == [
+        "Benin",
+        None,
+        "Benin",
+        None,
+        "Atlantis",
+        "Fiji",
+        "Fiji",
+        None,
+        None,
+        None,
+    ]
+    assert enriched_df["Region"].tolist()[:7] == [
+        "Africa",
+        np.nan,
+        "Africa",
+        np.nan,
+        np.nan,
+        "Asia and the Pacific",
+        "Asia and the Pacific",
+    ]
+    assert "COUNTRY" not in df
+
+
+@pytest.mark.util
+@pytest.mark.parametrize("cell_size", [0.5, 3, 45])
+def test_overlapping_countries(cell_size):
+    overlapping_boundaries = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"COUNTRY": name},
+                "geometry": {"type": "Polygon", "coordinates": [square]},
+            }
+            for name, square in [
+                ("Atlantis", _square(0, 0, 10.3, 10)),
+                ("Lemuria", _square(5, 0, 15, 10)),
+            ]
+        ],
+    }
+    country_index = build_country_index(overlapping_boundaries, cell_size=cell_size)
+    countries = get_countries(
+        [5, 5, 5, 5, 5, 5, 5.2], [2, 7, 10.2, 10.4, 12, 20, 10.45], country_index
+    )
+    assert countries.tolist() == [
+        "Atlantis",
+        "Atlantis",
+        "Atlantis",
+        "Lemuria",
+        "Lemuria",
+        None,
+        "Lemuria",
+    ]
+
+
+def _circle(lon, lat, radius, n_vertices):
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    ring = np.column_stack(
+        [lon + radius * np.cos(angles), lat + radius * np.sin(angles)]
+    )
+    return [*ring.tolist(), ring[0].tolist()]
+
+
+@pytest.mark.util
+def test_batched_countries(monkeypatch):
+    # Both detailed circles lie in a single cell whose center is in both of them
+    detailed_boundaries = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {"COUNTRY": name},
+                "geometry": {"type": "Polygon", "coordinates": [circle]},
+            }
+            for name, circle in [
+                ("Atlantis", _circle(20, 22.5, 5, 1000)),
+                ("Lemuria", _circle(25, 22.5, 5, 1000)),
+            ]
+        ],
+    }
+    country_index = build_country_index(detailed_boundaries, cell_size=45)
+    rng = np.random.default_rng(0)
+    lons, lats = rng.uniform(14, 31, 5000), rng.uniform(16, 29, 5000)
+
+    pair_counts = []
+    pair_bucket_edges = geoenrich._pair_bucket_edges
+
+    def _record_pairs(bucket_edges, bucket_starts, buckets):
+        point_ids, edge_ids = pair_bucket_edges(bucket_edges, bucket_starts, buckets)
+        pair_counts.append(len(edge_ids))
+        return point_ids, edge_ids
+
+    monkeypatch.setattr(geoenrich, "_pair_bucket_edges", _record_pairs)
+    monkeypatch.setattr(geoenrich, "max_edge_pairs", 50000)
+    countries = get_countries(lats, lons, country_index)
+    assert len(pair_counts) > 2
+    assert max(pair_counts) <= 50000
+
+    atlantis_distances = np.hypot(lons - 20, lats - 22.5)
+    lemuria_distances = np.hypot(lons - 25, lats - 22.5)
+    expected = np.where(
+        atlantis_distances < 5,
+        "Atlantis",
+        np.where(lemuria_distances < 5, "Lemuria", None),
+    )
+    # Points right at the boundaries may fall on either side of the polygons
+    is_clear = (np.abs(atlantis_distances - 5) > 1e-2) & (
+        np.abs(lemuria_distances - 5) > 1e-2
+    )
+    assert (countries[is_clear] == expected[is_clear]).all()
@@ -7,10 +7,16 @@ from go_utils.lc import (
     apply_cleanup,
     classification_bit_flags,
     completion_scores,
+    densify_classifications,
+    extract_classification_dict,
     extract_classification_name,
     extract_classification_percentage,
+    extract_classifications,
+    get_classification_table,
     get_main_classifications,
+    parse_classification,
     photo_bit_flags,
+    pivot_classification_table,
     qa_filter,
     unpack_classifications,
 )
@@ -34,6 +40,33 @@ def test_classification_extraction(func, expected):
     assert func(test_classification) == expected
 
 
+@pytest.mark.landcover
+@pytest.mark.util
+def test_partial_classification_extraction():
+    assert extract_classification_name("[Trees]") == "Trees"
+    assert extract_classifications("[Trees]; 40% MUC 91 [Urban]") == ["Trees", "Urban"]
+    assert extract_classification_percentage("40% MUC 91") == 40.0
+
+
+@pytest.mark.landcover
+@pytest.mark.util
+def test_parse_classification():
+    parse_classification.cache_clear()
+    expected = (
+        "Trees, Closely Spaced, Deciduous - Broad Leaved",
+        "TreesCloselySpacedDeciduousBroadLeaved",
+        60.0,
+    )
+    assert parse_classification(test_classification) == expected
+    assert parse_classification(test_classification) == expected
+    assert parse_classification.cache_info().hits == 1
+
+    assert extract_classification_dict(sample_data_1) == {
+        "Category one": 60.0,
+        "Category two": 50.0,
+    }
+
+
 sample_data_1 = "60% MUC 02 (b) [Category one]; 50% MUC 05 (b) [Category two]"
 sample_data_2 = "33% MUC 02 (b) [Category one]; 25% MUC 05 (b) [Category two]"
 sample_data = [sample_data_1, sample_data_2]
@@ -77,6 +110,96 @@ def test_landcover_unpack():
         assert col not in df.columns
 
 
+@pytest.mark.landcover
+@pytest.mark.cleanup
+def test_landcover_unpack_rows():
+    df = pd.DataFrame.from_dict(
+        {
+            "lc_NorthClassifications": [sample_data_1, np.nan, sample_data_2],
+            "lc_EastClassifications": [np.nan, sample_data_2, np.nan],
+            "lc_SouthClassifications": [
+                np.nan,
+                np.nan,
+                "10% MUC 02 (b) [Category one]",
+            ],
+            "lc_WestClassifications": [np.nan, np.nan, np.nan],
+            "lc_pid": [0, 1, 2],
+        }
+    )
+    df, overall, direction = unpack_classifications(df)
+    assert overall == ["lc_Overall_CategoryOne", "lc_Overall_CategoryTwo"]
+    assert direction == [
+        "lc_East_CategoryOne",
+        "lc_East_CategoryTwo",
+        "lc_North_CategoryOne",
+        "lc_North_CategoryTwo",
+        "lc_South_CategoryOne",
+    ]
+    assert df.columns.tolist()[5:] == sorted(direction + overall)
+    assert df["lc_North_CategoryOne"].tolist() == [60, 0, 33]
+    assert df["lc_East_CategoryTwo"].tolist() == [0, 25, 0]
+    assert df["lc_South_CategoryOne"].tolist() == [0, 0, 10]
+    assert df["lc_Overall_CategoryOne"].tolist() == [15, 8.25, 10.75]
+    assert df["lc_Overall_CategoryTwo"].tolist() == [12.5, 6.25, 6.25]
+
+
+@pytest.mark.landcover
+@pytest.mark.cleanup
+def test_sparse_unpack():
+    df = pd.DataFrame.from_dict(
+        {
+            "lc_NorthClassifications": [sample_data_1, np.nan],
+            "lc_EastClassifications": [np.nan, sample_data_2],
+            "lc_SouthClassifications": [np.nan, np.nan],
+            "lc_WestClassifications": [np.nan, np.nan],
+            "lc_pid": [0, 1],
+        }
+    )
+    dense_df, _, _ = unpack_classifications(df)
+    sparse_df, overall, direction = unpack_classifications(df, sparse=True)
+    for column in overall + direction:
+        assert isinstance(sparse_df[column].dtype, pd.SparseDtype)
+    pd.testing.assert_frame_equal(densify_classifications(sparse_df), dense_df)
+
+    densify_classifications(sparse_df, inplace=True)
+    pd.testing.assert_frame_equal(sparse_df, dense_df)
+
+
+@pytest.mark.landcover
+@pytest.mark.cleanup
+def test_classification_table():
+    df = pd.DataFrame.from_dict(
+        {
+            "lc_LandCoverId": [10, 20],
+            "lc_NorthClassifications": [sample_data_1, np.nan],
+            "lc_EastClassifications": [sample_data_2, sample_data_2],
+            "lc_SouthClassifications": [np.nan, np.nan],
+            "lc_WestClassifications": [np.nan, np.nan],
+            "lc_pid": [0, 1],
+        }
+    )
+    table = get_classification_table(df)
+    assert table.columns.tolist() == [
+        "lc_LandCoverId",
+        "direction",
+        "classification",
+        "percent",
+    ]
+    assert table["lc_LandCoverId"].tolist() == [10, 10, 10, 10, 20, 20]
+    assert table["direction"].tolist() == ["North"] * 2 + ["East"] * 4
+    assert table["percent"].tolist() == [60, 50, 33, 25, 33, 25]
+
+    unpacked_df, overall, direction = unpack_classifications(df)
+    wide_df = pivot_classification_table(table)
+    assert wide_df.columns.tolist() == sorted(overall + direction)
+    pd.testing.assert_frame_equal(
+        wide_df,
+        unpacked_df.set_index("lc_LandCoverId")[wide_df.columns],
+        check_names=False,
+    )
+    assert pivot_classification_table(table, unpack=False).columns.tolist() == overall
+
+
 @pytest.mark.landcover
 @pytest.mark.flagging
 def test_photo_bit_flags():
@@ -157,6 +280,11 @@ def test_classification_flags():
         output_df["lc_ClassificationBitBinary"] == ["1001", "0100", "1111", "0010"]
     )
     assert np.all(output_df["lc_ClassificationBitDecimal"] == [9, 4, 15, 2])
+    assert output_df["lc_ClassificationBitDecimal"].dtype == np.uint8
+
+    no_binary_df = classification_bit_flags(df, bit_binary=None)
+    assert "lc_ClassificationBitBinary" not in no_binary_df
+    assert np.all(no_binary_df["lc_ClassificationBitDecimal"] == [9, 4, 15, 2])
 
     assert not output_df.equals(df)
     classification_bit_flags(df, inplace=True)
@@ -210,6 +338,25 @@ def test_main_classification():
         "lc_SecondaryPercentage": [23.75, 0, 26.25, 20],
     }
 
+    df.loc[4] = [
+        "20% [1]; 20% [2]; 20% [3]; 10% [4]",
+        "40% [4]; 40% [3]",
+        np.nan,
+        "50% [5]",
+    ]
+    desired_dict["lc_NorthPrimary"].append("1, 2, 2, 3")
+    desired_dict["lc_NorthSecondary"].append("4")
+    desired_dict["lc_EastPrimary"].append("4, 3")
+    desired_dict["lc_EastSecondary"].append("NA")
+    desired_dict["lc_SouthPrimary"].append("NA")
+    desired_dict["lc_SouthSecondary"].append("NA")
+    desired_dict["lc_WestPrimary"].append("5")
+    desired_dict["lc_WestSecondary"].append("NA")
+    desired_dict["lc_PrimaryClassification"].append("3")
+    desired_dict["lc_SecondaryClassification"].append("4, 5")
+    desired_dict["lc_PrimaryPercentage"].append(15)
+    desired_dict["lc_SecondaryPercentage"].append(12.5)
+
     output_df = get_main_classifications(df)
 
     for column, desired in desired_dict.items():
@@ -267,6 +414,13 @@ def test_completion_scores():
     completion_scores(df, inplace=True)
     assert output_df.equals(df)
 
+    # The scores don't need the bit binary flags
+    df = df.drop(columns=["lc_PhotoBitBinary", "lc_ClassificationBitBinary"])
+    photo_bit_flags(df, bit_binary=None, inplace=True)
+    classification_bit_flags(df, bit_binary=None, inplace=True)
+    no_binary_df = completion_scores(df)
+    assert np.all(no_binary_df["lc_SubCompletenessScore"] == [0.5, 0.5, 0.4, 0.2])
+
 
 @pytest.mark.landcover
 @pytest.mark.util
@@ -48,6 +48,19 @@ def test_larvae_to_num():
     assert output_df.equals(df)
 
 
+@pytest.mark.mosquito
+@pytest.mark.cleanup
+def test_larvae_to_num_order():
+    counts = ["10", "more than 100", np.nan, "1-25", "5000", "1e+3", "7"]
+    df = pd.DataFrame({"mhm_LarvaeCount": counts})
+    output_df = larvae_to_num(df)
+    reversed_df = larvae_to_num(df.iloc[::-1])
+    assert reversed_df.dtypes.equals(output_df.dtypes)
+    pd.testing.assert_frame_equal(reversed_df.iloc[::-1], output_df)
+    assert output_df["mhm_LarvaeCount"].tolist() == [10, 101, -9999, 1, 101, 101, 7]
+    assert output_df["mhm_LarvaeCountMagnitude"].tolist() == [0, 1, 0, 0, 2, 4, 0]
+
+
 @pytest.mark.mosquito
 @pytest.mark.flagging
 @pytest.mark.parametrize(
@@ -210,6 +223,14 @@ def test_completeness():
     completion_score_flag(df, inplace=True)
     assert output_df.equals(df)
 
+    # The scores don't need the PhotoBitBinary flag
+    df = df.drop(columns=["mhm_PhotoBitBinary"])
+    photo_bit_flags(df, photo_bit_binary=None, inplace=True)
+    no_binary_df = completion_score_flag(df)
+    assert np.all(
+        no_binary_df["mhm_SubCompletenessScore"] == [0.25, 0.75, 0.0, 0.5, 0.25]
+    )
+
 
 @pytest.mark.mosquito
 @pytest.mark.util
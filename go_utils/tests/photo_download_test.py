@@ -1,20 +1,29 @@
+import io
 import os
 import re
 import shutil
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
 
 import pandas as pd
 import pytest
+import requests
 from PIL import Image
 
 from go_utils.download import convert_dates_to_datetime
 from go_utils.photo_download import (
+    download_all_photos,
     download_lc_photos,
     download_mhm_photos,
     download_photo,
     get_globe_photo_id,
     get_lc_download_targets,
     get_mhm_download_targets,
+    manifest_filename,
+    read_photo_manifest,
     remove_bad_characters,
+    resize_photo,
 )
 
 out_directory = "test_photos"
@@ -179,6 +188,60 @@ def test_all_field_naming(
         _check_num_skipped_photo_warning(num_invalid_photos, str(record[0].message))
 
 
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_target_frame(tmp_path):
+    df = pd.read_csv("go_utils/tests/sample_data/lc_small.csv")
+    convert_dates_to_datetime(df)
+    with pytest.warns(Warning):
+        targets = get_lc_download_targets(df, "", include_in_name=lc_name_fields)
+    with pytest.warns(Warning):
+        target_df = get_lc_download_targets(
+            df, "", include_in_name=lc_name_fields, as_frame=True
+        )
+    assert target_df.columns.tolist() == ["url", "directory", "filename", "resolution"]
+    assert set(target_df.itertuples(index=False, name=None)) == targets
+
+    # Each invalid url is counted once, including the ones in the first row
+    df = pd.DataFrame(
+        {
+            "mhm_Latitude": [1.0, 2.0],
+            "mhm_Longitude": [1.0, 2.0],
+            "mhm_WaterSource": ["pond", "pond"],
+            "mhm_measuredDate": ["2021-01-05", "2021-01-06"],
+            "mhm_MosquitoHabitatMapperId": [1, 2],
+            "mhm_Genus": ["Aedes", None],
+            "mhm_Species": [None, None],
+            "mhm_LarvaFullBodyPhotoUrls": [
+                "pending;https://data.globe.gov/system/photos/2021/01/05/7/original.jpg",
+                "https://data.globe.gov/system/photos/2021/01/06/8/original.jpg;",
+            ],
+            "mhm_WaterSourcePhotoUrls": ["rejected", None],
+        }
+    )
+    with pytest.warns(Warning) as record:
+        target_df = get_mhm_download_targets(
+            df,
+            str(tmp_path),
+            include_in_name=["url_type", "date_str", "classification"],
+            abdomen_photo=None,
+            as_frame=True,
+        )
+    _check_num_skipped_photo_warning(
+        {"invalid_URL": 1, "rejected": 1, "pending": 1, "bad_photo_id": 0},
+        str(record[0].message),
+    )
+    assert target_df["filename"].tolist() == [
+        "mhm_Larvae_2021-01-05_Aedes_7.png",
+        "mhm_Larvae_2021-01-06_None_8.png",
+    ]
+
+    session = MockPhotoSession()
+    downloaded = download_all_photos(target_df, session=session)
+    assert all(downloaded.values()) and len(downloaded) == 2
+    assert sorted(session.urls) == sorted(target_df["url"])
+
+
 def _check_num_skipped_photo_warning(num_invalid_photos: dict, actual_warning: str):
     assert (
         f"Skipped {sum(num_invalid_photos.values())} invalid photos" in actual_warning
@@ -302,6 +365,8 @@ def test_photodownload(photodownload_setup):
     desired_dimension = (1920, 1080)
     func(df, out_directory, resolution=desired_dimension)
     for file in os.listdir(out_directory):
+        if file == manifest_filename:
+            continue
         with Image.open(os.path.join(out_directory, file)) as img:
             for desired, actual in zip(desired_dimension, img.size):
                 assert desired == actual
@@ -324,3 +389,341 @@ def test_resolution_photodownload():
             assert desired == actual
 
     shutil.rmtree(out_directory)
+
+
+class MockPhotoResponse:
+    def __init__(self, url):
+        self.url = url
+        self.content = url.encode()
+        if url.endswith(".jpg"):
+            image = io.BytesIO()
+            Image.new("RGB", (40, 30), "red").save(image, "JPEG")
+            self.content = image.getvalue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        if "missing" in self.url:
+            raise requests.HTTPError(f"404 for {self.url}")
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start : start + chunk_size]
+
+
+class MockPhotoSession:
+    def __init__(self):
+        self.urls = []
+        self.closed = False
+
+    def get(self, url, *args, **kwargs):
+        self.urls.append(url)
+        return MockPhotoResponse(url)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_concurrent_photodownload(tmp_path):
+    directory = str(tmp_path / "photos")
+    targets = {
+        (f"https://example.com/{i}.png", directory, f"photo_{i}.png", None)
+        for i in range(20)
+    }
+    targets.add(("https://example.com/missing.png", directory, "missing.png", None))
+    session = MockPhotoSession()
+
+    with pytest.warns(Warning, match="Failed to download 1 of 21 photos"):
+        downloaded = download_all_photos(targets, workers=4, session=session)
+
+    # The failed download is retried once
+    assert sorted(session.urls) == sorted(
+        [target[0] for target in targets] + ["https://example.com/missing.png"]
+    )
+    assert sum(downloaded.values()) == 20
+    assert not downloaded[
+        ("https://example.com/missing.png", directory, "missing.png", None)
+    ]
+    assert sorted(os.listdir(directory)) == sorted(
+        [f"photo_{i}.png" for i in range(20)] + [manifest_filename]
+    )
+    with open(os.path.join(directory, "photo_3.png"), "rb") as file:
+        assert file.read() == b"https://example.com/3.png"
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_photodownload_session(tmp_path, monkeypatch):
+    targets = [("https://example.com/0.png", str(tmp_path), "photo_0.png", None)]
+    session = MockPhotoSession()
+    download_all_photos(targets, session=session, manifest=False)
+    assert not session.closed
+
+    # Sessions created for the download are closed afterwards
+    monkeypatch.setattr(
+        "go_utils.photo_download.create_session", lambda pool_size: session
+    )
+    download_all_photos(targets, manifest=False)
+    assert session.closed
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_photodownload_status(tmp_path, monkeypatch):
+    df = pd.DataFrame(
+        {
+            "lc_Latitude": [1.0, 2.0],
+            "lc_Longitude": [1.0, 2.0],
+            "lc_measuredDate": ["2021-01-05", "2021-01-06"],
+            "lc_LandCoverId": [1, 2],
+            "lc_UpwardPhotoUrl": [
+                "https://data.globe.gov/system/photos/2021/01/05/7/original.jpg",
+                "https://data.globe.gov/system/photos/2021/01/06/8/missing.jpg",
+            ],
+        }
+    )
+    photo_args = {
+        f"{direction}_photo": None
+        for direction in ["down", "north", "south", "east", "west"]
+    }
+    session = MockPhotoSession()
+    monkeypatch.setattr(
+        "go_utils.photo_download.create_session", lambda pool_size: session
+    )
+
+    with pytest.warns(Warning, match="Failed to download 1 of 2 photos"):
+        target_df = download_lc_photos(
+            df, str(tmp_path), **photo_args, resolution=(20, 15), as_frame=True
+        )
+    assert target_df["status"].tolist() == ["downloaded", "failed"]
+    with Image.open(os.path.join(tmp_path, target_df["filename"][0])) as img:
+        assert img.size == (20, 15)
+
+    # The resize workers are passed on to the download
+    download_args = {}
+    monkeypatch.setattr(
+        "go_utils.photo_download.download_all_photos",
+        lambda targets, **kwargs: download_args.update(kwargs) or {},
+    )
+    targets = download_lc_photos(
+        df, str(tmp_path), **photo_args, resolution=(20, 15), resize_workers=2
+    )
+    assert download_args["resize_workers"] == 2
+    assert targets == set(
+        target_df.drop(columns="status").itertuples(index=False, name=None)
+    )
+
+
+class BarrierPhotoResponse(MockPhotoResponse):
+    def __init__(self, url, barrier):
+        super().__init__(url)
+        self.barrier = barrier
+
+    def iter_content(self, chunk_size=1):
+        # Waits for the other downloads after each chunk so that they overlap
+        for chunk in super().iter_content(chunk_size):
+            self.barrier.wait()
+            yield chunk
+
+
+class BarrierPhotoSession(MockPhotoSession):
+    def __init__(self, parties):
+        super().__init__()
+        self.barrier = threading.Barrier(parties, timeout=5)
+
+    def get(self, url, *args, **kwargs):
+        self.urls.append(url)
+        return BarrierPhotoResponse(url, self.barrier)
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_same_path_photodownload(tmp_path, monkeypatch):
+    monkeypatch.setattr("go_utils.photo_download.photo_chunk_size", 4)
+    directory = str(tmp_path)
+    urls = [f"https://example.com/{i}.png" for i in range(2)]
+    targets = [(url, directory, "photo.png", None) for url in urls]
+    downloaded = download_all_photos(
+        targets, workers=2, session=BarrierPhotoSession(2), manifest=False
+    )
+    assert all(downloaded.values())
+    assert os.listdir(directory) == ["photo.png"]
+    with open(os.path.join(directory, "photo.png"), "rb") as file:
+        assert file.read().decode() in urls
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_resumed_photodownload(tmp_path):
+    directory = str(tmp_path)
+    targets = [
+        (f"https://example.com/{i}.png", directory, f"photo_{i}.png", None)
+        for i in range(5)
+    ]
+    targets.append(("https://example.com/missing.png", directory, "missing.png", None))
+    with pytest.warns(Warning):
+        download_all_photos(targets, session=MockPhotoSession())
+
+    manifest_df = read_photo_manifest(directory).set_index("path")
+    assert manifest_df.loc["missing.png", "status"] == "failed"
+    assert manifest_df.loc["photo_2.png", "status"] == "downloaded"
+    assert manifest_df.loc["photo_2.png", "size"] == "25"
+
+    # Simulates an interrupted download and a later run over overlapping targets
+    with open(os.path.join(directory, "photo_2.png"), "wb") as file:
+        file.write(b"https://")
+    targets.append(("https://example.com/5.png", directory, "photo_5.png", None))
+    session = MockPhotoSession()
+    with pytest.warns(Warning, match="Failed to download 1 of 7 photos"):
+        downloaded = download_all_photos(targets, session=session)
+    assert sorted(session.urls) == [
+        "https://example.com/2.png",
+        "https://example.com/5.png",
+        "https://example.com/missing.png",
+        "https://example.com/missing.png",
+    ]
+    assert sum(downloaded.values()) == 6
+    assert len(read_photo_manifest(directory)) == 7
+    with open(os.path.join(directory, manifest_filename)) as file:
+        assert len(file.readlines()) == 8
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_resized_photodownload(tmp_path, monkeypatch):
+    monkeypatch.setattr("go_utils.photo_download.photo_chunk_size", 16)
+    directory = str(tmp_path)
+    session = MockPhotoSession()
+
+    assert download_photo(
+        "https://example.com/0.jpg", directory, "scaled.png", (20, 10), session
+    )
+    assert session.urls == ["https://example.com/0.jpg"]
+    with Image.open(os.path.join(directory, "scaled.png")) as img:
+        assert img.size == (20, 10)
+
+    assert download_photo(
+        "https://example.com/1.jpg", directory, "1.jpg", None, session
+    )
+    with Image.open(os.path.join(directory, "1.jpg")) as img:
+        assert img.size == (40, 30)
+
+    with pytest.warns(Warning, match="missing.jpg failed: HTTPError"):
+        assert not download_photo(
+            "https://example.com/missing.jpg", directory, "2.jpg", None, session
+        )
+    assert session.urls[-2:] == ["https://example.com/missing.jpg"] * 2
+    assert sorted(os.listdir(directory)) == ["1.jpg", "scaled.png"]
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+@pytest.mark.parametrize(
+    "resolution, keep_aspect_ratio, desired_size",
+    [
+        ((100, 100), False, (100, 100)),
+        ((100, 100), True, (100, 75)),
+        ((800, 600), False, (800, 600)),
+        ((800, 100), True, (133, 100)),
+        ((800, 600), True, (400, 300)),
+    ],
+)
+def test_resize_photo(tmp_path, resolution, keep_aspect_ratio, desired_size):
+    source_path = str(tmp_path / "source.jpg")
+    Image.new("RGB", (400, 300), "blue").save(source_path, "JPEG")
+    path = str(tmp_path / "resized.png")
+
+    resize_photo(source_path, path, resolution, keep_aspect_ratio)
+    with Image.open(path) as img:
+        assert img.size == desired_size
+        assert img.format == "PNG"
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_resized_photo_pipeline(tmp_path):
+    directory = str(tmp_path)
+    targets = [
+        (f"https://example.com/{i}.jpg", directory, f"photo_{i}.png", (20, 20))
+        for i in range(4)
+    ]
+    targets.append(("https://example.com/4.jpg", directory, "photo_4.jpg", None))
+
+    downloaded = download_all_photos(
+        targets,
+        workers=2,
+        session=MockPhotoSession(),
+        resize_workers=2,
+        keep_aspect_ratio=True,
+    )
+    assert all(downloaded.values())
+    with Image.open(os.path.join(directory, "photo_0.png")) as img:
+        assert img.size == (20, 15)
+    with Image.open(os.path.join(directory, "photo_4.jpg")) as img:
+        assert img.size == (40, 30)
+    assert not [file for file in os.listdir(directory) if file.endswith(".part")]
+    manifest_df = read_photo_manifest(directory).set_index("path")
+    assert manifest_df.loc["photo_0.png", "resolution"] == "20x20"
+    assert (manifest_df["status"] == "downloaded").all()
+
+
+class BrokenProcessPoolStandIn:
+    def __init__(self, max_workers=None):
+        self.submitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def submit(self, *args):
+        # The first resize "crashes" its process and later submissions fail
+        self.submitted += 1
+        if self.submitted > 1:
+            raise BrokenProcessPool()
+        future = Future()
+        future.set_exception(BrokenProcessPool())
+        return future
+
+
+@pytest.mark.photodownload
+@pytest.mark.util
+def test_resize_fallbacks(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    targets = [
+        (f"https://example.com/{i}.jpg", directory, f"photo_{i}.png", (20, 20))
+        for i in range(3)
+    ]
+
+    # Without resize workers, no processes are spawned
+    def no_processes(*args, **kwargs):
+        raise AssertionError("A process pool was created")
+
+    monkeypatch.setattr("go_utils.photo_download.ProcessPoolExecutor", no_processes)
+    assert all(download_all_photos(targets, session=MockPhotoSession()).values())
+
+    # Photos are resized in threads once the process pool breaks
+    monkeypatch.setattr(
+        "go_utils.photo_download.ProcessPoolExecutor", BrokenProcessPoolStandIn
+    )
+    with pytest.warns(Warning, match="resize processes stopped"):
+        downloaded = download_all_photos(
+            targets, session=MockPhotoSession(), manifest=False, resize_workers=2
+        )
+    assert all(downloaded.values())
+    assert not [file for file in os.listdir(directory) if file.endswith(".part")]
+
+    # Resize errors fail the photo instead of the whole download
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    with pytest.warns(Warning, match="DecompressionBombError"):
+        downloaded = download_all_photos(
+            targets, session=MockPhotoSession(), manifest=False
+        )
+    assert not any(downloaded.values())
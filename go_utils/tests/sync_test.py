@@ -0,0 +1,105 @@
+import json
+import os
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+from test_data import sample_mhm_json
+
+from go_utils.sync import read_sync_state, read_synced_data, sync_api_data
+
+
+class MockResponse:
+    def __bool__(self):
+        return True
+
+    def json(self):
+        return json.loads(sample_mhm_json)
+
+
+@pytest.fixture
+def requested_urls(monkeypatch):
+    urls = []
+
+    def mock_get(url, *args, **kwargs):
+        urls.append(url)
+        return MockResponse()
+
+    monkeypatch.setattr("go_utils.download.requests.get", mock_get)
+    return urls
+
+
+@pytest.mark.util
+@pytest.mark.parametrize("filename", ["mhm.csv", "mhm.parquet"])
+def test_sync(tmp_path, requested_urls, filename):
+    if filename.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / filename)
+    protocol = "mosquito_habitat_mapper"
+
+    df = sync_api_data(protocol, path, "2017-05-01", "2017-06-30")
+    assert len(df) == 2
+    assert "startdate=2017-05-01" in requested_urls[0]
+    state = read_sync_state(path)
+    assert state["protocol"] == protocol
+    assert state["high_water_mark"] == "2017-05-29T19:12:00"
+    assert "ids" not in state
+
+    # Later syncs start at the high-water mark minus the lookback window
+    df = sync_api_data(protocol, path, "2017-05-01", "2017-06-30")
+    assert df.empty
+    assert "startdate=2017-05-15" in requested_urls[1]
+    synced_df = read_synced_data(path)
+    assert len(synced_df) == 2
+    assert pd.api.types.is_datetime64_any_dtype(synced_df["mhm_MeasuredAt"])
+
+    with pytest.raises(ValueError):
+        sync_api_data("land_covers", path)
+
+
+@pytest.mark.util
+def test_sync_existing_store(tmp_path, requested_urls):
+    path = str(tmp_path / "mhm.csv")
+    protocol = "mosquito_habitat_mapper"
+    sync_api_data(protocol, path, "2017-05-01", "2017-06-30")
+    os.remove(f"{path}.sync.json")
+
+    # Stores without a state file are bootstrapped from their contents
+    df = sync_api_data(protocol, path, "2017-05-01", "2017-06-30")
+    assert df.empty
+    assert "startdate=2017-05-15" in requested_urls[1]
+    assert read_sync_state(path)["high_water_mark"] == "2017-05-29T19:12:00"
+    assert len(read_synced_data(path)) == 2
+
+
+@pytest.mark.util
+def test_sync_processed_rows(tmp_path, requested_urls):
+    path = str(tmp_path / "mhm.csv")
+    protocol = "mosquito_habitat_mapper"
+
+    # The high-water mark only covers the observations that were stored
+    df = sync_api_data(
+        protocol,
+        path,
+        "2017-05-01",
+        "2017-06-30",
+        process=lambda df: df[df["mhm_MosquitoHabitatMapperId"] == 4],
+    )
+    assert list(df["mhm_MosquitoHabitatMapperId"]) == [4]
+    stored_at = read_synced_data(path)["mhm_MeasuredAt"].max()
+    assert read_sync_state(path)["high_water_mark"] == stored_at.isoformat()
+
+    # The stored IDs are read from the store itself
+    df = sync_api_data(protocol, path, "2017-05-01", "2017-06-30")
+    assert list(df["mhm_MosquitoHabitatMapperId"]) == [6]
+    assert len(read_synced_data(path)) == 2
+
+    with pytest.raises(ValueError, match="mhm_LarvaeCount"):
+        sync_api_data(
+            protocol,
+            path,
+            "2017-05-01",
+            "2017-06-30",
+            lookback=timedelta(days=365),
+            process=lambda df: df.drop(columns=["mhm_LarvaeCount"]),
+        )
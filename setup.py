@@ -105,6 +105,7 @@ setup(
         "pytz>=2021.3",
         "timezonefinder>=5.2.0",
     ],
+    extras_require={"parquet": ["pyarrow>=3.0.0"]},
     python_requires=">=3.6",
     license="MIT License",
     classifiers=[